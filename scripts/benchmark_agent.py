@@ -0,0 +1,227 @@
+import argparse
+import json
+import random
+import subprocess
+import time
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.env.othello_game import Othello
+from src.env.othello_agent import OthelloAgent
+from src.env.analysis_cache import AnalysisCache
+from src.utils.token_budget import TokenBudgetPredictor
+
+
+def sample_random_positions(num_positions: int, seed: int = 0, min_plies: int = 4, max_plies: int = 40) -> list:
+    """Play random legal moves from the initial position to build a fixed set of test positions"""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < num_positions:
+        game = Othello()
+        for _ in range(rng.randint(min_plies, max_plies)):
+            valid_moves = game.get_valid_moves()
+            if game.game_over or not valid_moves:
+                break
+            game.move(rng.choice(valid_moves))
+        if not game.game_over:
+            positions.append(game)
+    return positions
+
+
+COLD_START_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+from src.env.othello_agent import OthelloAgent
+import_time = time.perf_counter() - start
+agent = OthelloAgent(sys.argv[1], sys.argv[2] or None, device=sys.argv[3])
+load_time = time.perf_counter() - start - import_time
+from src.env.othello_game import Othello
+agent.analyze_position(Othello())
+first_call_time = time.perf_counter() - start - import_time - load_time
+print(json.dumps({"import": import_time, "load": load_time, "first_call": first_call_time}))
+"""
+
+
+def measure_cold_start(base_model_id: str, adapter_path: str, device: str) -> dict:
+    """Time module import, model load and the first analysis in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, "-c", COLD_START_SNIPPET, base_model_id, adapter_path or "", device],
+        cwd=str(Path(__file__).parent.parent), capture_output=True, text=True, check=True,
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    print(f"cold start: import {timings['import']:.2f}s, load {timings['load']:.2f}s, "
+          f"first analysis {timings['first_call']:.2f}s")
+    return timings
+
+
+def summarize_stage_stats(results: list):
+    """Print mean time, generated tokens and early-stop savings for each pipeline stage"""
+    for stage in ("task1", "task2"):
+        stage_stats = [result["stage_stats"][stage] for result in results if stage in result["stage_stats"]]
+        if not stage_stats:
+            continue
+        n = len(stage_stats)
+        print(f"  {stage}: {sum(s['seconds'] for s in stage_stats) / n:.3f}s/call, "
+              f"{sum(s['generated_tokens'] for s in stage_stats) / n:.1f} generated tokens, "
+              f"{sum(s['tokens_saved'] for s in stage_stats) / n:.1f} tokens saved by JSON early stop, "
+              f"{sum(s.get('budget_retry', False) for s in stage_stats)} budget retries")
+
+
+def legal_move_scores(games: list, results: list) -> tuple:
+    """Micro-averaged precision, recall and F1 of the predicted legal moves"""
+    correct = wrong = missed = 0
+    for game, result in zip(games, results):
+        true_moves = set(game.get_valid_moves())
+        predicted = set(result["predicted_legal_moves"])
+        correct += len(true_moves & predicted)
+        wrong += len(predicted - true_moves)
+        missed += len(true_moves - predicted)
+    precision = correct / (correct + wrong) if (correct + wrong) > 0 else 0
+    recall = correct / (correct + missed) if (correct + missed) > 0 else 0
+    f1_score = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+    return precision, recall, f1_score
+
+
+def compare_pipeline_modes(agent: OthelloAgent, games: list, modes: list):
+    """Per-mode latency and legal-move accuracy, one position at a time"""
+    print(f"Comparing pipeline modes on {len(games)} positions...")
+    for mode in modes:
+        latencies, results = [], []
+        illegal_choices = fallbacks = 0
+        for game in games:
+            start = time.perf_counter()
+            result = agent.analyze_position(game, mode=mode)
+            latencies.append(time.perf_counter() - start)
+            results.append(result)
+            illegal_choices += result["chosen_move"] not in game.get_valid_moves()
+            fallbacks += result.get("verification", {}).get("fallback", False)
+
+        latencies.sort()
+        precision, recall, f1_score = legal_move_scores(games, results)
+        print(f"{mode:<13s}: mean {sum(latencies) / len(latencies):.3f}s, p50 {latencies[len(latencies) // 2]:.3f}s, "
+              f"p95 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]:.3f}s | "
+              f"P {precision:.4f} R {recall:.4f} F1 {f1_score:.4f} | "
+              f"illegal/missing choice {illegal_choices}/{len(games)}, fallbacks {fallbacks}")
+
+
+def compare_backends(agent_kwargs: dict, games: list, backends: list):
+    """
+    Build one agent per backend and report decode throughput (generated tokens/sec),
+    per-position latency and legal-move F1 on the same positions.
+    """
+    print(f"Comparing backends on {len(games)} positions...")
+    for backend in backends:
+        start = time.perf_counter()
+        agent = OthelloAgent(**agent_kwargs, backend=backend)
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = [agent.analyze_position(game) for game in games]
+        elapsed = time.perf_counter() - start
+        generated = sum(stats["generated_tokens"] for result in results for stats in result["stage_stats"].values())
+        generation_time = sum(stats["seconds"] for result in results for stats in result["stage_stats"].values())
+        precision, recall, f1_score = legal_move_scores(games, results)
+        print(f"{backend:<9s}: load {load_time:.1f}s | {generated / generation_time if generation_time else 0:.1f} tokens/sec, "
+              f"{elapsed / len(games):.3f}s/position | P {precision:.4f} R {recall:.4f} F1 {f1_score:.4f} | "
+              f"errors {sum(1 for result in results if result['errors'])}/{len(results)}")
+        del agent
+
+
+def run_throughput_benchmark(agent: OthelloAgent, games: list, batch_sizes: list):
+    print(f"Benchmarking {len(games)} positions...")
+    # 计时的各轮都绕过分析缓存，否则第一轮之后全部命中，吞吐与加速比都失去意义；缓存单独计时
+    analysis_cache, agent.analysis_cache = agent.analysis_cache, None
+    try:
+        start = time.perf_counter()
+        results = [agent.analyze_position(game) for game in games]
+        sequential_time = time.perf_counter() - start
+        print(f"sequential      : {len(games) / sequential_time:8.3f} positions/sec ({sequential_time:.2f}s)")
+        summarize_stage_stats(results)
+        failed = sum(1 for result in results if result["errors"])
+        print(f"  positions with errors: {failed}/{len(results)}")
+        if agent.reuse_prefix_cache:
+            saved = sum(result["prefill_tokens_saved"] for result in results) / len(results)
+            print(f"prefill tokens saved per position: {saved:.1f}")
+        else:
+            for batch_size in batch_sizes:
+                agent.max_batch_size = batch_size
+                start = time.perf_counter()
+                agent.analyze_positions(games)
+                batched_time = time.perf_counter() - start
+                print(f"batch_size={batch_size:<5d}: {len(games) / batched_time:8.3f} positions/sec "
+                      f"({batched_time:.2f}s, x{sequential_time / batched_time:.2f})")
+    finally:
+        agent.analysis_cache = analysis_cache
+
+    if analysis_cache is not None:
+        for label in ("cache (cold)", "cache (warm)"):
+            hits = analysis_cache.hits
+            start = time.perf_counter()
+            agent.analyze_positions(games)
+            cached_time = time.perf_counter() - start
+            print(f"{label:<16s}: {len(games) / cached_time:8.3f} positions/sec ({cached_time:.2f}s, "
+                  f"{analysis_cache.hits - hits}/{len(games)} hits, x{sequential_time / cached_time:.2f})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure OthelloAgent throughput in positions/sec.")
+    parser.add_argument('--base_model_id', type=str, default='Qwen/Qwen3-4B-Instruct-2507', help='Base model id or path (a tiny model works for CPU runs).')
+    parser.add_argument('--adapter_path', type=str, default=None, help='Optional LoRA adapter path.')
+    parser.add_argument('--device', type=str, default='auto')
+    parser.add_argument('--num_positions', type=int, default=16)
+    parser.add_argument('--batch_sizes', type=str, default='1,4,8,16', help='Comma-separated batch sizes to compare.')
+    parser.add_argument('--max_batch_tokens', type=int, default=32768)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--prompt_layout', type=str, default='legacy', choices=['legacy', 'shared_prefix'])
+    parser.add_argument('--measure_startup', action='store_true', help='Only measure cold-start time in a fresh process (compare base+adapter with a merged export).')
+    parser.add_argument('--modes', type=str, default=None, help='Comma-separated pipeline modes to compare (llm,engine_task1,verified).')
+    parser.add_argument('--analysis_cache_size', type=int, default=0, help='Enable the symmetry-aware analysis cache with this many entries.')
+    parser.add_argument('--analysis_cache_path', type=str, default=None, help='Optional JSON file to load/persist the analysis cache.')
+    parser.add_argument('--constrained_decoding', type=str, default=None, choices=['schema', 'schema_final_only'], help='Grammar-constrained JSON decoding mode.')
+    parser.add_argument('--backends', type=str, default=None, help='Comma-separated backends to compare (bf16,cpu_int8).')
+    parser.add_argument('--num_threads', type=int, default=None, help='Number of torch CPU threads.')
+    parser.add_argument('--static_kv_cache', action='store_true', help='Use a pre-allocated static KV cache during generation.')
+    parser.add_argument('--metrics_jsonl', type=str, default=None, help='Record per-stage timings and write one JSON record per call here.')
+    parser.add_argument('--token_budget', type=str, default=None, help='Token budget model from scripts/fit_token_budget.py for per-prompt max_new_tokens.')
+    parser.add_argument('--reuse_prefix_cache', action='store_true', help='Reuse the prefilled static/position prefix (needs --prompt_layout shared_prefix).')
+
+    args = parser.parse_args()
+
+    if args.measure_startup:
+        measure_cold_start(args.base_model_id, args.adapter_path, args.device)
+        sys.exit(0)
+
+    agent_kwargs = dict(
+        base_model_id=args.base_model_id, adapter_path=args.adapter_path, device=args.device,
+        max_batch_tokens=args.max_batch_tokens, prompt_layout=args.prompt_layout,
+        reuse_prefix_cache=args.reuse_prefix_cache, constrained_decoding=args.constrained_decoding,
+        num_threads=args.num_threads, static_kv_cache=args.static_kv_cache,
+        token_budget=TokenBudgetPredictor.load(args.token_budget) if args.token_budget else None,
+    )
+    games = sample_random_positions(args.num_positions, seed=args.seed)
+    if args.backends:
+        compare_backends(agent_kwargs, games, args.backends.split(','))
+        sys.exit(0)
+
+    agent = OthelloAgent(
+        **agent_kwargs,
+        analysis_cache=AnalysisCache(args.analysis_cache_size, args.analysis_cache_path) if args.analysis_cache_size else None,
+    )
+    if args.metrics_jsonl:
+        agent.metrics.enable(args.metrics_jsonl)
+    if args.modes:
+        compare_pipeline_modes(agent, games, args.modes.split(','))
+    else:
+        run_throughput_benchmark(agent, games, [int(b) for b in args.batch_sizes.split(',')])
+
+    if agent.metrics.enabled:
+        summary = agent.metrics.summary()
+        print(f"stage timings over {summary['calls']} calls (mean seconds per call): "
+              + ", ".join(f"{stage} {seconds:.4f}" for stage, seconds in summary['stage_mean_seconds'].items()))
+    if agent.analysis_cache is not None:
+        print(f"analysis cache: {agent.analysis_cache.stats()}")
+        if args.analysis_cache_path:
+            agent.analysis_cache.save()
@@ -1,7 +1,13 @@
 import argparse
+import hashlib
 import json
-from tqdm import tqdm
+import os
 import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
 
 import sys
 from pathlib import Path
@@ -10,42 +16,56 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from src.env.othello_game import Othello
 from src.utils.data_loader import load_csv
-from src.utils.api_client import OpenAIClient
 
 
-def run_llm_benchmark(api_client: OpenAIClient, test_games: list):
+def build_position_fixture(test_data_path: str, num_positions: int, seed: int, fixture_path: str = None) -> list:
     """
-    评估一个大模型在识别合法走法任务上的 Zero-Shot 表现。
+    Sample one random position from each of num_positions random games and return them as plain dicts.
+    With fixture_path the positions are saved once and reloaded on later runs with the same settings,
+    so every run (and every model) is scored on the same set.
     """
-    # (评估指标的定义和 evaluation_loop 与 evaluate_agent.py 中的相同)
-    total_correct = 0
-    total_wrong = 0
-    total_missed = 0
-    positions_processed = 0
-
-    print(f"Starting LLM benchmark ...")
+    settings = {"test_data_path": test_data_path, "num_positions": num_positions, "seed": seed}
+    if fixture_path and os.path.exists(fixture_path):
+        with open(fixture_path, "r", encoding="utf-8") as f:
+            fixture = json.load(f)
+        if fixture["settings"] == settings:
+            print(f"Loaded {len(fixture['positions'])} positions from {fixture_path}")
+            return fixture["positions"]
+        print(f"Fixture {fixture_path} was built with other settings, rebuilding it")
 
-    for game_data in tqdm(test_games, desc="Benchmarking Games"):
-        
+    rng = random.Random(seed)
+    games_data = load_csv(test_data_path)
+    positions = []
+    for game_data in rng.sample(games_data, min(num_positions, len(games_data))):
         moves = game_data['moves']
-        if not moves: continue
-        move_index = random.randint(0, len(moves) - 1)
-        
+        if not moves:
+            continue
+        move_index = rng.randint(0, len(moves) - 1)
         game = Othello()
         try:
             for i in range(move_index):
                 game.move(moves[i])
         except ValueError:
             continue
+        positions.append({
+            "game_id": game_data['id'],
+            "move_index": move_index,
+            "player": game.current_player,
+            "black": sorted(game.black),
+            "white": sorted(game.white),
+        })
+
+    if fixture_path:
+        with open(fixture_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "positions": positions}, f)
+    return positions
 
-        true_legal_moves = set(game.get_valid_moves())
-        
-        player_str = game.current_player.capitalize()
-        opponent_str = "white" if player_str == "black" else "black"
-        board_json_str = json.dumps({"black_pieces": sorted(list(game.black)), "white_pieces": sorted(list(game.white))})
 
-        # --- Step 1: Identify Plausible Candidates (模拟微调流程) ---
-        prompt1 = f"""Task: Analyze Sampled Squares and Identify Plausible Candidates
+def build_task1_prompt(position: dict) -> str:
+    player_str = position["player"].capitalize()
+    opponent_str = "white" if position["player"] == "black" else "black"
+    board_json_str = json.dumps({"black_pieces": position["black"], "white_pieces": position["white"]})
+    return f"""Task: Analyze Sampled Squares and Identify Plausible Candidates
                 Player to move: {player_str}
                 Opponent: {opponent_str}
                 Board State:
@@ -54,24 +74,16 @@ def run_llm_benchmark(api_client: OpenAIClient, test_games: list):
                 Analyze a diverse sample of squares to determine which are plausible candidates for a legal move. A plausible candidate must be an empty square adjacent to an opponent's piece. Conclude with a final_plausible_candidates list containing only the squares identified as plausible.
                 After analyze Please output the following JSON structure:
                 {{
-                    "final_plausible_candidates" = ["a1", "b2", "c3", "d4"],
+                    "final_plausible_candidates": ["a1", "b2", "c3", "d4"]
                 }}
                 """
-        
-        for i in range(3):
-            try:
-                response1_text = api_client.generate_response(prompt1)
-                json_str1 = response1_text[response1_text.find('{'):response1_text.rfind('}')+1]
-                task1_output = json.loads(json_str1)
-                plausible_candidates = task1_output.get("final_plausible_candidates", [])
-                break
-            except Exception as e:
-                pass
-        else:
-            print(f"LLM failed Task 1 for game {game_data['id']}.")
-            continue
 
-        prompt2 = f"""Task: Analyze Plausible Candidates for Legality
+
+def build_task2_prompt(position: dict, plausible_candidates: list) -> str:
+    player_str = position["player"].capitalize()
+    opponent_str = "white" if position["player"] == "black" else "black"
+    board_json_str = json.dumps({"black_pieces": position["black"], "white_pieces": position["white"]})
+    return f"""Task: Analyze Plausible Candidates for Legality
                 Player to move: {player_str}
                 Opponent: {opponent_str}
                 Board State:
@@ -81,41 +93,199 @@ def run_llm_benchmark(api_client: OpenAIClient, test_games: list):
                 For each plausible candidate, determine if it is a legal move by checking the flanking rule. Your analysis must cover every candidate. Conclude with a `final_legal_moves` list containing only the moves confirmed as legal.
                 After analyze Please output the following JSON structure:
                 {{
-                    "final_legal_moves":["a1", "b2", "c3", "d4"],
+                    "final_legal_moves": ["a1", "b2", "c3", "d4"]
                 }}
                 """
-        
-        for i in range(3):
-            try:
-                response2_text = api_client.generate_response(prompt2)
-                json_str2 = response2_text[response2_text.find('{'):response2_text.rfind('}')+1]
-                task2_output = json.loads(json_str2)
-                predicted_legal_moves = set(task2_output.get("final_legal_moves", []))
-                break
-            except Exception as e:
-                pass
+
+
+class MockClient:
+    """
+    Local stand-in for an OpenAI-compatible endpoint: answers the two benchmark prompts with the engine,
+    dropping each correct move with probability error_rate and sleeping latency_ms per call.
+    Answers depend only on the prompt, so runs are reproducible.
+    """
+
+    def __init__(self, error_rate: float = 0.1, latency_ms: float = 50, model: str = "mock"):
+        self.error_rate = error_rate
+        self.latency = latency_ms / 1000
+        self.model = model
+
+    def complete(self, prompt: str, **kwargs) -> dict:
+        time.sleep(self.latency)
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        board = json.loads(re.search(r'\{"black_pieces".*?\]\}', prompt).group(0))
+        game = Othello()
+        game.set_board_state({"black": board["black_pieces"], "white": board["white_pieces"]},
+                             re.search(r"Player to move: (\w+)", prompt).group(1).lower())
+        if prompt.startswith("Task: Analyze Sampled Squares"):
+            key, moves = "final_plausible_candidates", game.get_plausible_candidates()
         else:
-            print(f"LLM failed Task 2 for game {game_data['id']}.")
-            continue
+            key, moves = "final_legal_moves", game.get_valid_moves()
+        text = json.dumps({key: [move for move in moves if rng.random() >= self.error_rate]})
+        return {"text": text, "prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4}
 
 
-        # (对比和统计逻辑与 evaluate_agent.py 相同)
-        correct_predictions = true_legal_moves.intersection(predicted_legal_moves)
-        wrong_predictions = predicted_legal_moves - true_legal_moves
-        missed_predictions = true_legal_moves - predicted_legal_moves
-        total_correct += len(correct_predictions)
-        total_wrong += len(wrong_predictions)
-        total_missed += len(missed_predictions)
-        positions_processed += 1
-    
-    # (打印结果的逻辑与 evaluate_agent.py 相同)
-    print("\n--- LLM Zero-Shot Benchmark Results ---")
+class ResponseCache:
+    """
+    Append-only JSONL cache of API responses keyed by model, prompt, request options and attempt number.
+    Reruns of the benchmark replay cached responses instead of calling the endpoint again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.entries[entry["key"]] = entry["response"]
+
+    @staticmethod
+    def key(model: str, prompt: str, options: dict, attempt: int) -> str:
+        payload = json.dumps({"model": model, "prompt": prompt, "options": options, "attempt": attempt}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        return self.entries.get(key)
+
+    def put(self, key: str, response: dict):
+        with self._lock:
+            self.entries[key] = response
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "response": response}) + "\n")
+
+
+class BenchmarkRunner:
+    """Issue the Task 1 -> Task 2 calls of many positions concurrently and collect latency, usage and accuracy"""
+
+    def __init__(self, api_client, generation_kwargs: dict, cache: ResponseCache = None, max_attempts: int = 3):
+        self.api_client = api_client
+        self.generation_kwargs = generation_kwargs
+        self.cache = cache
+        self.max_attempts = max_attempts
+        self.latencies = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.api_calls = 0
+        self.cache_hits = 0
+        self._lock = threading.Lock()
+
+    def _call(self, prompt: str, attempt: int) -> dict:
+        key = self.cache.key(self.api_client.model, prompt, self.generation_kwargs, attempt) if self.cache else None
+        response = self.cache.get(key) if self.cache else None
+        if response is not None:
+            with self._lock:
+                self.cache_hits += 1
+            return response
+
+        start = time.perf_counter()
+        response = self.api_client.complete(prompt, **self.generation_kwargs)
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.api_calls += 1
+            self.latencies.append(latency)
+            self.prompt_tokens += response["prompt_tokens"]
+            self.completion_tokens += response["completion_tokens"]
+        if self.cache:
+            self.cache.put(key, response)
+        return response
+
+    def _ask_json(self, prompt: str, field: str):
+        """Return the list under `field`; API errors back off exponentially, malformed JSON is re-asked"""
+        for attempt in range(self.max_attempts):
+            try:
+                text = self._call(prompt, attempt)["text"]
+            except Exception:
+                time.sleep(min(8.0, 0.5 * 2 ** attempt))
+                continue
+            try:
+                return json.loads(text[text.find('{'):text.rfind('}')+1]).get(field, [])
+            except (ValueError, AttributeError):
+                continue
+        return None
+
+    def evaluate_position(self, position: dict) -> dict:
+        game = Othello()
+        game.set_board_state({"black": position["black"], "white": position["white"]}, position["player"])
+        true_legal_moves = set(game.get_valid_moves())
+
+        plausible_candidates = self._ask_json(build_task1_prompt(position), "final_plausible_candidates")
+        if plausible_candidates is None:
+            return {"failed": "Task 1"}
+        predicted = self._ask_json(build_task2_prompt(position, plausible_candidates), "final_legal_moves")
+        if predicted is None:
+            return {"failed": "Task 2"}
+        predicted = set(predicted)
+        return {
+            "failed": None,
+            "correct": len(true_legal_moves & predicted),
+            "wrong": len(predicted - true_legal_moves),
+            "missed": len(true_legal_moves - predicted),
+        }
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def run_llm_benchmark(api_client, positions: list, json_mode: bool = False, concurrency: int = 8,
+                      cache: ResponseCache = None, price_input: float = 0.0, price_output: float = 0.0) -> dict:
+    """
+    评估一个大模型在识别合法走法任务上的 Zero-Shot 表现。
+    json_mode: 请求服务端的 JSON 输出模式（response_format=json_object），减少因 JSON 格式错误导致的重试
+    concurrency: 同时在途的位置数上限（每个位置的 Task 1 与 Task 2 仍按顺序调用）
+    price_input / price_output: 每百万输入 / 输出 token 的价格，用于估算成本
+    """
+    generation_kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+    runner = BenchmarkRunner(api_client, generation_kwargs, cache=cache)
+
+    print(f"Starting LLM benchmark on {len(positions)} positions with {concurrency} in flight...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(tqdm(executor.map(runner.evaluate_position, positions), total=len(positions), desc="Benchmarking"))
+    wall_time = time.perf_counter() - start
+
+    scored = [result for result in results if not result["failed"]]
+    total_correct = sum(result["correct"] for result in scored)
+    total_wrong = sum(result["wrong"] for result in scored)
+    total_missed = sum(result["missed"] for result in scored)
     precision = total_correct / (total_correct + total_wrong) if (total_correct + total_wrong) > 0 else 0
     recall = total_correct / (total_correct + total_missed) if (total_correct + total_missed) > 0 else 0
     f1_score = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-    print(f"Positions evaluated: {positions_processed}")
+    latencies = sorted(runner.latencies)
+    cost = (runner.prompt_tokens * price_input + runner.completion_tokens * price_output) / 1e6
+
+    report = {
+        "positions": len(positions),
+        "positions_evaluated": len(scored),
+        "failed_task1": sum(result["failed"] == "Task 1" for result in results),
+        "failed_task2": sum(result["failed"] == "Task 2" for result in results),
+        "precision": precision,
+        "recall": recall,
+        "f1": f1_score,
+        "api_calls": runner.api_calls,
+        "cache_hits": runner.cache_hits,
+        "latency_p50": _percentile(latencies, 0.50),
+        "latency_p90": _percentile(latencies, 0.90),
+        "latency_p99": _percentile(latencies, 0.99),
+        "prompt_tokens": runner.prompt_tokens,
+        "completion_tokens": runner.completion_tokens,
+        "cost": cost,
+        "wall_time": wall_time,
+    }
+
+    print("\n--- LLM Zero-Shot Benchmark Results ---")
+    print(f"Positions evaluated: {len(scored)}/{len(positions)} "
+          f"(failed Task 1: {report['failed_task1']}, Task 2: {report['failed_task2']})")
     print(f"Precision: {precision:.4f}, Recall: {recall:.4f}, F1-Score: {f1_score:.4f}")
+    print(f"API calls: {runner.api_calls} (cache hits: {runner.cache_hits}), wall time {wall_time:.1f}s")
+    print(f"Latency p50 {report['latency_p50']:.2f}s, p90 {report['latency_p90']:.2f}s, p99 {report['latency_p99']:.2f}s")
+    print(f"Tokens: {runner.prompt_tokens} in / {runner.completion_tokens} out, cost {cost:.4f}")
     print("---------------------------------------")
+    return report
 
 
 if __name__ == '__main__':
@@ -123,10 +293,33 @@ if __name__ == '__main__':
     # 您可以添加参数来选择不同的教师模型
     parser.add_argument('--test_data_path', type=str, default='data/othello_dataset.csv', help='Path to the test game data.')
     parser.add_argument('--num_positions', type=int, default=500, help='Number of random positions to evaluate.')
-    
+    parser.add_argument('--seed', type=int, default=0, help='Seed for sampling the position fixture.')
+    parser.add_argument('--fixture_path', type=str, default='data/llm_benchmark_positions.json', help='Saved position set, built on first use.')
+    parser.add_argument('--cache_path', type=str, default='data/llm_benchmark_cache.jsonl', help='Response cache, empty string to disable.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Maximum number of positions in flight.')
+    parser.add_argument('--base_url', type=str, default=None, help='OpenAI-compatible endpoint, e.g. http://127.0.0.1:8000/v1 for scripts/serve_agent.py (defaults to OPENAI_BASE_URL).')
+    parser.add_argument('--api_key', type=str, default=None, help='API key (defaults to OPENAI_API_KEY).')
+    parser.add_argument('--model', type=str, default='deepseek-v3', help='Model name sent to the endpoint.')
+    parser.add_argument('--json_mode', action='store_true', help='Ask the API for JSON-only output to avoid malformed-JSON retries.')
+    parser.add_argument('--mock', action='store_true', help='Use the local engine-backed MockClient instead of an API.')
+    parser.add_argument('--mock_error_rate', type=float, default=0.1)
+    parser.add_argument('--mock_latency_ms', type=float, default=50)
+    parser.add_argument('--price_input', type=float, default=0.0, help='Price per million prompt tokens.')
+    parser.add_argument('--price_output', type=float, default=0.0, help='Price per million completion tokens.')
+    parser.add_argument('--report_path', type=str, default=None, help='Optional JSON file for the results.')
+
     args = parser.parse_args()
-    
-    api_client = OpenAIClient()
-    test_games = load_csv(args.test_data_path)
-    test_games = random.sample(test_games, args.num_positions)
-    run_llm_benchmark(api_client, test_games)
\ No newline at end of file
+
+    if args.mock:
+        api_client = MockClient(error_rate=args.mock_error_rate, latency_ms=args.mock_latency_ms)
+    else:
+        from src.utils.api_client import OpenAIClient
+
+        api_client = OpenAIClient(api_key=args.api_key, base_url=args.base_url, model=args.model)
+    positions = build_position_fixture(args.test_data_path, args.num_positions, args.seed, args.fixture_path)
+    cache = ResponseCache(args.cache_path) if args.cache_path else None
+    report = run_llm_benchmark(api_client, positions, json_mode=args.json_mode, concurrency=args.concurrency,
+                               cache=cache, price_input=args.price_input, price_output=args.price_output)
+    if args.report_path:
+        with open(args.report_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), **report}, f, indent=2)
@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import random
+import time
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.env.othello_game import Othello
+from src.env.mcts import MCTS, FeatureEvaluator, HeuristicEvaluator, RolloutEvaluator
+
+
+class SimulatedModelEvaluator:
+    """Adds a fixed per-call latency that releases the GIL, standing in for a batched model forward pass"""
+
+    def __init__(self, evaluator, latency_ms: float):
+        self.evaluator = evaluator
+        self.latency = latency_ms / 1000
+
+    def __call__(self, games):
+        time.sleep(self.latency)
+        return self.evaluator(games)
+
+
+def benchmark_positions(num_positions: int, plies: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < num_positions:
+        game = Othello()
+        for _ in range(plies):
+            if game.game_over:
+                break
+            game.move(rng.choice(game.get_valid_moves()))
+        if not game.game_over:
+            positions.append(game)
+    return positions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure MCTS playouts/sec against thread count and leaf batch size.")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--evaluator', type=str, default='heuristic', choices=['heuristic', 'rollout', 'features'])
+    parser.add_argument('--eval_latency_ms', type=float, default=0.0,
+                        help='Simulated latency per evaluator call (e.g. a model forward pass); threads only help when this is > 0.')
+    parser.add_argument('--playouts', type=int, default=400, help='Playouts per position.')
+    parser.add_argument('--num_positions', type=int, default=5)
+    parser.add_argument('--plies', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report_path', type=str, default=None)
+
+    args = parser.parse_args()
+
+    positions = benchmark_positions(args.num_positions, args.plies, args.seed)
+    print(f"{len(positions)} positions, {args.playouts} playouts each, evaluator {args.evaluator}, "
+          f"latency {args.eval_latency_ms} ms/call, {os.cpu_count()} CPUs")
+    print(f"{'threads':>8s} {'batch':>6s} {'playouts/sec':>13s} {'batches':>8s} {'mean batch':>11s}")
+    rows = []
+    for num_threads in args.threads:
+        for batch_size in args.batch_sizes:
+            if args.evaluator == "rollout":
+                evaluator = RolloutEvaluator(seed=args.seed)
+            elif args.evaluator == "features":
+                evaluator = FeatureEvaluator()
+            else:
+                evaluator = HeuristicEvaluator()
+            if args.eval_latency_ms > 0:
+                evaluator = SimulatedModelEvaluator(evaluator, args.eval_latency_ms)
+
+            playouts, batches, evaluated, start = 0, 0, 0, time.perf_counter()
+            for game in positions:
+                # 每个局面使用新树，避免树复用影响计数
+                result = MCTS(evaluator, batch_size=batch_size, num_threads=num_threads).search(game, playouts=args.playouts)
+                playouts += result["playouts"]
+                batches += result["batches"]
+                evaluated += result["mean_batch_size"] * result["batches"]
+            elapsed = time.perf_counter() - start
+            row = {"threads": num_threads, "batch_size": batch_size, "playouts": playouts, "seconds": elapsed,
+                   "playouts_per_sec": playouts / elapsed, "batches": batches,
+                   "mean_batch_size": evaluated / batches if batches else 0.0}
+            rows.append(row)
+            print(f"{num_threads:>8d} {batch_size:>6d} {row['playouts_per_sec']:>13.1f} {batches:>8d} {row['mean_batch_size']:>11.2f}")
+
+    if args.report_path:
+        with open(args.report_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "cpu_count": os.cpu_count(), "results": rows}, f, indent=2)
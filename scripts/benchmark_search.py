@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import random
+import time
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.env.othello_game import Othello
+from src.env.parallel_search import ParallelSearch
+
+
+def benchmark_positions(num_positions: int, plies: int, seed: int = 0) -> list:
+    """Fixed midgame positions: `plies` random legal moves from the start, seeded"""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < num_positions:
+        game = Othello()
+        for _ in range(plies):
+            if game.game_over:
+                break
+            game.move(rng.choice(game.get_valid_moves()))
+        if not game.game_over:
+            positions.append(game)
+    return positions
+
+
+def run_search_benchmark(positions: list, workers: int, depth: int, endgame_depth: int, mode: str,
+                         evaluation: str = "weights") -> dict:
+    """Search every position with a fresh engine (pool start-up excluded) and return moves, nodes and time"""
+    with ParallelSearch(depth=depth, endgame_depth=endgame_depth, workers=workers, evaluation=evaluation) as engine:
+        moves, nodes = [], 0
+        start = time.perf_counter()
+        for game in positions:
+            if mode == "search":
+                moves.append(engine.search(game)["move"])
+            else:
+                scores = engine.score_moves(game)
+                moves.append(max(scores, key=scores.get))
+            nodes += engine.nodes
+        elapsed = time.perf_counter() - start
+    return {"workers": workers, "seconds": elapsed, "nodes": nodes,
+            "nodes_per_sec": nodes / elapsed if elapsed > 0 else 0.0, "moves": moves}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure multi-process search speed-up on a fixed position set.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--mode', type=str, default='search', choices=['search', 'score_moves'],
+                        help='search: lazy SMP best move; score_moves: root-split full-window score of every move.')
+    parser.add_argument('--num_positions', type=int, default=10)
+    parser.add_argument('--plies', type=int, default=20, help='Random moves played to reach each benchmark position.')
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--endgame_depth', type=int, default=0)
+    parser.add_argument('--evaluation', type=str, default='weights', choices=['weights', 'features'],
+                        help='Leaf evaluation: positional weight table, or batched positional features.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report_path', type=str, default=None)
+
+    args = parser.parse_args()
+
+    positions = benchmark_positions(args.num_positions, args.plies, args.seed)
+    print(f"{len(positions)} positions after {args.plies} plies, depth {args.depth}, mode {args.mode}, "
+          f"evaluation {args.evaluation}, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8s} {'seconds':>9s} {'nodes':>10s} {'nodes/sec':>11s} {'speedup':>8s} {'same move':>10s}")
+    rows = []
+    for workers in args.workers:
+        row = run_search_benchmark(positions, workers, args.depth, args.endgame_depth, args.mode, args.evaluation)
+        baseline = rows[0] if rows else row
+        row["speedup"] = baseline["seconds"] / row["seconds"] if row["seconds"] > 0 else 0.0
+        # 多进程 lazy SMP 不保证与单进程选同一步（同分着法或更深的辅助搜索）
+        row["same_move_rate"] = sum(a == b for a, b in zip(row["moves"], baseline["moves"])) / len(positions)
+        rows.append(row)
+        print(f"{workers:>8d} {row['seconds']:>9.2f} {row['nodes']:>10d} {row['nodes_per_sec']:>11.0f} "
+              f"{row['speedup']:>8.2f} {row['same_move_rate']:>10.2f}")
+
+    if args.report_path:
+        with open(args.report_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "cpu_count": os.cpu_count(), "results": rows}, f, indent=2)
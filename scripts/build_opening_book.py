@@ -0,0 +1,53 @@
+import argparse
+import time
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.env.othello_game import Othello
+from src.env.opening_book import OpeningBook, build_opening_book
+from src.utils.data_loader import load_csv
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the memory-mapped opening book from the eOthello game CSV.")
+    parser.add_argument('--raw_data_path', type=str, default='data/othello_dataset.csv', help='Path to the raw CSV game data.')
+    parser.add_argument('--output_path', type=str, default='data/opening_book.bin')
+    parser.add_argument('--max_plies', type=int, default=30, help='Index positions of the first max_plies moves of every game.')
+    parser.add_argument('--min_games', type=int, default=2, help='Leave out positions seen in fewer games.')
+    parser.add_argument('--max_games', type=int, default=None)
+    parser.add_argument('--num_lookups', type=int, default=20000, help='Book lookups timed after the build (0 disables).')
+
+    args = parser.parse_args()
+
+    games = load_csv(args.raw_data_path, args.max_games)
+    start = time.perf_counter()
+    stats = build_opening_book(games, args.output_path, max_plies=args.max_plies, min_games=args.min_games)
+    elapsed = time.perf_counter() - start
+    print(f"Indexed {stats['games']} games ({stats['skipped_games']} skipped) in {elapsed:.1f}s: "
+          f"{stats['positions']} positions, {stats['moves']} moves -> {args.output_path} "
+          f"({Path(args.output_path).stat().st_size / 2 ** 20:.1f} MiB)")
+
+    if args.num_lookups and games:
+        # 按棋谱复盘出开局段局面，计时查询本身
+        positions = []
+        for record in games:
+            game = Othello(record_history=False)
+            try:
+                for pos in record['moves'][:args.max_plies]:
+                    positions.append(game.clone())
+                    game.move(pos)
+            except ValueError:
+                continue
+            if len(positions) >= args.num_lookups:
+                break
+        with OpeningBook(args.output_path, min_games=1) as book:
+            start = time.perf_counter()
+            for game in positions[:args.num_lookups]:
+                book.lookup(game)
+            elapsed = time.perf_counter() - start
+            lookups = min(len(positions), args.num_lookups)
+            print(f"{lookups} lookups in {elapsed:.3f}s ({lookups / elapsed:.0f}/sec, {1e6 * elapsed / lookups:.1f} us each), "
+                  f"hit rate {book.stats()['hit_rate']:.3f}")
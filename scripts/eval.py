@@ -1,143 +1,52 @@
-import os
-os.environ["CUDA_VISIBLE_DEVICES"] = "0"
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
-import random
+import argparse
 import json
-import re
-from datasets import load_dataset
+import random
+
 import sys
 from pathlib import Path
-from tqdm import tqdm
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from src.env.othello_game import Othello
-
-def parse_coord(coord):
-    """Convert 'a1' style coordinate to 0-based indices"""
-    if len(coord) < 2:
-        return None, None
-        
-    col, row = coord[0].lower(), coord[1:]
-    if not col.isalpha() or not row.isdigit():
-        return None, None
-        
-    col_idx = ord(col) - ord('a')
-    row_idx = int(row) - 1
-    
-    return (row_idx, col_idx) if 0 <= col_idx < 8 and 0 <= row_idx < 8 else (None, None)
-
-def to_coord(row_idx, col_idx):
-    """Convert 0-based indices to 'a1' style coordinate"""
-    return chr(col_idx + ord('a')) + str(row_idx + 1) if 0 <= row_idx < 8 and 0 <= col_idx < 8 else None
-
-model_id = "Qwen/Qwen3-4B-Instruct-2507"
-model_path = "/data/data_public/zjy/Othello-Qwen/trainer_output/checkpoint-17934"
-
-data_path = "/data/data_public/zjy/Othello-Qwen/data/test_data_tasks_1_2.jsonl"
-
-tokenizer = AutoTokenizer.from_pretrained(model_id)
-
-model = AutoModelForCausalLM.from_pretrained(
-    model_id,
-    trust_remote_code=True,
-    device_map="cuda:0" 
-)
-model.eval()
-
-dataset = load_dataset("json", data_files=data_path)['train']
-
-task1_valid_cnt = 0
-task1_invalid_cnt = 0
-directions = [(-1, -1), (-1, 0), (-1, 1),
-            (0, -1),           (0, 1),
-            (1, -1),  (1, 0),  (1, 1)]
-task2_correct_cnt = 0
-task2_wrong_cnt = 0
-task2_missed_cnt = 0
-with torch.no_grad():
-    for _ in tqdm(range(500)):
-
-        datum = dataset[random.randint(0, len(dataset))]
-        input_text = datum['prompt']
-
-        inputs = tokenizer(input_text, return_tensors="pt").to(model.device)
-
-        outputs = model.generate(
-            inputs["input_ids"],
-            max_length=4096,
-            temperature=0.7
-        )
-
-        generated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-
-        try:
-            end_idx = input_text.index('Analyze a diverse sample of squares to determine which are plausible candidates for a legal move.') 
-        except:
-            end_idx = input_text.index('Plausible Candidates to Analyze:')
-        board_state = json.loads(input_text[input_text.index("Board State:")+len("Board State:"):end_idx].replace("'", '"'))
-        board_state['black'], board_state['white'] = board_state['black_pieces'], board_state['white_pieces']
-        player = input_text[input_text.index('Player to move: ')+len('Player to move: '):input_text.index('Player to move: ')+len('Player to move: ')+5].lower()
-        opponent = "black" if player == "white" else "white"
-        try:
-            result = json.loads(generated_text[len(input_text):])
-        except:
-            continue
-
-        if 'Analyze Sampled Squares and Identify Plausible Candidates' in generated_text:
-            valid_output, invalid_output = set(), set()
-            opponent_pos = board_state['black_pieces'] if opponent == 'black' else board_state['white_pieces']
-            for pos in result["final_plausible_candidates"]:
-                row, col = parse_coord(pos)
-
-                for dr, dc in directions:
-                    nr, nc = row + dr, col + dc
-
-                    if 0<=nr<8 and 0<=nc<8 and to_coord(nr, nc) in opponent_pos:
-                            valid_output.add(pos)
-                            break
-                else:
-                    invalid_output.add(pos)
-            
-
-            task1_valid_cnt += len(valid_output)
-            task1_invalid_cnt += len(invalid_output)
-            
-            print(f"Task1: valid:{task1_valid_cnt}, invalid:{task1_invalid_cnt}\n")
-
-        elif "Analyze Plausible Candidates for Legality" in generated_text:
-            game = Othello()
-            game.set_board_state(board_state, player)
-            valid_moves = game.get_valid_moves()
-            output = result['final_legal_moves']
-            actual_moves = set(valid_moves)
-            predicted_moves = set(output) 
-
-            correct_predictions = actual_moves & predicted_moves  
-            correct_count = len(correct_predictions)
-
-            wrong_predictions = predicted_moves - actual_moves 
-            wrong_count = len(wrong_predictions)
-
-            missed_moves = actual_moves - predicted_moves
-            missed_count = len(missed_moves)
-
-            print("Task2:")
-            # print(f"correct {correct_count} 个 ({sorted(correct_predictions)})")
-            # print(f"wrong: {wrong_count} 个 ({sorted(wrong_predictions)})")
-            # print(f"missed: {missed_count} 个 ({sorted(missed_moves)})")
-            task2_correct_cnt += correct_count
-            task2_wrong_cnt += wrong_count
-            task2_missed_cnt += missed_count
-            precision = task2_correct_cnt / (task2_correct_cnt + task2_wrong_cnt)
-            recall = task2_correct_cnt / (task2_correct_cnt + task2_missed_cnt)
-            f1_score =  2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-            print(f"Precision: {precision:.4f}, Recall: {recall:.4f}, F1-Score: {f1_score:.4f}")
-            # print(f"total: correct: {task2_correct_cnt}, wrong: {task2_wrong_cnt}, missed: {task2_missed_cnt}")
-            
-        else:
-            # assert False, "invalid output"
-            print("invalid output")
-
-        print("-"*100+"\n")
\ No newline at end of file
+from src.env.othello_agent import OthelloAgent
+from src.eval.harness import evaluate, load_eval_samples
+from src.utils.token_budget import TokenBudgetPredictor
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Batched, reproducible Task 1/Task 2 evaluation scored by the Othello engine.")
+    parser.add_argument('--data_path', type=str, required=True, help='Generated data (file, shard directory or index.json) with position metadata.')
+    parser.add_argument('--base_model_id', type=str, default='Qwen/Qwen3-4B-Instruct-2507')
+    parser.add_argument('--adapter_path', type=str, default=None, help='LoRA adapter or checkpoint to evaluate.')
+    parser.add_argument('--device', type=str, default='auto')
+    parser.add_argument('--tasks', type=str, default='1,2', help='Comma-separated tasks to evaluate (1, 2).')
+    parser.add_argument('--num_samples', type=int, default=500, help='Samples drawn per task.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max_batch_size', type=int, default=8)
+    parser.add_argument('--max_batch_tokens', type=int, default=32768)
+    parser.add_argument('--token_budget', type=str, default=None, help='Token budget model from scripts/fit_token_budget.py.')
+    parser.add_argument('--constrained_decoding', type=str, default=None, choices=['schema', 'schema_final_only'])
+    parser.add_argument('--report_path', type=str, default='eval_report.json')
+    parser.add_argument('--predictions_path', type=str, default=None, help='Optional JSONL file with every output and its score inputs.')
+
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    tasks = [f"Task{task}" for task in args.tasks.split(',')]
+    samples, skipped = load_eval_samples(args.data_path, tasks, args.num_samples, seed=args.seed)
+    print(f"Loaded {len(samples)} samples ({skipped} records without metadata skipped)")
+
+    agent = OthelloAgent(args.base_model_id, args.adapter_path, device=args.device,
+                         max_batch_size=args.max_batch_size, max_batch_tokens=args.max_batch_tokens,
+                         constrained_decoding=args.constrained_decoding)
+    token_budget = TokenBudgetPredictor.load(args.token_budget) if args.token_budget else None
+    report = evaluate(agent, samples, token_budget=token_budget, predictions_path=args.predictions_path)
+    report["config"] = vars(args)
+    report["skipped_without_metadata"] = skipped
+
+    for task_name, task_report in report["tasks"].items():
+        print(f"{task_name}: P {task_report['precision']:.4f} R {task_report['recall']:.4f} F1 {task_report['f1']:.4f} | "
+              f"parse failures {task_report['parse_failures']}/{task_report['samples']} | "
+              f"{task_report['samples_per_sec']:.2f} samples/sec, {task_report['tokens_per_sec']:.1f} tokens/sec")
+    with open(args.report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.report_path}")
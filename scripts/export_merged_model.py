@@ -0,0 +1,46 @@
+import argparse
+import json
+import os
+import time
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+from peft import PeftModel
+
+
+def export_merged_model(base_model_id: str, adapter_path: str, output_dir: str, max_shard_size: str = "2GB"):
+    """
+    Merge a LoRA adapter into its base model and save the result as safetensors.
+    The merged directory can be passed to OthelloAgent as base_model_id with adapter_path=None,
+    which skips PEFT entirely and lets transformers memory-map the weights at load time.
+    """
+    start = time.perf_counter()
+    print(f"Loading base model: {base_model_id}...")
+    tokenizer = AutoTokenizer.from_pretrained(base_model_id, trust_remote_code=True)
+    base_model = AutoModelForCausalLM.from_pretrained(
+        base_model_id,
+        torch_dtype=torch.bfloat16,
+        device_map="cpu",
+        trust_remote_code=True,
+    )
+
+    print(f"Merging LoRA adapter from: {adapter_path}...")
+    model = PeftModel.from_pretrained(base_model, adapter_path).merge_and_unload()
+
+    print(f"Saving merged model to {output_dir}...")
+    model.save_pretrained(output_dir, safe_serialization=True, max_shard_size=max_shard_size)
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, "merged_from.json"), "w", encoding="utf-8") as f:
+        json.dump({"base_model_id": base_model_id, "adapter_path": adapter_path}, f, indent=2)
+    print(f"Done in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Merge a LoRA adapter into the base model and export safetensors.")
+    parser.add_argument('--base_model_id', type=str, default='Qwen/Qwen3-4B-Instruct-2507')
+    parser.add_argument('--adapter_path', type=str, required=True, help='Trained LoRA adapter directory.')
+    parser.add_argument('--output_dir', type=str, required=True, help='Directory for the merged model.')
+    parser.add_argument('--max_shard_size', type=str, default='2GB', help='Maximum size of each safetensors shard.')
+
+    args = parser.parse_args()
+    export_merged_model(args.base_model_id, args.adapter_path, args.output_dir, args.max_shard_size)
@@ -0,0 +1,66 @@
+import argparse
+import json
+import random
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from transformers import AutoTokenizer
+
+from src.env.othello_game import Othello
+from src.utils.data_loader import load_csv
+from src.data_process.cot_core import generate_rule_based_cot
+from src.utils.token_budget import TokenBudgetPredictor, budget_features
+
+
+def collect_samples(games_data: list, tokenizer):
+    """Replay every game and pair the budget features of each position with the token count of its completion"""
+    samples = {"Task1": ([], []), "Task2": ([], [])}
+    for game_data in games_data:
+        game = Othello()
+        for move in game_data['moves']:
+            if game.game_over:
+                break
+            cot = generate_rule_based_cot(game)
+            task1_cot, task2_cot = cot['task1_cot'], cot['task2_cot']
+            completions = {
+                "Task1": (json.dumps(task1_cot, indent=2), {}),
+                "Task2": (json.dumps(task2_cot, indent=2), {"plausible_candidates": task1_cot['final_plausible_candidates']}),
+            }
+            for task_name, (completion, prompt_kwargs) in completions.items():
+                features, token_counts = samples[task_name]
+                features.append(budget_features(task_name, game, **prompt_kwargs))
+                token_counts.append(len(tokenizer(completion, add_special_tokens=False)["input_ids"]))
+            try:
+                game.move(move)
+            except ValueError:
+                break
+    return samples
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fit the per-task max_new_tokens predictor on rule-based completions.")
+    parser.add_argument('--raw_data_path', type=str, default='data/othello_dataset.csv', help='Path to the raw CSV game data.')
+    parser.add_argument('--base_model_id', type=str, default='Qwen/Qwen3-4B-Instruct-2507', help='Tokenizer used to count completion tokens.')
+    parser.add_argument('--max_games', type=int, default=200, help='Number of games sampled from the CSV.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--relative_margin', type=float, default=0.1, help='Fraction added on top of the prediction.')
+    parser.add_argument('--quantile', type=float, default=0.99, help='Residual quantile added as an absolute margin.')
+    parser.add_argument('--output_path', type=str, default='config/token_budget.json')
+
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.base_model_id, trust_remote_code=True)
+    games_data = load_csv(args.raw_data_path)
+    games_data = random.sample(games_data, min(args.max_games, len(games_data)))
+
+    predictor = TokenBudgetPredictor(relative_margin=args.relative_margin, quantile=args.quantile)
+    for task_name, (features, token_counts) in collect_samples(games_data, tokenizer).items():
+        report = predictor.fit(task_name, features, token_counts)
+        print(f"{task_name}: {report['samples']} samples, max {report['max_tokens']} tokens, "
+              f"mean budget {report['mean_budget']:.1f}, truncation rate {report['truncation_rate']:.4f}")
+    predictor.save(args.output_path)
+    print(f"Token budget model saved to {args.output_path}")
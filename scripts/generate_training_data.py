@@ -2,6 +2,7 @@ import json
 from tqdm import tqdm
 import argparse
 import random
+import time
 
 import sys
 from pathlib import Path
@@ -11,35 +12,92 @@ sys.path.append(str(Path(__file__).parent.parent))
 from src.env.othello_game import Othello
 from src.utils.data_loader import load_csv
 from src.data_process.cot_core import generate_rule_based_cot, generate_strategic_cot_task3
+from src.data_process.prompts import build_prompt
 from src.utils.api_client import OpenAIClient
+from src.utils.jsonl_io import ShardedJsonlWriter
+from src.data_process.selfplay import self_play_games
+from src.data_process.search_teacher import SearchTeacher
+from src.tournament.players import parse_player_spec, spec_name
+
+def position_metadata(task_name: str, game: Othello, game_id, move_index: int, **fields) -> dict:
+    """
+    Structured description of the position behind a sample, so evaluation can rebuild the game
+    without parsing the prompt. Every task writes the same keys (empty lists when unused) to keep
+    the column schema uniform across shards.
+    """
+    metadata = {
+        "task": task_name,
+        "game_id": game_id,
+        "move_index": move_index,
+        "player": game.current_player,
+        "black": sorted(game.black),
+        "white": sorted(game.white),
+        "plausible_candidates": [],
+        "legal_moves": [],
+        "ground_truth_move": None,
+    }
+    metadata.update(fields)
+    return metadata
 
 def create_training_data(args):
     """
     [V3] Main orchestrator for generating training data.
     """
-    print(f"Loading raw game data from {args.raw_data_path}...")
-    games_data = load_csv(args.raw_data_path)
-    games_data = random.sample(games_data, args.max_games)
-    random.shuffle(games_data)
+    if args.source == 'selfplay':
+        # generate_rule_based_cot 的负采样使用全局 random，固定种子使整个输出可复现
+        random.seed(args.seed)
+        black_spec, white_spec = parse_player_spec(args.black_policy), parse_player_spec(args.white_policy)
+        print(f"Self-playing {args.max_games} games: {spec_name(black_spec)} (black) vs {spec_name(white_spec)} (white), "
+              f"{args.selfplay_workers} worker(s), seed {args.seed}")
+        games_data = self_play_games(args.max_games, black_spec, white_spec, workers=args.selfplay_workers,
+                                     seed=args.seed, random_opening_plies=args.random_opening_plies)
+    else:
+        print(f"Loading raw game data from {args.raw_data_path}...")
+        games_data = load_csv(args.raw_data_path)
+        games_data = random.sample(games_data, args.max_games)
+        random.shuffle(games_data)
     
     tasks_to_run = set(args.tasks)
     
-    # 只有在需要生成任务3数据时才初始化API客户端
-    api_client = OpenAIClient() if '3' in tasks_to_run else None
+    # 只有在需要生成任务3数据且使用 LLM 时才初始化API客户端
+    api_client = OpenAIClient() if '3' in tasks_to_run and args.task3_teacher != 'search' else None
+    teacher = None
+    if '3' in tasks_to_run and args.task3_teacher != 'llm':
+        teacher = SearchTeacher(depth=args.teacher_depth, endgame_depth=args.teacher_endgame_depth,
+                                workers=args.teacher_workers, api_client=api_client)
+
+    def write_task3(f_out, game, game_id, move_index, legal_moves, ground_truth_move, task3_cot):
+        prompt3_content = build_prompt("Task3", game, layout=args.prompt_layout, legal_moves=legal_moves)
+        prompt_task3 = [{"role": "user", "content": prompt3_content}]
+        completion_task3 = [{"role": "assistant", "content": json.dumps(task3_cot, indent=2)}]
+        f_out.write({"prompt": prompt_task3, "completion": completion_task3,
+                     "metadata": position_metadata("Task3", game, game_id, move_index,
+                                                   legal_moves=sorted(legal_moves),
+                                                   ground_truth_move=ground_truth_move)})
     
-    with open(args.output_path, 'w', encoding='utf-8') as f_out:
-        for game_data in tqdm(games_data, desc="Processing Games"):
+    writer = ShardedJsonlWriter(
+        args.output_path,
+        compression=args.compression,
+        shard_size_mb=args.shard_size_mb,
+        buffer_size_mb=args.buffer_size_mb,
+    )
+    start_time = time.perf_counter()
+    num_positions = 0
+    with writer as f_out:
+        for game_index, game_data in enumerate(tqdm(games_data, desc="Processing Games", total=args.max_games), 1):
             moves = game_data['moves']
             
+            game = Othello()
+            teacher_positions = []
             for move_index, ground_truth_move in enumerate(moves):
-                game = Othello()
-                # Replay game to the state BEFORE the current move
-                for i in range(move_index):
+                # Advance to the state BEFORE the current move; replaying from scratch each time is quadratic
+                if move_index > 0:
                     try:
-                        game.move(moves[i])
+                        game.move(moves[move_index - 1])
                     except ValueError:
                         print(f"Skipping invalid move sequence in game {game_data['id']}.")
-                        continue
+                        break
+                num_positions += 1
                 
                 # --- Generate Task 1 & 2 Data (Rule-based) ---
                 if '1' in tasks_to_run or '2' in tasks_to_run or '3' in tasks_to_run:
@@ -53,35 +111,78 @@ def create_training_data(args):
 
                 # --- Write Task 1 Data ---
                 if '1' in tasks_to_run:
-                    prompt1_content = f"Task: Analyze Sampled Squares and Identify Plausible Candidates\nPlayer to move: {game.current_player.capitalize()}\nOpponent: {game.current_opponent}\nBoard State:\n{{\n  \"black_pieces\": {sorted(list(game.black))},\n  \"white_pieces\": {sorted(list(game.white))}\n}}\n\nAnalyze a diverse sample of squares to determine which are plausible candidates for a legal move. A plausible candidate must be an empty square adjacent to an opponent's piece. Conclude with a final_plausible_candidates list containing only the squares identified as plausible."
-                    f_out.write(json.dumps({"prompt": prompt1_content, "completion": json.dumps(task1_cot, indent=2)}) + '\n')
+                    prompt1_content = build_prompt("Task1", game, layout=args.prompt_layout)
+                    f_out.write({"prompt": prompt1_content, "completion": json.dumps(task1_cot, indent=2),
+                                 "metadata": position_metadata("Task1", game, game_data['id'], move_index)})
                 
                 # --- Write Task 2 Data ---
                 if '2' in tasks_to_run:
-                    prompt2_content = f"Task: Analyze Plausible Candidates for Legality\nPlayer to move: {game.current_player.capitalize()}\nOpponent: {game.current_opponent}\nBoard State:\n{{\n  \"black_pieces\": {sorted(list(game.black))},\n  \"white_pieces\": {sorted(list(game.white))}\n}}\nPlausible Candidates to Analyze:\n{task1_cot['final_plausible_candidates']}\n\nFor each plausible candidate, determine if it is a legal move by checking the flanking rule. Your analysis must cover every candidate. Conclude with a `final_legal_moves` list containing only the moves confirmed as legal."
-                    f_out.write(json.dumps({"prompt": prompt2_content, "completion": json.dumps(task2_cot, indent=2)}) + '\n')
+                    prompt2_content = build_prompt("Task2", game, layout=args.prompt_layout, plausible_candidates=task1_cot['final_plausible_candidates'])
+                    f_out.write({"prompt": prompt2_content, "completion": json.dumps(task2_cot, indent=2),
+                                 "metadata": position_metadata("Task2", game, game_data['id'], move_index,
+                                                               plausible_candidates=task1_cot['final_plausible_candidates'])})
 
-                # --- Generate and Write Task 3 Data (API-based) ---
+                # --- Generate and Write Task 3 Data ---
                 if '3' in tasks_to_run:
                     legal_moves = task2_cot['final_legal_moves']
+                    if teacher is not None:
+                        # Task 2 的合法着法只覆盖前若干个候选，搜索教师需要全部合法着法
+                        legal_moves = game.get_valid_moves()
+                        if ground_truth_move not in legal_moves:
+                            print(f"Warning: Ground truth move {ground_truth_move} is not legal in game {game_data['id']}. Skipping Task 3.")
+                            continue
+                        # 搜索教师按整局批量在进程池中分析，这里先保存局面快照
+                        snapshot = Othello()
+                        snapshot.set_board_state({'black': game.black, 'white': game.white}, game.current_player)
+                        teacher_positions.append((snapshot, move_index, legal_moves, ground_truth_move))
+                        continue
                     if ground_truth_move not in legal_moves:
                         print(f"Warning: Ground truth move {ground_truth_move} not in generated legal moves for game {game_data['id']}. Skipping Task 3.")
                         continue
                     
                     task3_cot = generate_strategic_cot_task3(game, legal_moves, ground_truth_move, api_client)
                     if task3_cot: # If API call was successful
-                        prompt3_content = f"Task: Select the Best Strategic Move\nPlayer to move: {game.current_player.capitalize()}\nBoard State:\n{{\n  \"black_pieces\": {sorted(list(game.black))},\n  \"white_pieces\": {sorted(list(game.white))}\n}}\nLegal Moves:\n{legal_moves}\n\nFrom the list of legal moves, determine which move is the absolute best and provide a step-by-step reasoning for your choice, explaining why it is superior to some other alternatives."
-                        prompt_task3 = [{"role": "user", "content": prompt3_content}]
-                        completion_task3 = [{"role": "assistant", "content": json.dumps(task3_cot, indent=2)}]
-                        f_out.write(json.dumps({"prompt": prompt_task3, "completion": completion_task3}) + '\n')
+                        write_task3(f_out, game, game_data['id'], move_index, legal_moves, ground_truth_move, task3_cot)
+
+            if teacher_positions:
+                snapshots = [position[0] for position in teacher_positions]
+                completions = teacher.label(snapshots, [position[2] for position in teacher_positions])
+                for (snapshot, move_index, legal_moves, ground_truth_move), task3_cot in zip(teacher_positions, completions):
+                    write_task3(f_out, snapshot, game_data['id'], move_index, legal_moves, ground_truth_move, task3_cot)
+
+            # 定期落盘并刷新 index.json，长时间运行中途中断也能使用已生成的数据
+            if args.flush_every and game_index % args.flush_every == 0:
+                f_out.flush()
+                elapsed = time.perf_counter() - start_time
+                print(f"{game_index} games, {num_positions} positions, {writer.total} samples, {num_positions / elapsed:.0f} positions/sec")
 
-    print(f"Training data generation complete. Output at {args.output_path}")
+    if teacher is not None:
+        teacher.close()
+    elapsed = time.perf_counter() - start_time
+    print(f"Training data generation complete. {writer.total} samples in {len(writer.shards)} shard(s) at {args.output_path}")
+    print(f"{num_positions} positions in {elapsed:.1f}s ({num_positions / elapsed if elapsed > 0 else 0.0:.0f} positions/sec)")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Generate CoT training data for Othello.")
     parser.add_argument('--raw_data_path', type=str, default='data/othello_dataset.csv', help='Path to the raw CSV game data.')
-    parser.add_argument('--output_path', type=str, default='data/test_data_tasks_1_2.jsonl', help='Path to save the generated JSONL file.')
-    parser.add_argument('--max_games', type=int, default=10, help='Maximum number of games to process from the CSV.')
+    parser.add_argument('--output_path', type=str, default='data/test_data_tasks_1_2', help='Directory to save the generated JSONL shards and index.json.')
+    parser.add_argument('--compression', type=str, default='gzip', choices=['gzip', 'zstd', 'none'], help='Compression applied to each shard.')
+    parser.add_argument('--shard_size_mb', type=float, default=256, help='Uncompressed size at which a new shard is started (0 = single shard).')
+    parser.add_argument('--buffer_size_mb', type=float, default=8, help='Size of the in-memory write buffer.')
+    parser.add_argument('--max_games', type=int, default=10, help='Maximum number of games to process from the CSV (or to self-play).')
+    parser.add_argument('--source', type=str, default='csv', choices=['csv', 'selfplay'], help='Take games from --raw_data_path or generate them by self-play.')
+    parser.add_argument('--black_policy', type=str, default='epsilon_greedy:epsilon=0.2', help='Self-play policy for black: random, greedy, epsilon_greedy:epsilon=0.1, search:depth=2.')
+    parser.add_argument('--white_policy', type=str, default='epsilon_greedy:epsilon=0.2', help='Self-play policy for white.')
+    parser.add_argument('--random_opening_plies', type=int, default=4, help='Uniformly random moves at the start of every self-play game.')
+    parser.add_argument('--selfplay_workers', type=int, default=4, help='Processes playing self-play games.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the self-play games.')
+    parser.add_argument('--task3_teacher', type=str, default='llm', choices=['llm', 'search', 'search+llm'],
+                        help='Task 3 labels from the remote LLM, from a local search (offline), or from the search with LLM-written explanations.')
+    parser.add_argument('--teacher_depth', type=int, default=2, help='Search depth used to score every legal move for Task 3.')
+    parser.add_argument('--teacher_endgame_depth', type=int, default=10, help='Solve Task 3 positions exactly with this many or fewer empty squares.')
+    parser.add_argument('--teacher_workers', type=int, default=4, help='Processes used by the search teacher.')
+    parser.add_argument('--flush_every', type=int, default=1000, help='Flush shards and report positions/sec every N games (0 disables).')
+    parser.add_argument('--prompt_layout', type=str, default='legacy', choices=['legacy', 'shared_prefix'], help='Prompt layout; shared_prefix lets the agent reuse the KV cache between tasks.')
     parser.add_argument('--tasks', type=str, default='1,2', help='Comma-separated list of tasks to generate data for (e.g., "1,2", "3", "1,2,3").')
     
     args = parser.parse_args()
@@ -0,0 +1,259 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.env.othello_game import Othello
+from src.utils.data_loader import load_csv
+from src.data_process.cot_core import _find_flank_details, generate_rule_based_cot
+from src.data_process.prompts import build_prompt
+from src.env.features import position_features
+
+
+def random_game_moves(rng: random.Random) -> list:
+    """Move list of one complete game with uniformly random legal moves"""
+    game, moves = Othello(), []
+    while not game.game_over:
+        moves.append(rng.choice(game.get_valid_moves()))
+        game.move(moves[-1])
+    return moves
+
+
+def build_fixture(num_games: int, num_positions: int, seed: int) -> dict:
+    """Fixed-seed inputs shared by every benchmark: full games and mid-game positions with legal moves"""
+    rng = random.Random(seed)
+    games = [random_game_moves(rng) for _ in range(num_games)]
+    positions = []
+    while len(positions) < num_positions:
+        moves = games[len(positions) % num_games]
+        game = Othello()
+        for pos in moves[:rng.randint(0, len(moves) - 1)]:
+            game.move(pos)
+        if game.get_valid_moves():
+            positions.append(game)
+    return {"games": games, "positions": positions}
+
+
+def write_fixture_csv(games: list, path: str):
+    """Write games in the column layout of the eOthello dataset that load_csv reads"""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["eOthello_game_id", "winner", "game_moves"])
+        writer.writeheader()
+        for i, moves in enumerate(games):
+            writer.writerow({"eOthello_game_id": i, "winner": str(i % 2), "game_moves": "".join(moves)})
+
+
+def make_benchmarks(fixture: dict, csv_path: str) -> dict:
+    """name -> (callable running one iteration, number of operations per iteration)"""
+    games, positions = fixture["games"], fixture["positions"]
+    move_pairs = [(game, game.get_valid_moves()[0]) for game in positions]
+    flank_pairs = [(game, pos) for game in positions for pos in game.get_plausible_candidates()]
+
+    def valid_moves():
+        for game in positions:
+            game.get_valid_moves()
+
+    def move():
+        # move() 后用 unmake() 还原，保证每轮输入相同
+        for game, pos in move_pairs:
+            game.move(pos)
+            game.unmake()
+
+    def replay():
+        for moves in games:
+            game = Othello()
+            for pos in moves:
+                game.move(pos)
+
+    def replay_lightweight():
+        for moves in games:
+            game = Othello(record_history=False)
+            for pos in moves:
+                game.move(pos)
+
+    def clone():
+        for game in positions:
+            game.clone()
+
+    # 同时持有所有局面，峰值内存除以局面数即单个实例的大小
+    def hold_games(record_history):
+        def run():
+            held = []
+            for game in positions:
+                copy = Othello(record_history=record_history)
+                for pos in game.played_moves():
+                    copy.move(pos)
+                held.append(copy)
+            return held
+        return run
+
+    def features_batched():
+        position_features(positions)
+
+    def features_single():
+        for game in positions:
+            position_features([game])
+
+    def rule_based_cot():
+        # generate_rule_based_cot 内部使用全局 random 做负采样
+        random.seed(0)
+        for game in positions:
+            generate_rule_based_cot(game)
+
+    def flank_details():
+        for game, pos in flank_pairs:
+            _find_flank_details(game, pos)
+
+    def csv_load():
+        load_csv(csv_path)
+
+    def prompt_build():
+        for game in positions:
+            build_prompt("Task1", game)
+            build_prompt("Task2", game, plausible_candidates=game.get_plausible_candidates())
+            build_prompt("Task3", game, legal_moves=game.get_valid_moves())
+
+    return {
+        "get_valid_moves": (valid_moves, len(positions)),
+        "move": (move, len(move_pairs)),
+        "game_replay": (replay, len(games)),
+        "game_replay_lightweight": (replay_lightweight, len(games)),
+        "clone": (clone, len(positions)),
+        "hold_games_full": (hold_games(True), len(positions)),
+        "hold_games_lightweight": (hold_games(False), len(positions)),
+        "position_features": (features_batched, len(positions)),
+        "position_features_single": (features_single, len(positions)),
+        "generate_rule_based_cot": (rule_based_cot, len(positions)),
+        "find_flank_details": (flank_details, len(flank_pairs)),
+        "load_csv": (csv_load, len(games)),
+        "prompt_build": (prompt_build, 3 * len(positions)),
+    }
+
+
+def run_benchmark(fn, ops: int, warmup: int, repeats: int) -> dict:
+    """Time `repeats` iterations after `warmup` untimed ones, then measure the peak allocation of one more"""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    # tracemalloc 会显著拖慢执行，因此单独跑一轮只测内存
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(timings)
+    return {
+        "ops": ops,
+        "repeats": repeats,
+        "min_s": min(timings),
+        "median_s": median,
+        "mean_s": statistics.mean(timings),
+        "stdev_s": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "us_per_op": median / ops * 1e6,
+        "ops_per_sec": ops / median if median > 0 else 0.0,
+        "peak_memory_kb": peak / 1024,
+        "peak_bytes_per_op": peak / ops,
+    }
+
+
+def compare_to_baseline(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Regressions of the median time per op or of the memory peak by more than `threshold` (relative).
+    Benchmarks missing from either side are skipped.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ("us_per_op", "peak_memory_kb"):
+            if previous[metric] > 0 and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append({
+                    "benchmark": name,
+                    "metric": metric,
+                    "baseline": previous[metric],
+                    "current": current[metric],
+                    "change": current[metric] / previous[metric] - 1,
+                })
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the game engine, CoT generation and prompt building.")
+    parser.add_argument('--benchmarks', type=str, nargs='+', default=None, help='Subset of benchmarks to run (default: all).')
+    parser.add_argument('--num_games', type=int, default=50, help='Random full games used for replay and load_csv.')
+    parser.add_argument('--num_positions', type=int, default=200, help='Mid-game positions used by the per-position benchmarks.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--output_path', type=str, default=None, help='Write the results as JSON.')
+    parser.add_argument('--baseline_path', type=str, default=None, help='Results JSON of an earlier run to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative slowdown (or memory growth) counted as a regression.')
+    parser.add_argument('--update_baseline', action='store_true', help='Overwrite --baseline_path with this run.')
+
+    args = parser.parse_args()
+
+    fixture = build_fixture(args.num_games, args.num_positions, args.seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "games.csv")
+        write_fixture_csv(fixture["games"], csv_path)
+        benchmarks = make_benchmarks(fixture, csv_path)
+        if args.benchmarks:
+            unknown = set(args.benchmarks) - set(benchmarks)
+            if unknown:
+                raise ValueError(f"Unknown benchmarks: {sorted(unknown)}. Must be among {list(benchmarks)}")
+            benchmarks = {name: benchmarks[name] for name in args.benchmarks}
+
+        results = {}
+        print(f"{'benchmark':<26s} {'ops':>6s} {'us/op':>10s} {'ops/sec':>12s} {'stdev %':>8s} {'peak KB':>10s} {'B/op':>8s}")
+        for name, (fn, ops) in benchmarks.items():
+            results[name] = run_benchmark(fn, ops, args.warmup, args.repeats)
+            row = results[name]
+            print(f"{name:<26s} {ops:>6d} {row['us_per_op']:>10.2f} {row['ops_per_sec']:>12.1f} "
+                  f"{100 * row['stdev_s'] / row['mean_s']:>8.1f} {row['peak_memory_kb']:>10.1f} {row['peak_bytes_per_op']:>8.0f}")
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("baseline_path", "update_baseline")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.baseline_path and os.path.exists(args.baseline_path) and not args.update_baseline:
+        with open(args.baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("seed") != args.seed:
+            print("Warning: baseline was recorded with a different seed; inputs differ.")
+        regressions = compare_to_baseline(results, baseline["results"], args.threshold)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"REGRESSION {r['benchmark']} {r['metric']}: {r['baseline']:.2f} -> {r['current']:.2f} ({100 * r['change']:+.1f}%)")
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"No regressions above {100 * args.threshold:.0f}% against {args.baseline_path}")
+
+    if args.output_path:
+        with open(args.output_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline_path and (args.update_baseline or not os.path.exists(args.baseline_path)):
+        with open(args.baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline_path}")
+    sys.exit(exit_code)
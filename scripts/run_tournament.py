@@ -0,0 +1,72 @@
+import argparse
+import json
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.env.mcts import AgentPriorEvaluator
+from src.env.opening_book import OpeningBook
+from src.tournament.players import AgentPlayer, BookPlayer, MCTSPlayer, parse_player_spec
+from src.tournament.runner import make_openings, run_tournament
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play a round robin or gauntlet between Othello players and rate them with Elo.")
+    parser.add_argument('--players', type=str, nargs='+', default=['random', 'greedy', 'search:depth=2'],
+                        help="Player specs: random, greedy, epsilon_greedy, search:depth=3,endgame_depth=10,evaluation=features, mcts:playouts=400,evaluator=rollout, "
+                             "any of them with book=<path>,book_min_games=10, "
+                             "agent or agent_mcts:playouts=200,batch_size=16 (both use the model options below).")
+    parser.add_argument('--format', type=str, default='round_robin', choices=['round_robin', 'gauntlet'], help='gauntlet: the first player meets every other one.')
+    parser.add_argument('--num_openings', type=int, default=20, help='Random openings per match; each is played with both colours.')
+    parser.add_argument('--opening_plies', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=4, help='Processes for matches between engine players.')
+    parser.add_argument('--games_per_chunk', type=int, default=8, help='Games handed to a worker at once.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bootstrap', type=int, default=200, help='Bootstrap samples for the Elo confidence intervals (0 disables).')
+    parser.add_argument('--report_path', type=str, default=None, help='Optional JSON file with standings and every game.')
+    parser.add_argument('--base_model_id', type=str, default='Qwen/Qwen3-4B-Instruct-2507')
+    parser.add_argument('--adapter_path', type=str, default=None)
+    parser.add_argument('--device', type=str, default='auto')
+    parser.add_argument('--pipeline_mode', type=str, default='llm', choices=['llm', 'engine_task1', 'verified'])
+    parser.add_argument('--max_batch_size', type=int, default=16)
+    parser.add_argument('--book_path', type=str, default=None,
+                        help='Opening book (scripts/build_opening_book.py) used by agent players; engine players take book=<path> in their spec.')
+    parser.add_argument('--book_min_games', type=int, default=10, help='Only play book moves of positions seen at least this often.')
+
+    args = parser.parse_args()
+
+    participants, agent = [], None
+    for text in args.players:
+        spec = parse_player_spec(text)
+        if spec["type"] in ("agent", "agent_mcts"):
+            from src.env.othello_agent import OthelloAgent
+
+            if agent is None:
+                book = OpeningBook(args.book_path, min_games=args.book_min_games) if args.book_path else None
+                agent = OthelloAgent(args.base_model_id, args.adapter_path, device=args.device,
+                                     max_batch_size=args.max_batch_size, pipeline_mode=args.pipeline_mode,
+                                     opening_book=book)
+            if spec["type"] == "agent":
+                participants.append(AgentPlayer(agent, name=spec.get("name", f"agent-{args.pipeline_mode}")))
+            else:
+                # MCTS 的叶子按批交给模型，模型给出先验，价值仍用启发式估值
+                options = {key: value for key, value in spec.items() if key not in ("type", "name")}
+                player = MCTSPlayer(evaluator=AgentPriorEvaluator(agent), name=spec.get("name", "agent-mcts"), **options)
+                participants.append(BookPlayer(player, agent.opening_book) if agent.opening_book is not None else player)
+        else:
+            participants.append(spec)
+
+    openings = make_openings(args.num_openings, args.opening_plies, seed=args.seed)
+    report = run_tournament(participants, openings, tournament_format=args.format, workers=args.workers,
+                            games_per_chunk=args.games_per_chunk, seed=args.seed, bootstrap_samples=args.bootstrap)
+
+    print(f"{len(report['games'])} games in {report['seconds']:.1f}s ({report['games_per_sec']:.2f} games/sec)")
+    print(f"{'player':<32s} {'games':>6s} {'score':>7s} {'elo':>8s} {'95% CI':>18s} {'forfeits':>9s}")
+    for row in report["standings"]:
+        ci = f"[{row['elo_ci'][0]:.0f}, {row['elo_ci'][1]:.0f}]" if row["elo_ci"] else "-"
+        print(f"{row['name']:<32s} {row['games']:>6d} {row['score_rate']:>7.3f} {row['elo']:>8.1f} {ci:>18s} {row['forfeits']:>9d}")
+    if args.report_path:
+        with open(args.report_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), **report}, f, indent=2)
@@ -0,0 +1,42 @@
+import argparse
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.env.opening_book import OpeningBook
+from src.env.othello_agent import OthelloAgent
+from src.serve.agent_server import AgentServer
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve one OthelloAgent over HTTP with dynamic micro-batching.")
+    parser.add_argument('--base_model_id', type=str, default='Qwen/Qwen3-4B-Instruct-2507')
+    parser.add_argument('--adapter_path', type=str, default=None)
+    parser.add_argument('--device', type=str, default='auto')
+    parser.add_argument('--pipeline_mode', type=str, default='llm', choices=['llm', 'engine_task1', 'verified'])
+    parser.add_argument('--backend', type=str, default='bf16', choices=['bf16', 'cpu_int8'], help='cpu_int8 runs a dynamically quantized model on the CPU.')
+    parser.add_argument('--num_threads', type=int, default=None, help='Number of torch CPU threads.')
+    parser.add_argument('--stage_metrics', action='store_true', help='Record per-stage timings, served at /metrics/prometheus.')
+    parser.add_argument('--metrics_jsonl', type=str, default=None, help='Also append one JSON record per call to this file.')
+    parser.add_argument('--book_path', type=str, default=None, help='Opening book (scripts/build_opening_book.py) answering /v1/choose_move without the model.')
+    parser.add_argument('--book_min_games', type=int, default=10, help='Only play book moves of positions seen at least this often.')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--unix_socket', type=str, default=None, help='Listen on a Unix socket instead of TCP.')
+    parser.add_argument('--max_batch_size', type=int, default=8, help='Maximum requests per micro-batch.')
+    parser.add_argument('--max_wait_ms', type=float, default=10, help='Maximum time the first request of a batch waits for others.')
+    parser.add_argument('--model_name', type=str, default='othello-agent', help='Model name reported by /v1/chat/completions.')
+
+    args = parser.parse_args()
+
+    agent = OthelloAgent(args.base_model_id, args.adapter_path, device=args.device,
+                         max_batch_size=args.max_batch_size, pipeline_mode=args.pipeline_mode,
+                         backend=args.backend, num_threads=args.num_threads,
+                         opening_book=OpeningBook(args.book_path, min_games=args.book_min_games) if args.book_path else None)
+    if args.stage_metrics or args.metrics_jsonl:
+        agent.metrics.enable(args.metrics_jsonl)
+    server = AgentServer(agent, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                         model_name=args.model_name)
+    server.run(host=args.host, port=args.port, unix_socket=args.unix_socket)
@@ -18,6 +18,9 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
 
+from src.utils.jsonl_io import resolve_data_files
+from src.train.callbacks import throughput_callback_from_config
+
 def train_model(config: dict):
     resume_checkpoint = config['training_params'].get('resume_from_checkpoint') 
     model_id = config['model_params']['model_id']
@@ -46,8 +49,9 @@ def train_model(config: dict):
     )
     
     print(f"Loading data from: {config['data_params']['dataset_path']}")
-    dataset_dict = load_dataset("json", data_files=config['data_params']['dataset_path'])
-    dataset = dataset_dict['train']
+    dataset_dict = load_dataset("json", data_files=resolve_data_files(config['data_params']['dataset_path']))
+    # 只保留训练用到的列，metadata 等评估用字段不进入 SFTTrainer
+    dataset = dataset_dict['train'].select_columns(["prompt", "completion"])
 
     peft_config = LoraConfig(** config['lora_params'])
 
@@ -65,6 +69,9 @@ def train_model(config: dict):
         args=training_args,
         peft_config=peft_config,
     )
+    throughput_callback = throughput_callback_from_config(config, script="train_sft")
+    if throughput_callback is not None:
+        trainer.add_callback(throughput_callback)
     
     print("Starting training...")
     trainer.train(resume_from_checkpoint=resume_checkpoint)
@@ -11,6 +11,13 @@ from trl import SFTTrainer, SFTConfig
 from peft import LoraConfig
 from datasets import load_dataset
 import yaml
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.utils.jsonl_io import resolve_data_files
+from src.train.callbacks import throughput_callback_from_config
 
 def train_model(config: dict):
     # DeepSpeed会自动初始化分布式环境
@@ -48,8 +55,9 @@ def train_model(config: dict):
         tokenizer.pad_token = tokenizer.eos_token
     
     # 加载数据
-    dataset_dict = load_dataset("json", data_files=config['data_params']['dataset_path'])
-    dataset = dataset_dict['train']
+    dataset_dict = load_dataset("json", data_files=resolve_data_files(config['data_params']['dataset_path']))
+    # 只保留训练用到的列，metadata 等评估用字段不进入 SFTTrainer
+    dataset = dataset_dict['train'].select_columns(["prompt", "completion"])
 
     # LoRA配置
     peft_config = LoraConfig(**config['lora_params'])
@@ -82,6 +90,9 @@ def train_model(config: dict):
         args=training_args,
         peft_config=peft_config,
     )
+    throughput_callback = throughput_callback_from_config(config, script="train_sft_deepspeed")
+    if throughput_callback is not None:
+        trainer.add_callback(throughput_callback)
     
     print("Starting DeepSpeed training...")
     trainer.train(resume_from_checkpoint=resume_checkpoint)
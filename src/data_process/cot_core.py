@@ -1,11 +1,12 @@
 import random
 import json
+from typing import TYPE_CHECKING
 
-import flash_attention
-from numpy import flip
-from peft import TaskType
-from src.env.othello_game import Othello
-from src.utils.api_client import OpenAIClient
+from src.env.othello_game import NEIGHBORS, Othello
+from src.env.features import describe_features, move_features, position_features
+
+if TYPE_CHECKING:
+    from src.utils.api_client import OpenAIClient
 
 def _find_flank_details(game: Othello, pos: str) -> dict:
     """
@@ -54,23 +55,11 @@ def generate_rule_based_cot(game: Othello) -> dict:
     occupied_squares = game.black | game.white
     
     # --- 任务一：识别和分析候选点 ---
-    plausible_candidates = set()
+    # 候选点就是对方棋子的边界空格，由 Othello 在走子时增量维护
+    plausible_candidates = set(game.frontier[game.current_opponent])
     adjacencies = {pos: [] for pos in all_squares}
-
-    for r_idx in range(game.size):
-        for c_idx in range(game.size):
-            pos = game._to_coord(r_idx, c_idx)
-            if pos in occupied_squares: continue
-            
-            for dr in [-1, 0, 1]:
-                for dc in [-1, 0, 1]:
-                    if dr == 0 and dc == 0: continue
-                    nr, nc = r_idx + dr, c_idx + dc
-                    if 0 <= nr < game.size and 0 <= nc < game.size:
-                        adj_pos = game._to_coord(nr, nc)
-                        if adj_pos in opponent_pieces:
-                            plausible_candidates.add(pos)
-                            adjacencies[pos].append(adj_pos)
+    for pos in plausible_candidates:
+        adjacencies[pos] = [adj_pos for adj_pos in NEIGHBORS[pos] if adj_pos in opponent_pieces]
 
     # 条件性负采样
     analysis_points = set(plausible_candidates)
@@ -136,7 +125,19 @@ def generate_rule_based_cot(game: Othello) -> dict:
     return {"task1_cot": task1_cot, "task2_cot": task2_cot}
 
 
-def generate_strategic_cot_task3(game: Othello, legal_moves: list, ground_truth_move: str, api_client: OpenAIClient) -> dict:
+def _task3_feature_context(game: Othello, legal_moves: list) -> str:
+    """Positional features of the current position and of the position after every legal move (one batched call each)"""
+    lines = ["- Position Features (side to move vs opponent):", describe_features(position_features([game])[0]),
+             "- After each legal move (player to move now vs opponent, measured after the move):"]
+    for pos, row in zip(legal_moves, move_features(game, legal_moves)):
+        lines.append(f"  - {pos}: mobility {row['mobility']} vs {row['opponent_mobility']}, "
+                     f"frontier {row['frontier']} vs {row['opponent_frontier']}, corners {row['corners']} vs {row['opponent_corners']}, "
+                     f"X/C-squares {row['x_squares'] + row['c_squares']} vs {row['opponent_x_squares'] + row['opponent_c_squares']}, "
+                     f"stable {row['stable']} vs {row['opponent_stable']}")
+    return "\n".join(lines)
+
+
+def generate_strategic_cot_task3(game: Othello, legal_moves: list, ground_truth_move: str, api_client: "OpenAIClient") -> dict:
     prompt = f"""You are a world-class Othello grandmaster. Your task is to analyze the board state and a list of legal moves, then explain why the given expert's choice is strategically superior.
 
 # Context
@@ -145,6 +146,7 @@ def generate_strategic_cot_task3(game: Othello, legal_moves: list, ground_truth_
   - Black Pieces: {sorted(list(game.black))}
   - White Pieces: {sorted(list(game.white))}
 - All Legal Moves: {legal_moves}
+{_task3_feature_context(game, legal_moves)}
 - The Expert's Choice: {ground_truth_move}
 
 # Task
@@ -0,0 +1,77 @@
+from typing import Tuple
+
+from src.env.othello_game import Othello
+
+# legacy: 任务说明在最前面（已有训练数据使用的格式）
+# shared_prefix: 固定说明 + 局面在前，任务说明在后，Task1/Task2 可以共享前缀的 KV cache
+PROMPT_LAYOUTS = ("legacy", "shared_prefix")
+
+STATIC_INSTRUCTION = (
+    "You are an Othello analysis assistant. The board is 8x8 with columns a-h and rows 1-8, "
+    "and pieces are listed by their coordinates. Read the position below, then complete the task "
+    "that follows it and answer with a single JSON object.\n"
+)
+
+TASK1_TITLE = "Task: Analyze Sampled Squares and Identify Plausible Candidates"
+TASK1_INSTRUCTION = (
+    "Analyze a diverse sample of squares to determine which are plausible candidates for a legal move. "
+    "A plausible candidate must be an empty square adjacent to an opponent's piece. Conclude with a "
+    "final_plausible_candidates list containing only the squares identified as plausible."
+)
+TASK2_TITLE = "Task: Analyze Plausible Candidates for Legality"
+TASK2_INSTRUCTION = (
+    "For each plausible candidate, determine if it is a legal move by checking the flanking rule. "
+    "Your analysis must cover every candidate. Conclude with a `final_legal_moves` list containing "
+    "only the moves confirmed as legal."
+)
+TASK3_TITLE = "Task: Select the Best Strategic Move"
+TASK3_INSTRUCTION = (
+    "From the list of legal moves, determine which move is the absolute best and provide a step-by-step "
+    "reasoning for your choice, explaining why it is superior to some other alternatives."
+)
+
+
+def format_board(game: Othello) -> str:
+    return f"{{\n  \"black_pieces\": {sorted(list(game.black))},\n  \"white_pieces\": {sorted(list(game.white))}\n}}"
+
+
+def build_prompt_parts(task_name: str, game: Othello, layout: str = "legacy", **kwargs) -> Tuple[str, str, str]:
+    """
+    Build a prompt as (static_prefix, position_block, task_block); joining the three gives the full prompt.
+
+    In the shared_prefix layout the static prefix is identical for every position and the
+    position block is identical for every task of the same position, so both can be prefilled once.
+    The legacy layout puts the task first and returns everything in the task block.
+    """
+    if layout not in PROMPT_LAYOUTS:
+        raise ValueError(f"Unknown prompt layout: {layout}. Must be one of {PROMPT_LAYOUTS}")
+
+    player_str = game.current_player.capitalize()
+    board_str = format_board(game)
+
+    if task_name == "Task1":
+        if layout == "legacy":
+            return "", "", f"{TASK1_TITLE}\nPlayer to move: {player_str}\nOpponent: {game.current_opponent}\nBoard State:\n{board_str}\n\n{TASK1_INSTRUCTION}"
+        task_block = f"{TASK1_TITLE}\n{TASK1_INSTRUCTION}"
+
+    elif task_name == "Task2":
+        plausible_candidates = kwargs.get("plausible_candidates", [])
+        if layout == "legacy":
+            return "", "", f"{TASK2_TITLE}\nPlayer to move: {player_str}\nOpponent: {game.current_opponent}\nBoard State:\n{board_str}\nPlausible Candidates to Analyze:\n{plausible_candidates}\n\n{TASK2_INSTRUCTION}"
+        task_block = f"{TASK2_TITLE}\nPlausible Candidates to Analyze:\n{plausible_candidates}\n\n{TASK2_INSTRUCTION}"
+
+    elif task_name == "Task3":
+        legal_moves = kwargs.get("legal_moves", [])
+        if layout == "legacy":
+            return "", "", f"{TASK3_TITLE}\nPlayer to move: {player_str}\nBoard State:\n{board_str}\nLegal Moves:\n{legal_moves}\n\n{TASK3_INSTRUCTION}"
+        task_block = f"{TASK3_TITLE}\nLegal Moves:\n{legal_moves}\n\n{TASK3_INSTRUCTION}"
+
+    else:
+        raise ValueError(f"Unknown task name: {task_name}")
+
+    position_block = f"Player to move: {player_str}\nOpponent: {game.current_opponent}\nBoard State:\n{board_str}\n"
+    return STATIC_INSTRUCTION, position_block, task_block
+
+
+def build_prompt(task_name: str, game: Othello, layout: str = "legacy", **kwargs) -> str:
+    return "".join(build_prompt_parts(task_name, game, layout, **kwargs))
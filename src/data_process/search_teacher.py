@@ -0,0 +1,302 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+from src.env.othello_game import Othello
+from src.env.search import TERMINAL_SCALE, AlphaBetaSearch
+
+if TYPE_CHECKING:
+    from src.utils.api_client import OpenAIClient
+
+CORNERS = ("a1", "h1", "a8", "h8")
+# 稳定子判定的四条轴：每条轴上至少一侧是边界/己方稳定子，或整条线已被填满
+AXES = [((0, 1), (0, -1)), ((1, 0), (-1, 0)), ((1, 1), (-1, -1)), ((1, -1), (-1, 1))]
+# 剩余空格不多时才讨论奇偶性
+PARITY_EMPTIES = 20
+
+
+def _discs(game: Othello, color: str) -> set:
+    return game.black if color == 'black' else game.white
+
+
+def mobility(game: Othello, color: str) -> int:
+    """Number of legal moves `color` would have if it were to move in this position"""
+    current_player = game.current_player
+    game.current_player = color
+    count = len(game.get_valid_moves())
+    game.current_player = current_player
+    return count
+
+
+def _line_full(game: Othello, occupied: set, row: int, col: int, direction) -> bool:
+    r, c = row + direction[0], col + direction[1]
+    while 0 <= r < game.size and 0 <= c < game.size:
+        if game._to_coord(r, c) not in occupied:
+            return False
+        r, c = r + direction[0], c + direction[1]
+    return True
+
+
+def stable_discs(game: Othello, color: str) -> set:
+    """
+    Discs of `color` that can never be flipped, using the usual conservative rule: on each of the
+    four axes the disc is bounded by the edge or another stable disc of its colour, or the line is full.
+    """
+    own = _discs(game, color)
+    occupied = game.black | game.white
+    stable = set()
+    changed = True
+    while changed:
+        changed = False
+        for pos in own - stable:
+            row, col = game._parse_coord(pos)
+            for forward, backward in AXES:
+                anchored = False
+                for dr, dc in (forward, backward):
+                    neighbor = game._to_coord(row + dr, col + dc)
+                    if neighbor is None or neighbor in stable:
+                        anchored = True
+                        break
+                if not anchored and not (_line_full(game, occupied, row, col, forward)
+                                         and _line_full(game, occupied, row, col, backward)):
+                    break
+            else:
+                stable.add(pos)
+                changed = True
+    return stable
+
+
+def move_components(game: Othello, pos: str) -> Dict:
+    """Evaluation components of playing `pos`, measured for the side to move right after the move"""
+    player, opponent = game.current_player, game.current_opponent
+    flips = game.move(pos)
+    try:
+        opponent_moves = []
+        if not game.game_over:
+            game.current_player, current_player = opponent, game.current_player
+            opponent_moves = game.get_valid_moves()
+            game.current_player = current_player
+        empties = 64 - len(game.black) - len(game.white)
+        return {
+            "flips": len(flips),
+            "my_moves": mobility(game, player) if not game.game_over else 0,
+            "opponent_moves": len(opponent_moves),
+            "corners_taken": [corner for corner in CORNERS if corner == pos],
+            "corners_given": sorted(corner for corner in CORNERS if corner in opponent_moves),
+            "corners": sum(corner in _discs(game, player) for corner in CORNERS)
+                       - sum(corner in _discs(game, opponent) for corner in CORNERS),
+            "my_stable": len(stable_discs(game, player)),
+            "opponent_stable": len(stable_discs(game, opponent)),
+            "empties": empties,
+            # 不考虑弃权时，剩余空格为偶数意味着最后一手仍由己方落下
+            "parity": 1 if empties % 2 == 0 else -1,
+        }
+    finally:
+        game.unmake()
+
+
+def analyze_moves(board_state: Dict, player: str, legal_moves: Sequence[str], depth: int = 2,
+                  endgame_depth: int = 10) -> Dict:
+    """
+    Search score and evaluation components of every legal move of a position.
+
+    Returns {"best_move", "ranking", "moves": {pos: {"score", ...components}}, "depth", "solved"}.
+    Scores are from the point of view of the side to move (TERMINAL_SCALE per disc when solved).
+    Takes the board as plain data so it can run in a worker process.
+    """
+    game = Othello(record_history=False)
+    game.set_board_state(board_state, player)
+    search = AlphaBetaSearch(depth=depth, endgame_depth=endgame_depth)
+    empties = 64 - len(game.black) - len(game.white)
+    solved = bool(endgame_depth) and empties <= endgame_depth
+    scores = search.score_moves(game, depth=empties if solved else depth)
+    moves = {}
+    for pos in legal_moves:
+        moves[pos] = {"score": scores[pos], **move_components(game, pos)}
+    # 同分时优先留给对手更少应手的着法
+    ranking = sorted(moves, key=lambda pos: (-moves[pos]["score"], moves[pos]["opponent_moves"], pos))
+    return {
+        "best_move": ranking[0] if ranking else None,
+        "ranking": ranking,
+        "moves": moves,
+        "depth": empties if solved else depth,
+        "solved": solved,
+    }
+
+
+def _score_text(score: int, solved: bool) -> str:
+    if solved:
+        discs = score // TERMINAL_SCALE
+        return f"a win by {discs} discs" if discs > 0 else f"a loss by {-discs} discs" if discs < 0 else "a draw"
+    return f"{score:+d}"
+
+
+def _component_sentences(move: str, info: Dict, player: str, opponent: str) -> List[str]:
+    sentences = []
+    if info["corners_taken"]:
+        sentences.append(f"It captures the corner {move}, which can never be flipped back.")
+    if not info["corners_given"]:
+        sentences.append(f"It gives {opponent} no access to a corner.")
+    sentences.append(f"{opponent.capitalize()} is left with {info['opponent_moves']} legal replies, "
+                     f"while {player} keeps {info['my_moves']} moves.")
+    if info["my_stable"]:
+        sentences.append(f"{player.capitalize()} ends up with {info['my_stable']} stable discs against {info['opponent_stable']}.")
+    if info["empties"] <= PARITY_EMPTIES:
+        parity = "keeps" if info["parity"] > 0 else "hands over"
+        sentences.append(f"With {info['empties']} empty squares left it {parity} the last move (parity).")
+    return sentences
+
+
+def _why_inferior(alternative: str, info: Dict, best: Dict, solved: bool, player: str, opponent: str) -> str:
+    if info["score"] == best["score"]:
+        reasons = [f"It scores the same ({_score_text(info['score'], solved)}), but the best move is preferred on the tie-break."]
+    elif solved:
+        reasons = [f"Perfect play after {alternative} leads to {_score_text(info['score'], True)} instead of {_score_text(best['score'], True)}."]
+    else:
+        reasons = [f"The search rates it {info['score'] - best['score']:+d} compared with the best move."]
+    if info["corners_given"] and not best["corners_given"]:
+        reasons.append(f"It gives {opponent} access to the corner(s) {', '.join(info['corners_given'])}.")
+    if info["opponent_moves"] > best["opponent_moves"]:
+        reasons.append(f"It leaves {opponent} {info['opponent_moves']} replies instead of {best['opponent_moves']}.")
+    if info["my_stable"] - info["opponent_stable"] < best["my_stable"] - best["opponent_stable"]:
+        reasons.append(f"It secures fewer stable discs ({info['my_stable']} vs {info['opponent_stable']}).")
+    if info["empties"] <= PARITY_EMPTIES and info["parity"] < best["parity"]:
+        reasons.append("It gives away parity.")
+    if info["flips"] > best["flips"]:
+        reasons.append(f"It flips more discs ({info['flips']}), which only opens up moves for {opponent}.")
+    return " ".join(reasons)
+
+
+def _long_term_goal(info: Dict, player: str, opponent: str) -> str:
+    if info["corners_taken"] or info["corners"] > 0:
+        return f"Build stable edges out from the corner so {player}'s disc count becomes permanent."
+    if info["empties"] <= PARITY_EMPTIES:
+        return f"Keep the last move in each remaining region and force {opponent} to open new areas."
+    if info["opponent_moves"] <= info["my_moves"]:
+        return f"Keep restricting {opponent}'s mobility until only moves that concede edges or corners remain."
+    return f"Stay quiet in the centre, avoid X- and C-squares, and wait for {opponent} to run out of safe moves."
+
+
+def build_task3_cot(game: Othello, analysis: Dict, num_alternatives: int = 3) -> Dict:
+    """Turn analyze_moves() output into a completion with the schema of generate_strategic_cot_task3"""
+    player, opponent = game.current_player, game.current_opponent
+    best_move = analysis["best_move"]
+    best = analysis["moves"][best_move]
+    solved = analysis["solved"]
+
+    if solved:
+        lead = f"{best_move} is the best move: solving the endgame exactly, it leads to {_score_text(best['score'], True)}."
+    else:
+        lead = f"{best_move} is the best move: a {analysis['depth']}-ply search rates it {_score_text(best['score'], False)}"
+        if len(analysis["ranking"]) > 1:
+            runner_up = analysis["ranking"][1]
+            lead += f", ahead of {runner_up} ({_score_text(analysis['moves'][runner_up]['score'], False)})"
+        lead += "."
+    core_reasoning = " ".join([lead] + _component_sentences(best_move, best, player, opponent))
+
+    return {
+        "strategic_analysis": {
+            "best_move": best_move,
+            "core_reasoning": core_reasoning,
+            "comparison_with_alternatives": [
+                {
+                    "alternative_move": alternative,
+                    "why_inferior": _why_inferior(alternative, analysis["moves"][alternative], best, solved, player, opponent),
+                }
+                for alternative in analysis["ranking"][1:1 + num_alternatives]
+            ],
+            "long_term_goal": _long_term_goal(best, player, opponent),
+        }
+    }
+
+
+def explain_with_llm(game: Othello, analysis: Dict, api_client: "OpenAIClient", num_alternatives: int = 3) -> Dict:
+    """
+    Keep the search's best move and alternatives, and let the LLM rewrite only the text fields from the
+    computed facts. Falls back to the templated text if the call or parsing fails.
+    """
+    cot = build_task3_cot(game, analysis, num_alternatives)
+    facts = {pos: analysis["moves"][pos] for pos in analysis["ranking"][:1 + num_alternatives]}
+    prompt = f"""You are a world-class Othello grandmaster. A search engine has already chosen the best move; explain its choice in natural language.
+
+# Context
+- Player to move: {game.current_player.capitalize()}
+- Board State:
+  - Black Pieces: {sorted(list(game.black))}
+  - White Pieces: {sorted(list(game.white))}
+- Engine analysis ({'exact endgame solve' if analysis['solved'] else f"{analysis['depth']}-ply search"}; score, mobility, corners, stability and parity after each move):
+{json.dumps(facts, indent=2)}
+
+# Draft
+{json.dumps(cot, indent=2)}
+
+# Task
+Rewrite the draft's core_reasoning, why_inferior and long_term_goal texts so they read like a strong player's explanation. Use only the facts above. Do not change best_move or the alternative moves. Answer with the JSON object only.
+"""
+    try:
+        response_str = api_client.generate_response(prompt, temperature=0.3)
+        json_str = response_str[response_str.find('{'):response_str.rfind('}') + 1]
+        rewritten = json.loads(json_str)["strategic_analysis"]
+        analysis_text = cot["strategic_analysis"]
+        analysis_text["core_reasoning"] = rewritten["core_reasoning"]
+        analysis_text["long_term_goal"] = rewritten["long_term_goal"]
+        texts = {item["alternative_move"]: item["why_inferior"] for item in rewritten["comparison_with_alternatives"]}
+        for item in analysis_text["comparison_with_alternatives"]:
+            item["why_inferior"] = texts.get(item["alternative_move"], item["why_inferior"])
+    except Exception as e:
+        print(f"LLM explanation failed for best move {analysis['best_move']}, keeping the templated text. Error: {e}")
+    return cot
+
+
+def _analyze_job(job) -> Dict:
+    return analyze_moves(*job)
+
+
+class SearchTeacher:
+    """
+    Local replacement for the LLM Task 3 teacher: analyse positions on a process pool, then build
+    completions from the analysis (templated text, or LLM-rewritten text when an api_client is given).
+
+    Args:
+        depth: Midgame search depth used to score every legal move
+        endgame_depth: Solve exactly when this many or fewer empty squares remain
+        workers: Processes used by analyze(); 1 runs in the calling process
+        api_client: Optional OpenAIClient used only to rewrite the explanation text
+    """
+
+    def __init__(self, depth: int = 2, endgame_depth: int = 10, workers: int = 1,
+                 api_client: Optional["OpenAIClient"] = None, num_alternatives: int = 3):
+        self.depth = depth
+        self.endgame_depth = endgame_depth
+        self.workers = workers
+        self.api_client = api_client
+        self.num_alternatives = num_alternatives
+        self._executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def analyze(self, games: Sequence[Othello], legal_moves: Sequence[Sequence[str]]) -> List[Dict]:
+        jobs = [({'black': set(game.black), 'white': set(game.white)}, game.current_player, list(moves),
+                 self.depth, self.endgame_depth) for game, moves in zip(games, legal_moves)]
+        if self._executor is None:
+            return [_analyze_job(job) for job in jobs]
+        return list(self._executor.map(_analyze_job, jobs, chunksize=max(1, len(jobs) // (4 * self.workers))))
+
+    def label(self, games: Sequence[Othello], legal_moves: Sequence[Sequence[str]]) -> List[Dict]:
+        """Task 3 completions for every position, in the same schema as generate_strategic_cot_task3"""
+        completions = []
+        for game, analysis in zip(games, self.analyze(games, legal_moves)):
+            if self.api_client is not None:
+                completions.append(explain_with_llm(game, analysis, self.api_client, self.num_alternatives))
+            else:
+                completions.append(build_task3_cot(game, analysis, self.num_alternatives))
+        return completions
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
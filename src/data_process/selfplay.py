@@ -0,0 +1,78 @@
+import collections
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List
+
+from src.env.othello_game import Othello
+from src.tournament.players import Player, make_player
+
+
+def _game_seed(seed: int, game_index: int) -> int:
+    # 每局的种子只取决于 (seed, 局号)，结果与进程数和分块方式无关
+    return seed * 1_000_000_007 + game_index
+
+
+def play_game(black: Player, white: Player, rng: random.Random, random_opening_plies: int = 0) -> Othello:
+    """Play one game to the end; the first `random_opening_plies` moves are uniformly random for diversity"""
+    game = Othello(record_history=False)
+    while not game.game_over:
+        valid_moves = game.get_valid_moves()
+        if game.ply < random_opening_plies:
+            pos = rng.choice(valid_moves)
+        else:
+            pos = (black if game.current_player == 'black' else white).choose_move(game)
+        game.move(pos)
+    return game
+
+
+def _play_chunk(black_spec: Dict, white_spec: Dict, game_indices: List[int], seed: int,
+                random_opening_plies: int) -> List[Dict]:
+    games = []
+    for game_index in game_indices:
+        game_seed = _game_seed(seed, game_index)
+        black = make_player(black_spec, 2 * game_seed)
+        white = make_player(white_spec, 2 * game_seed + 1)
+        game = play_game(black, white, random.Random(game_seed), random_opening_plies)
+        games.append({
+            'id': f"selfplay-{seed}-{game_index}",
+            'winner': game.get_winner(),
+            'moves': game.played_moves(),
+            'black_policy': black.name,
+            'white_policy': white.name,
+        })
+    return games
+
+
+def self_play_games(num_games: int, black_spec: Dict, white_spec: Dict, workers: int = 1, seed: int = 0,
+                    games_per_chunk: int = 32, random_opening_plies: int = 0) -> Iterator[Dict]:
+    """
+    Yield self-play games in the record format of load_csv ({'id', 'winner', 'moves'}, plus the two policy names).
+
+    Games are played in chunks on a process pool and yielded in game order, so the output is the same
+    for any number of workers. At most a few chunks per worker are in flight, which keeps memory bounded
+    when the consumer is slower than the pool.
+
+    Args:
+        black_spec, white_spec: Player specs as parsed by parse_player_spec, e.g. {"type": "search", "depth": 2}
+        random_opening_plies: Uniformly random moves at the start of every game (needed when both policies are deterministic)
+    """
+    chunks = [list(range(start, min(start + games_per_chunk, num_games))) for start in range(0, num_games, games_per_chunk)]
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _play_chunk(black_spec, white_spec, chunk, seed, random_opening_plies)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        chunk_iter = iter(chunks)
+        for chunk in chunk_iter:
+            pending.append(executor.submit(_play_chunk, black_spec, white_spec, chunk, seed, random_opening_plies))
+            if len(pending) >= 4 * workers:
+                break
+        while pending:
+            games = pending.popleft().result()
+            chunk = next(chunk_iter, None)
+            if chunk is not None:
+                pending.append(executor.submit(_play_chunk, black_spec, white_spec, chunk, seed, random_opening_plies))
+            yield from games
+
@@ -0,0 +1,126 @@
+import copy
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from src.env.othello_game import Othello
+from src.env.symmetry import INVERSE, SQUARES, canonicalize, transform_coord, transform_coords
+
+
+def _has_only_squares(analysis: Dict) -> bool:
+    """Whether every coordinate of an agent analysis is a board square, so that it can be transformed"""
+    coords = []
+    for key in ("plausible_candidates", "predicted_legal_moves_analysis", "predicted_legal_moves"):
+        value = analysis.get(key)
+        if value is None and key == "plausible_candidates":
+            continue
+        if not isinstance(value, (list, dict)):
+            return False
+        coords.extend(value)
+    if analysis.get("chosen_move") is not None:
+        coords.append(analysis["chosen_move"])
+    for key in ("llm_legal_moves", "rejected"):
+        coords.extend((analysis.get("verification") or {}).get(key, []))
+    return all(isinstance(coord, str) and coord in SQUARES for coord in coords)
+
+
+def _transform_analysis(analysis: Dict, transform: int) -> Dict:
+    """Return a copy of an agent analysis with every coordinate mapped through `transform`"""
+    result = copy.deepcopy(analysis)
+    if result.get("plausible_candidates") is not None:
+        result["plausible_candidates"] = sorted(transform_coords(result["plausible_candidates"], transform))
+    result["predicted_legal_moves_analysis"] = {
+        transform_coord(pos, transform): count for pos, count in result["predicted_legal_moves_analysis"].items()
+    }
+    result["predicted_legal_moves"] = sorted(transform_coords(result["predicted_legal_moves"], transform))
+    result["chosen_move"] = transform_coord(result.get("chosen_move"), transform)
+    verification = result.get("verification")
+    if verification:
+        for key in ("llm_legal_moves", "rejected"):
+            verification[key] = sorted(transform_coords(verification[key], transform))
+    return result
+
+
+class AnalysisCache:
+    """
+    Bounded LRU cache of agent analyses keyed by canonical position.
+
+    Positions that are rotations/reflections of each other share one entry: analyses are stored in
+    the canonical frame and mapped back through the inverse transform on lookup.
+    The key also contains the side to move and a namespace (adapter id, pipeline mode, ...).
+
+    Args:
+        maxsize: Maximum number of entries, the least recently used one is evicted first
+        path: Optional JSON file used to persist the cache (loaded on creation, written by save())
+    """
+
+    def __init__(self, maxsize: int = 10000, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped = 0
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @staticmethod
+    def _key(game: Othello, namespace: str) -> Tuple[str, int]:
+        board, transform = canonicalize(game.black, game.white)
+        return f"{namespace}|{game.current_player}|{board}", transform
+
+    def get(self, game: Othello, namespace: str = "") -> Optional[Dict]:
+        key, transform = self._key(game, namespace)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return _transform_analysis(entry, INVERSE[transform])
+
+    def put(self, game: Othello, analysis: Dict, namespace: str = ""):
+        # 模型输出里可能出现 "center"、"j9" 之类的非法坐标，无法做对称变换，这类结果不缓存
+        if not _has_only_squares(analysis):
+            self.skipped += 1
+            return
+        key, transform = self._key(game, namespace)
+        self._entries[key] = _transform_analysis(analysis, transform)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "skipped": self.skipped,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        if not path:
+            raise ValueError("No path given to save the analysis cache")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"maxsize": self.maxsize, "entries": list(self._entries.items())}, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for key, analysis in data["entries"]:
+            self._entries[key] = analysis
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
@@ -0,0 +1,217 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from src.env.othello_game import Othello
+
+# 位棋盘：格子 (row, col) 对应第 row * 8 + col 位，a1 为最低位
+SQUARE_BITS = {chr(col + ord('a')) + str(row + 1): 1 << (row * 8 + col) for row in range(8) for col in range(8)}
+
+_ALL = np.uint64(0xFFFFFFFFFFFFFFFF)
+_NOT_FILE_A = np.uint64(0xFEFEFEFEFEFEFEFE)
+_NOT_FILE_H = np.uint64(0x7F7F7F7F7F7F7F7F)
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+AXES = [((0, 1), (0, -1)), ((1, 0), (-1, 0)), ((1, 1), (-1, -1)), ((1, -1), (-1, 1))]
+
+# 每个角及其 X 格（斜邻）和 C 格（边邻）；X/C 格只在对应角为空时才算危险
+CORNER_REGIONS = [
+    ("a1", "b2", ("b1", "a2")),
+    ("h1", "g2", ("g1", "h2")),
+    ("a8", "b7", ("b8", "a7")),
+    ("h8", "g7", ("g8", "h7")),
+]
+_CORNERS = np.uint64(sum(SQUARE_BITS[corner] for corner, _, _ in CORNER_REGIONS))
+
+# 每项特征都按 (己方, 对方) 成对给出；empties / parity 属于局面本身
+PAIRED_FEATURES = ["discs", "mobility", "potential_mobility", "frontier", "corners", "x_squares", "c_squares", "stable"]
+FEATURE_DTYPE = np.dtype(
+    [(name, np.int8) for feature in PAIRED_FEATURES for name in (feature, "opponent_" + feature)]
+    + [("empties", np.int8), ("parity", np.int8)]
+)
+
+# 特征估值的线性权重，作用于 (己方 - 对方) 的差值；量级与 search.evaluate 相当
+FEATURE_WEIGHTS = {
+    "discs": 0,
+    "mobility": 5,
+    "potential_mobility": 2,
+    "frontier": -3,
+    "corners": 100,
+    "x_squares": -50,
+    "c_squares": -20,
+    "stable": 20,
+    "parity": 3,
+}
+
+
+def _shift(bits: np.ndarray, dr: int, dc: int) -> np.ndarray:
+    """Move every bit one square in direction (dr, dc); bits leaving the board are dropped"""
+    offset = dr * 8 + dc
+    shifted = bits << np.uint64(offset) if offset > 0 else bits >> np.uint64(-offset)
+    # 横向移动时清除从另一侧绕回来的位
+    if dc == 1:
+        shifted &= _NOT_FILE_A
+    elif dc == -1:
+        shifted &= _NOT_FILE_H
+    return shifted
+
+
+# 各方向上没有邻居的格子（棋盘边缘）
+_EDGES = {(dr, dc): ~_shift(_ALL, -dr, -dc) for dr, dc in DIRECTIONS}
+
+
+def _neighbors(bits: np.ndarray) -> np.ndarray:
+    result = np.zeros_like(bits)
+    for dr, dc in DIRECTIONS:
+        result |= _shift(bits, dr, dc)
+    return result
+
+
+def _count(bits: np.ndarray) -> np.ndarray:
+    return np.bitwise_count(bits).astype(np.int8)
+
+
+def legal_moves_bits(player: np.ndarray, opponent: np.ndarray) -> np.ndarray:
+    """Bitboards of the legal moves of `player` (one per position)"""
+    empty = ~(player | opponent)
+    moves = np.zeros_like(player)
+    for dr, dc in DIRECTIONS:
+        # 一条线上最多夹 6 个对方子
+        run = _shift(player, dr, dc) & opponent
+        for _ in range(5):
+            run |= _shift(run, dr, dc) & opponent
+        moves |= _shift(run, dr, dc) & empty
+    return moves
+
+
+def _filled_lines(occupied: np.ndarray) -> Dict[Tuple[int, int], np.ndarray]:
+    """Per direction, the squares from which every square up to the edge in that direction is occupied"""
+    filled = {}
+    for direction in DIRECTIONS:
+        dr, dc = direction
+        # 棋盘边缘视为已填满
+        lines = np.zeros_like(occupied) | _EDGES[direction]
+        for _ in range(7):
+            lines |= _shift(lines & occupied, -dr, -dc)
+        filled[direction] = lines
+    return filled
+
+
+def stable_bits(own: np.ndarray, filled: Dict[Tuple[int, int], np.ndarray]) -> np.ndarray:
+    """
+    Stable discs of `own`, with the rule used by search_teacher.stable_discs: on each of the four axes
+    the disc is bounded by the edge or a stable disc of its colour, or the line is full in both directions.
+    """
+    # 不依赖稳定子的部分（边缘、填满的线）在迭代前算好
+    fixed = [_EDGES[forward] | _EDGES[backward] | (filled[forward] & filled[backward]) for forward, backward in AXES]
+    stable = np.zeros_like(own)
+    while True:
+        candidate = own.copy()
+        for (forward, backward), anchored in zip(AXES, fixed):
+            candidate &= anchored | _shift(stable, -forward[0], -forward[1]) | _shift(stable, -backward[0], -backward[1])
+        if np.array_equal(candidate, stable):
+            return stable
+        stable = candidate
+
+
+def _region_counts(player: np.ndarray, empty: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Discs of `player` on X-squares and on C-squares next to an empty corner"""
+    x_squares = np.zeros(player.shape, dtype=np.int8)
+    c_squares = np.zeros(player.shape, dtype=np.int8)
+    for corner, x_square, c_pair in CORNER_REGIONS:
+        corner_empty = (empty & np.uint64(SQUARE_BITS[corner])) != 0
+        x_squares += corner_empty * _count(player & np.uint64(SQUARE_BITS[x_square]))
+        c_squares += corner_empty * _count(player & np.uint64(SQUARE_BITS[c_pair[0]] | SQUARE_BITS[c_pair[1]]))
+    return x_squares, c_squares
+
+
+def extract_features(player: np.ndarray, opponent: np.ndarray) -> np.ndarray:
+    """
+    Features of a batch of positions given as uint64 bitboards, from the point of view of `player`.
+    Returns a structured array of FEATURE_DTYPE with one row per position.
+    """
+    player = np.asarray(player, dtype=np.uint64)
+    opponent = np.asarray(opponent, dtype=np.uint64)
+    occupied = player | opponent
+    empty = ~occupied
+    filled = _filled_lines(occupied)
+
+    features = np.zeros(player.shape, dtype=FEATURE_DTYPE)
+    for prefix, own, other in (("", player, opponent), ("opponent_", opponent, player)):
+        features[prefix + "discs"] = _count(own)
+        features[prefix + "mobility"] = _count(legal_moves_bits(own, other))
+        # 潜在行动力：与对方棋子相邻的空格数
+        features[prefix + "potential_mobility"] = _count(_neighbors(other) & empty)
+        features[prefix + "frontier"] = _count(own & _neighbors(empty))
+        features[prefix + "corners"] = _count(own & _CORNERS)
+        features[prefix + "x_squares"], features[prefix + "c_squares"] = _region_counts(own, empty)
+        features[prefix + "stable"] = _count(stable_bits(own, filled))
+    features["empties"] = _count(empty)
+    # 不考虑弃权且轮到 player 时，剩余空格为奇数意味着最后一手由 player 落下
+    features["parity"] = np.where(features["empties"] % 2 == 1, 1, -1)
+    return features
+
+
+def position_bits(game: Othello) -> Tuple[int, int]:
+    """(side to move, opponent) bitboards of a game"""
+    black = sum(SQUARE_BITS[pos] for pos in game.black)
+    white = sum(SQUARE_BITS[pos] for pos in game.white)
+    return (black, white) if game.current_player == 'black' else (white, black)
+
+
+def position_features(games: Sequence[Othello]) -> np.ndarray:
+    """extract_features() for a list of games, from the point of view of each side to move"""
+    bits = [position_bits(game) for game in games]
+    return extract_features(np.array([player for player, _ in bits], dtype=np.uint64),
+                            np.array([opponent for _, opponent in bits], dtype=np.uint64))
+
+
+def move_features(game: Othello, moves: Sequence[str]) -> np.ndarray:
+    """Features of the position after each move, from the point of view of the side that played it"""
+    mover = game.current_player
+    players, opponents = [], []
+    for pos in moves:
+        game.move(pos)
+        try:
+            black = sum(SQUARE_BITS[square] for square in game.black)
+            white = sum(SQUARE_BITS[square] for square in game.white)
+        finally:
+            game.unmake()
+        players.append(black if mover == 'black' else white)
+        opponents.append(white if mover == 'black' else black)
+    features = extract_features(np.array(players, dtype=np.uint64), np.array(opponents, dtype=np.uint64))
+    # 落子后轮到对方，奇偶性要翻转成落子方的视角：剩余空格为偶数时最后一手归落子方
+    features["parity"] = -features["parity"]
+    return features
+
+
+def feature_scores(features: np.ndarray, weights: Dict[str, int] = FEATURE_WEIGHTS) -> np.ndarray:
+    """Linear evaluation of every row of a FEATURE_DTYPE array (int64, from the first side's point of view)"""
+    scores = np.zeros(features.shape, dtype=np.int64)
+    for name in PAIRED_FEATURES:
+        if weights.get(name):
+            scores += weights[name] * (features[name].astype(np.int64) - features["opponent_" + name])
+    return scores + weights.get("parity", 0) * features["parity"].astype(np.int64)
+
+
+def evaluate_bits(player: Sequence[int], opponent: Sequence[int]) -> List[int]:
+    """Feature evaluation of a batch of (player, opponent) bitboards, as Python ints"""
+    features = extract_features(np.array(player, dtype=np.uint64), np.array(opponent, dtype=np.uint64))
+    return feature_scores(features).tolist()
+
+
+def describe_features(row) -> str:
+    """One line per paired feature of a single FEATURE_DTYPE row, for prompts"""
+    labels = {
+        "discs": "Discs",
+        "mobility": "Mobility (legal moves)",
+        "potential_mobility": "Potential mobility (empty squares next to opponent discs)",
+        "frontier": "Frontier discs (next to an empty square)",
+        "corners": "Corners",
+        "x_squares": "X-squares next to an empty corner",
+        "c_squares": "C-squares next to an empty corner",
+        "stable": "Stable discs",
+    }
+    lines = [f"  - {labels[name]}: {int(row[name])} vs {int(row['opponent_' + name])}" for name in PAIRED_FEATURES]
+    parity = "odd (the side to move gets the last move)" if row["parity"] > 0 else "even"
+    lines.append(f"  - Empty squares: {int(row['empties'])}, parity {parity}")
+    return "\n".join(lines)
@@ -0,0 +1,301 @@
+import math
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.env.othello_game import Othello
+from src.env.features import feature_scores, position_features
+from src.env.search import SQUARE_WEIGHTS, evaluate
+
+# 评估函数：一次接收多个叶子局面，返回每个局面的 (合法着法先验, 当前行棋方视角的价值 [-1, 1])
+Evaluator = Callable[[Sequence[Othello]], List[Tuple[Dict[str, float], float]]]
+
+
+def _softmax(logits: Dict[str, float]) -> Dict[str, float]:
+    if not logits:
+        return {}
+    top = max(logits.values())
+    exps = {pos: math.exp(logit - top) for pos, logit in logits.items()}
+    total = sum(exps.values())
+    return {pos: value / total for pos, value in exps.items()}
+
+
+def terminal_value(game: Othello) -> float:
+    """+1 / 0 / -1 for black of a finished game"""
+    winner = game.get_winner()
+    return 0.0 if winner is None else 1.0 if winner == 'black' else -1.0
+
+
+class HeuristicEvaluator:
+    """Priors from the positional weight table, value from the alpha-beta evaluation squashed with tanh"""
+
+    def __init__(self, prior_temperature: float = 20.0, value_scale: float = 100.0):
+        self.prior_temperature = prior_temperature
+        self.value_scale = value_scale
+
+    def __call__(self, games: Sequence[Othello]) -> List[Tuple[Dict[str, float], float]]:
+        results = []
+        for game in games:
+            priors = _softmax({pos: SQUARE_WEIGHTS[pos] / self.prior_temperature for pos in game.get_valid_moves()})
+            results.append((priors, math.tanh(evaluate(game) / self.value_scale)))
+        return results
+
+
+class FeatureEvaluator(HeuristicEvaluator):
+    """Priors as HeuristicEvaluator, values from the positional features of the whole batch in one vectorized call"""
+
+    def __call__(self, games: Sequence[Othello]) -> List[Tuple[Dict[str, float], float]]:
+        values = feature_scores(position_features(games))
+        results = []
+        for game, value in zip(games, values.tolist()):
+            priors = _softmax({pos: SQUARE_WEIGHTS[pos] / self.prior_temperature for pos in game.get_valid_moves()})
+            results.append((priors, math.tanh(value / self.value_scale)))
+        return results
+
+
+class RolloutEvaluator:
+    """Uniform priors, value from the average result of random playouts to the end of the game"""
+
+    def __init__(self, num_rollouts: int = 1, seed: int = 0):
+        self.num_rollouts = num_rollouts
+        self.rng = random.Random(seed)
+
+    def __call__(self, games: Sequence[Othello]) -> List[Tuple[Dict[str, float], float]]:
+        results = []
+        for game in games:
+            player, valid_moves = game.current_player, game.get_valid_moves()
+            total = 0.0
+            for _ in range(self.num_rollouts):
+                played = 0
+                while not game.game_over:
+                    game.move(self.rng.choice(game.get_valid_moves()))
+                    played += 1
+                total += terminal_value(game) * (1 if player == 'black' else -1)
+                for _ in range(played):
+                    game.unmake()
+            results.append(({pos: 1 / len(valid_moves) for pos in valid_moves}, total / self.num_rollouts))
+        return results
+
+
+class AgentPriorEvaluator:
+    """
+    Priors from an OthelloAgent: every batch of leaves is analysed in one analyze_positions() call and
+    the agent's predicted legal moves are weighted by their predicted flip counts (softmax / temperature).
+    Engine-legal moves the agent missed keep a `floor` share so the search can still find them.
+    Values come from `value_evaluator` (heuristic by default).
+    The agent serializes its own calls, so with MCTS(num_threads>1) one thread runs inference at a time
+    while the others select, expand and back up.
+    """
+
+    def __init__(self, agent, value_evaluator: Optional[Evaluator] = None, mode: Optional[str] = None,
+                 temperature: float = 2.0, floor: float = 0.1):
+        self.agent = agent
+        self.value_evaluator = value_evaluator or HeuristicEvaluator()
+        self.mode = mode
+        self.temperature = temperature
+        self.floor = floor
+
+    def __call__(self, games: Sequence[Othello]) -> List[Tuple[Dict[str, float], float]]:
+        analyses = self.agent.analyze_positions(list(games), self.mode)
+        values = self.value_evaluator(games)
+        results = []
+        for game, analysis, (_, value) in zip(games, analyses, values):
+            valid_moves = game.get_valid_moves()
+            predicted = {pos: flips for pos, flips in analysis["predicted_legal_moves_analysis"].items() if pos in valid_moves}
+            agent_priors = _softmax({pos: flips / self.temperature for pos, flips in predicted.items()})
+            share = self.floor if agent_priors else 1.0
+            priors = {pos: (1 - share) * agent_priors.get(pos, 0.0) + share / len(valid_moves) for pos in valid_moves}
+            results.append((priors, value))
+        return results
+
+
+class Node:
+    __slots__ = ("mover", "prior", "visits", "value_sum", "children", "expanded", "pending", "key")
+
+    def __init__(self, mover: Optional[str], prior: float):
+        self.mover = mover          # 走到该节点的一方；价值按该方视角累计
+        self.prior = prior
+        self.visits = 0
+        self.value_sum = 0.0
+        self.children: Dict[str, "Node"] = {}
+        self.expanded = False
+        self.pending = False
+        self.key = None
+
+    def q(self) -> float:
+        return self.value_sum / self.visits if self.visits else 0.0
+
+
+def _position_key(game: Othello):
+    return frozenset(game.black), frozenset(game.white), game.current_player
+
+
+class MCTS:
+    """
+    Monte Carlo Tree Search with PUCT selection, virtual loss and batched leaf evaluation.
+
+    Each thread repeatedly selects up to `batch_size` leaves under a tree lock (virtual loss steers the
+    selections of one batch, and of concurrent threads, apart), evaluates them in a single evaluator
+    call outside the lock, then expands and backs up. Threads therefore help when the evaluator
+    releases the GIL (model inference); with pure-Python evaluators use one thread and a larger batch.
+
+    The tree is kept between search() calls and re-rooted when the new position is a child or
+    grandchild of the previous root (tree reuse between moves).
+
+    Args:
+        evaluator: Batched leaf evaluator (see Evaluator), HeuristicEvaluator() by default
+        c_puct: Exploration constant
+        batch_size: Leaves per evaluator call
+        virtual_loss: Visits (counted as losses) added to a path while its leaf is pending
+        num_threads: Threads running selection/evaluation concurrently
+    """
+
+    def __init__(self, evaluator: Optional[Evaluator] = None, c_puct: float = 1.5, batch_size: int = 8,
+                 virtual_loss: int = 1, num_threads: int = 1):
+        self.evaluator = evaluator or HeuristicEvaluator()
+        self.c_puct = c_puct
+        self.batch_size = batch_size
+        self.virtual_loss = virtual_loss
+        self.num_threads = num_threads
+        self.root: Optional[Node] = None
+        self._lock = threading.Lock()
+
+    def _select_child(self, node: Node) -> Tuple[str, Node]:
+        sqrt_visits = math.sqrt(max(1, node.visits))
+        best, best_score = None, -float('inf')
+        for pos, child in node.children.items():
+            score = child.q() + self.c_puct * child.prior * sqrt_visits / (1 + child.visits)
+            if score > best_score:
+                best, best_score = (pos, child), score
+        return best
+
+    def _apply_virtual_loss(self, path: List[Node], sign: int):
+        for node in path[1:]:
+            node.visits += sign * self.virtual_loss
+            node.value_sum -= sign * self.virtual_loss
+
+    def _backup(self, path: List[Node], black_value: float):
+        for node in path:
+            node.visits += 1
+            if node.mover is not None:
+                node.value_sum += black_value if node.mover == 'black' else -black_value
+
+    def _expand(self, node: Node, game: Othello, priors: Dict[str, float]):
+        mover = game.current_player
+        for pos in game.get_valid_moves():
+            node.children[pos] = Node(mover, priors.get(pos, 0.0))
+        node.expanded = True
+
+    def _collect(self, game: Othello, limit: int) -> Tuple[List, int]:
+        """Select up to `limit` leaves; terminal leaves are backed up immediately. Caller holds the lock."""
+        batch, finished = [], 0
+        for _ in range(limit):
+            node, path, moves = self.root, [self.root], []
+            while node.expanded and not game.game_over:
+                pos, node = self._select_child(node)
+                game.move(pos)
+                moves.append(pos)
+                path.append(node)
+            if game.game_over:
+                self._backup(path, terminal_value(game))
+                finished += 1
+            elif node.pending:
+                # 同一叶子已在本批或其它线程中等待评估，提前结束本批
+                for _ in moves:
+                    game.unmake()
+                break
+            else:
+                node.pending = True
+                node.key = _position_key(game)
+                self._apply_virtual_loss(path, 1)
+                batch.append((path, game.clone()))
+            for _ in moves:
+                game.unmake()
+        return batch, finished
+
+    def _run_thread(self, root_game: Othello, budget: Dict, stats: Dict):
+        game = root_game.clone()
+        while True:
+            with self._lock:
+                if budget["playouts"] <= 0 or (budget["deadline"] and time.perf_counter() > budget["deadline"]):
+                    return
+                batch, finished = self._collect(game, min(self.batch_size, budget["playouts"]))
+                budget["playouts"] -= len(batch) + finished
+                stats["playouts"] += finished
+            if not batch:
+                # 叶子都在其它线程等待评估时让出 GIL
+                time.sleep(0)
+                continue
+            evaluations = self.evaluator([leaf_game for _, leaf_game in batch])
+            with self._lock:
+                for (path, leaf_game), (priors, value) in zip(batch, evaluations):
+                    leaf = path[-1]
+                    self._apply_virtual_loss(path, -1)
+                    self._expand(leaf, leaf_game, priors)
+                    leaf.pending = False
+                    self._backup(path, value if leaf_game.current_player == 'black' else -value)
+                stats["playouts"] += len(batch)
+                stats["batches"] += 1
+                stats["evaluated"] += len(batch)
+
+    def _reuse_root(self, game: Othello) -> Node:
+        key = _position_key(game)
+        if self.root is not None:
+            candidates = [self.root] + list(self.root.children.values())
+            candidates += [grandchild for child in self.root.children.values() for grandchild in child.children.values()]
+            for node in candidates:
+                if node.key == key and node.expanded:
+                    return node
+        root = Node(None, 1.0)
+        root.key = key
+        return root
+
+    def search(self, game: Othello, playouts: int = 200, time_limit: Optional[float] = None,
+               temperature: float = 0.0, rng: Optional[random.Random] = None) -> Dict:
+        """
+        Run `playouts` simulations (or until time_limit seconds) from `game`, which is left unchanged.
+        Returns {"move", "visits", "q", "playouts", "reused_visits", "batches", "mean_batch_size", "seconds", "playouts_per_sec"}.
+        With temperature > 0 the move is sampled from visits ** (1 / temperature) instead of taken greedily.
+        """
+        start = time.perf_counter()
+        if game.game_over or not game.get_valid_moves():
+            return {"move": None, "visits": {}, "q": 0.0, "playouts": 0, "reused_visits": 0, "batches": 0,
+                    "mean_batch_size": 0.0, "seconds": 0.0, "playouts_per_sec": 0.0}
+
+        self.root = self._reuse_root(game)
+        self.root.mover = None
+        reused_visits = self.root.visits
+        if not self.root.expanded:
+            priors, _ = self.evaluator([game.clone()])[0]
+            self._expand(self.root, game, priors)
+
+        budget = {"playouts": playouts, "deadline": start + time_limit if time_limit else None}
+        stats = {"playouts": 0, "batches": 0, "evaluated": 0}
+        if self.num_threads <= 1:
+            self._run_thread(game, budget, stats)
+        else:
+            threads = [threading.Thread(target=self._run_thread, args=(game, budget, stats)) for _ in range(self.num_threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        visits = {pos: child.visits for pos, child in self.root.children.items()}
+        if temperature > 0:
+            weights = [count ** (1 / temperature) for count in visits.values()]
+            move = (rng or random).choices(list(visits), weights=weights)[0] if sum(weights) > 0 else max(visits, key=visits.get)
+        else:
+            move = max(visits, key=lambda pos: (visits[pos], self.root.children[pos].prior))
+        elapsed = time.perf_counter() - start
+        return {
+            "move": move,
+            "visits": visits,
+            "q": self.root.children[move].q(),
+            "playouts": stats["playouts"],
+            "reused_visits": reused_visits,
+            "batches": stats["batches"],
+            "mean_batch_size": stats["evaluated"] / stats["batches"] if stats["batches"] else 0.0,
+            "seconds": elapsed,
+            "playouts_per_sec": stats["playouts"] / elapsed if elapsed > 0 else 0.0,
+        }
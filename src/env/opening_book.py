@@ -0,0 +1,251 @@
+import mmap
+import struct
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.env.othello_game import Othello
+from src.env.symmetry import INVERSE, transform_coord
+
+MAGIC = b"OTHBOOK1"
+VERSION = 1
+# magic, version, bucket_bits, max_plies, min_games, games, entries, moves
+HEADER = struct.Struct("<8sIIIIQQQ")
+# 64 位键哈希, 规范化后的黑子位棋盘, 白子位棋盘, 行棋方 (0 黑 / 1 白), 着法区间起点, 着法数
+ENTRY = struct.Struct("<QQQBxxxII")
+# 规范坐标系下的格子编号 row * 8 + col, 局数, 行棋方胜局数, 和局数
+MOVE = struct.Struct("<BxxxIII")
+BUCKET = struct.Struct("<I")
+BUCKET_BITS = 16
+
+_MASK64 = (1 << 64) - 1
+
+
+def _hash(black: int, white: int, side: int) -> int:
+    """splitmix64 finaliser over the canonical position, so that hashes spread evenly over the buckets"""
+    x = (black ^ ((white << 1 | white >> 63) & _MASK64) ^ (side * 0x9E3779B97F4A7C15)) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def _square(index: int) -> str:
+    return chr(index % 8 + ord('a')) + str(index // 8 + 1)
+
+
+def _square_index(pos: str) -> int:
+    return (int(pos[1:]) - 1) * 8 + ord(pos[0]) - ord('a')
+
+
+_BITS = {_square(i): 1 << i for i in range(64)}
+
+
+def _mirror_cols(x: int) -> int:
+    x = ((x >> 1) & 0x5555555555555555) | ((x & 0x5555555555555555) << 1)
+    x = ((x >> 2) & 0x3333333333333333) | ((x & 0x3333333333333333) << 2)
+    return ((x >> 4) & 0x0F0F0F0F0F0F0F0F) | ((x & 0x0F0F0F0F0F0F0F0F) << 4)
+
+
+def _mirror_rows(x: int) -> int:
+    return int.from_bytes(x.to_bytes(8, "little"), "big")
+
+
+def _transpose(x: int) -> int:
+    t = 0x0F0F0F0F00000000 & (x ^ (x << 28))
+    x ^= t ^ (t >> 28)
+    t = 0x3333000033330000 & (x ^ (x << 14))
+    x ^= t ^ (t >> 14)
+    t = 0x5500550055005500 & (x ^ (x << 7))
+    return x ^ t ^ (t >> 7)
+
+
+def _symmetries(x: int) -> List[int]:
+    """Images of a bitboard under symmetry.TRANSFORMS, in the same order"""
+    t = _transpose(x)
+    return [x, _mirror_cols(t), _mirror_rows(_mirror_cols(x)), _mirror_rows(t),
+            _mirror_cols(x), _mirror_rows(x), t, _mirror_rows(_mirror_cols(t))]
+
+
+def position_key(game: Othello) -> Tuple[int, int, int, int]:
+    """
+    (black bitboard, white bitboard, side to move) of the canonical image of `game`, and the transform to it.
+    Same idea as symmetry.canonicalize, on bitboards: the canonical image is the smallest (black, white) pair.
+    """
+    black = sum(_BITS[pos] for pos in game.black)
+    white = sum(_BITS[pos] for pos in game.white)
+    (black, white), transform = min((images, t) for t, images in enumerate(zip(_symmetries(black), _symmetries(white))))
+    return black, white, 0 if game.current_player == 'black' else 1, transform
+
+
+def build_opening_book(games: Iterable[Dict], path: str, max_plies: int = 30, min_games: int = 2) -> Dict:
+    """
+    Walk every game once and write the book of (canonical position -> move counts and results) to `path`.
+
+    Games are records in the format of load_csv ({'winner', 'moves'}). The result of a replay that reaches
+    the end of the game overrides the CSV label (which cannot express draws). Positions seen in fewer
+    than `min_games` games are left out. Returns build statistics.
+    """
+    # (black, white, side) -> 规范格子编号 -> [局数, 胜局, 和局]
+    stats = defaultdict(lambda: defaultdict(lambda: [0, 0, 0]))
+    num_games, skipped = 0, 0
+    for record in games:
+        game, path_keys = Othello(record_history=False), []
+        try:
+            # 开局段之后继续复盘到终局，以得到真实胜负
+            for pos in record['moves']:
+                if game.game_over:
+                    break
+                if game.ply < max_plies:
+                    black, white, side, transform = position_key(game)
+                    path_keys.append(((black, white, side), _square_index(transform_coord(pos, transform)),
+                                      game.current_player))
+                game.move(pos)
+        except ValueError:
+            skipped += 1
+            continue
+        # 棋谱未下完（认输或记录不全）时只能用 CSV 的胜负
+        winner = game.get_winner() if game.game_over else record['winner']
+        num_games += 1
+        for key, move, mover in path_keys:
+            counts = stats[key][move]
+            counts[0] += 1
+            if winner is None:
+                counts[2] += 1
+            elif winner == mover:
+                counts[1] += 1
+
+    entries, moves = [], []
+    for (black, white, side), move_counts in stats.items():
+        if sum(counts[0] for counts in move_counts.values()) < min_games:
+            continue
+        entries.append((_hash(black, white, side), black, white, side, move_counts))
+    entries.sort(key=lambda entry: entry[:4])
+
+    buckets = [0] * ((1 << BUCKET_BITS) + 1)
+    for entry in entries:
+        buckets[(entry[0] >> (64 - BUCKET_BITS)) + 1] += 1
+    for i in range(1, len(buckets)):
+        buckets[i] += buckets[i - 1]
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BUCKET_BITS, max_plies, min_games, num_games, len(entries),
+                            sum(len(entry[4]) for entry in entries)))
+        f.write(b"".join(BUCKET.pack(offset) for offset in buckets))
+        for key_hash, black, white, side, move_counts in entries:
+            f.write(ENTRY.pack(key_hash, black, white, side, len(moves), len(move_counts)))
+            # 着法按局数从多到少排列，查询时第一个就是最常见的着法
+            moves.extend(sorted(move_counts.items(), key=lambda item: (-item[1][0], item[0])))
+        for move, (played, wins, draws) in moves:
+            f.write(MOVE.pack(move, played, wins, draws))
+    return {"games": num_games, "skipped_games": skipped, "positions": len(entries), "moves": len(moves),
+            "max_plies": max_plies, "min_games": min_games}
+
+
+class OpeningBook:
+    """
+    Read-only view of a book written by build_opening_book(), memory-mapped so that every process
+    playing from the same file shares its pages.
+
+    Entries are sorted by a 64-bit hash of the canonical position; a table of 2**16 bucket offsets on the
+    hash prefix narrows a lookup to a handful of entries, which are then binary searched (O(1) expected).
+    Positions are canonicalised under the 8 board symmetries, so transposed openings share one entry.
+
+    Args:
+        path: Book file
+        min_games: choose_move() only answers positions played at least this many times
+    """
+
+    def __init__(self, path: str, min_games: int = 10):
+        self.path = path
+        self.min_games = min_games
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.bucket_bits, self.max_plies, self.build_min_games, self.num_games, \
+            self.num_entries, self.num_moves = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an opening book of version {VERSION}")
+        self._entries_offset = HEADER.size + ((1 << self.bucket_bits) + 1) * BUCKET.size
+        self._moves_offset = self._entries_offset + self.num_entries * ENTRY.size
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self.num_entries
+
+    def _find(self, black: int, white: int, side: int) -> Optional[Tuple[int, int]]:
+        key_hash = _hash(black, white, side)
+        bucket = key_hash >> (64 - self.bucket_bits)
+        lo = BUCKET.unpack_from(self._mmap, HEADER.size + bucket * BUCKET.size)[0]
+        hi = BUCKET.unpack_from(self._mmap, HEADER.size + (bucket + 1) * BUCKET.size)[0]
+        target = (key_hash, black, white, side)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if ENTRY.unpack_from(self._mmap, self._entries_offset + mid * ENTRY.size)[:4] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.num_entries:
+            entry = ENTRY.unpack_from(self._mmap, self._entries_offset + lo * ENTRY.size)
+            if entry[:4] == target:
+                return entry[4], entry[5]
+        return None
+
+    def lookup(self, game: Othello) -> Optional[Dict]:
+        """
+        Book statistics of the position, in the game's own orientation:
+        {"games", "moves": {pos: {"games", "wins", "draws", "win_rate"}}} with moves from most to least played
+        and results from the point of view of the side to move. None when the position is not in the book.
+        """
+        # 每步落一子，盘面子数直接给出手数，超出建库深度的局面不必规范化
+        if len(game.black) + len(game.white) - 4 >= self.max_plies or game.game_over:
+            self.misses += 1
+            return None
+        black, white, side, transform = position_key(game)
+        found = self._find(black, white, side)
+        if found is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        start, count = found
+        moves, total = {}, 0
+        for i in range(start, start + count):
+            move, played, wins, draws = MOVE.unpack_from(self._mmap, self._moves_offset + i * MOVE.size)
+            moves[transform_coord(_square(move), INVERSE[transform])] = {
+                "games": played, "wins": wins, "draws": draws, "win_rate": (wins + 0.5 * draws) / played,
+            }
+            total += played
+        return {"games": total, "moves": moves}
+
+    def choose_move(self, game: Othello) -> Optional[str]:
+        """Most played legal book move when the position was played at least min_games times, otherwise None"""
+        entry = self.lookup(game)
+        if entry is None or entry["games"] < self.min_games:
+            return None
+        # 同一局面的书中着法必然合法，这里只做廉价的防御性检查，不生成全部合法着法
+        for pos in entry["moves"]:
+            if game._get_flips(pos):
+                return pos
+        return None
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {"positions": self.num_entries, "games": self.num_games, "max_plies": self.max_plies,
+                "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __getstate__(self):
+        # 进程间只传路径，子进程重新映射同一个文件
+        return {"path": self.path, "min_games": self.min_games}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["min_games"])
@@ -1,129 +1,614 @@
+import copy
 import json
 import random
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from peft import PeftModel
-from typing import Dict, List, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
 
-from src.env.othello_game import Othello 
+from src.env.othello_game import Othello
+from src.env.analysis_cache import AnalysisCache
+from src.env.opening_book import OpeningBook
+from src.data_process.prompts import build_prompt, build_prompt_parts
+from src.utils.metrics import PipelineMetrics
+from src.utils.token_budget import TokenBudgetPredictor
+
+# torch / transformers / peft 在构建和调用模型的方法内部按需导入，
+# 只用到引擎或 PIPELINE_MODES 的代码导入本模块时不会加载它们
+
+
+# llm: Task 1 和 Task 2 都由模型完成
+# engine_task1: Task 1 的候选点由引擎直接计算，只对 Task 2 调用模型
+# verified: 模型完成两个任务，引擎校验 Task 2 的结果，全部被否决时退回引擎的合法走法
+PIPELINE_MODES = ("llm", "engine_task1", "verified")
+
+# bf16: 默认路径，GPU 或 CPU 上以 bf16 推理
+# cpu_int8: 仅 CPU，fp32 加载后对所有 Linear 层做动态 int8 量化
+BACKENDS = ("bf16", "cpu_int8")
 
 
 class OthelloAgent:
-    def __init__(self, base_model_id: str, adapter_path: str, device: str = "auto"):
+    TASK1_MAX_NEW_TOKENS = 512
+    TASK2_MAX_NEW_TOKENS = 1024
+
+    def __init__(self, base_model_id: str, adapter_path: Optional[str] = None, device: str = "auto",
+                 max_batch_size: int = 8, max_batch_tokens: int = 32768,
+                 prompt_layout: str = "legacy", reuse_prefix_cache: bool = False, prefix_cache_size: int = 2,
+                 constrained_decoding: Optional[str] = None, pipeline_mode: str = "llm",
+                 analysis_cache: Optional[AnalysisCache] = None, backend: str = "bf16",
+                 num_threads: Optional[int] = None, static_kv_cache: bool = False,
+                 metrics: Optional[PipelineMetrics] = None, token_budget: Optional[TokenBudgetPredictor] = None,
+                 opening_book: Optional[OpeningBook] = None):
+        """
+        Args:
+            base_model_id: Hugging Face id or local path of the base model; may also be a merged export
+                from scripts/export_merged_model.py, in which case adapter_path stays None
+            adapter_path: LoRA adapter directory, None to run the base model as-is
+            device: 'auto', 'cpu', 'cuda', 'cuda:0', ...
+            max_batch_size: Maximum number of prompts generated together
+            max_batch_tokens: Upper bound on batch_size * (padded prompt length + max_new_tokens)
+            prompt_layout: 'legacy' or 'shared_prefix', must match the layout the adapter was trained on
+            reuse_prefix_cache: Prefill the static instruction once and each position once, and reuse the
+                past-key-values for Task 1 and Task 2 (requires the shared_prefix layout; positions are
+                then processed one at a time instead of in padded batches)
+            prefix_cache_size: Number of per-position caches kept alive
+            constrained_decoding: None, 'schema' (mask logits so outputs always match the Task 1/Task 2 JSON
+                schema with a1-h8 squares) or 'schema_final_only' (same, but the analysis fields are skipped
+                and only the final lists we consume are generated)
+            pipeline_mode: Default pipeline, one of PIPELINE_MODES; can be overridden per call
+            analysis_cache: Optional symmetry-aware LRU cache of finished analyses, shared across calls
+            backend: One of BACKENDS. 'cpu_int8' loads the model in fp32 on the CPU, merges the adapter and
+                applies dynamic int8 quantization to every nn.Linear
+            num_threads: Number of intra-op CPU threads for torch, None keeps the torch default
+            static_kv_cache: Pre-allocate the KV cache for prompt + max_new_tokens (cache_implementation='static')
+                instead of growing it every step; not compatible with reuse_prefix_cache
+            metrics: Per-stage timing and token recorder, a disabled one is created if None;
+                switch it at runtime with agent.metrics.enable() / disable()
+            token_budget: Optional predictor of per-prompt max_new_tokens (see scripts/fit_token_budget.py);
+                TASK1/TASK2_MAX_NEW_TOKENS stay the upper bound and truncated outputs are retried with them
+            opening_book: Optional OpeningBook; choose_move()/choose_moves() play its move without any
+                generation while the position is in the book (analyze_position() always runs the model)
+        """
+        if pipeline_mode not in PIPELINE_MODES:
+            raise ValueError(f"Unknown pipeline mode: {pipeline_mode}. Must be one of {PIPELINE_MODES}")
+        if constrained_decoding not in (None, "schema", "schema_final_only"):
+            raise ValueError(f"Unknown constrained_decoding mode: {constrained_decoding}")
+        if reuse_prefix_cache and prompt_layout != "shared_prefix":
+            raise ValueError("reuse_prefix_cache requires prompt_layout='shared_prefix'")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}. Must be one of {BACKENDS}")
+        if backend == "cpu_int8" and device not in ("auto", "cpu"):
+            raise ValueError("The cpu_int8 backend only runs on device='cpu'")
+        if static_kv_cache and reuse_prefix_cache:
+            raise ValueError("static_kv_cache cannot be combined with reuse_prefix_cache")
+        import torch
+        from transformers import AutoTokenizer
+
         print("Initializing Othello Agent...")
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        if backend == "cpu_int8":
+            device = "cpu"
         self.device = device if device != "auto" else ("cuda" if torch.cuda.is_available() else "cpu")
-        
+        self.backend = backend
+        self.static_kv_cache = static_kv_cache
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.prompt_layout = prompt_layout
+        self.reuse_prefix_cache = reuse_prefix_cache
+        self.prefix_cache_size = prefix_cache_size
+        self._static_prefix_cache = None  # (static text, token ids, past_key_values)
+        self._position_caches = OrderedDict()  # position text -> (token ids, past_key_values)
+        self.constrained_decoding = constrained_decoding
+        self.pipeline_mode = pipeline_mode
+        self.analysis_cache = analysis_cache
+        self.metrics = metrics or PipelineMetrics()
+        self.token_budget = token_budget
+        self.opening_book = opening_book
+        self.adapter_id = adapter_path or base_model_id
+        self._grammar_index = None  # built on first use, scanning the vocabulary takes a few seconds
+        self._grammars = None
+        # 指标记录、前缀缓存和分析缓存都不是线程安全的，多线程调用（如多线程 MCTS）在这里串行化
+        self._lock = threading.RLock()
+
         print(f"Loading base model: {base_model_id}...")
         self.tokenizer = AutoTokenizer.from_pretrained(base_model_id, trust_remote_code=True)
+        # 批量生成时需要左填充，保证所有序列的生成起点对齐
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = self._load_model(base_model_id, adapter_path)
+        self.model.eval()
+        print(f"Agent initialized on device: {self.device} (backend: {self.backend}, "
+              f"{torch.get_num_threads()} CPU threads)")
+
+    def _load_model(self, base_model_id: str, adapter_path: Optional[str]):
+        import torch
+        from transformers import AutoModelForCausalLM
+
+        # 动态 int8 量化只支持 fp32 的 nn.Linear，因此先以 fp32 加载
         self.base_model = AutoModelForCausalLM.from_pretrained(
             base_model_id,
-            torch_dtype=torch.bfloat16, 
+            torch_dtype=torch.float32 if self.backend == "cpu_int8" else torch.bfloat16,
             device_map=self.device,
             trust_remote_code=True
         )
-        
-        print(f"Loading LoRA adapter from: {adapter_path}...")
-        self.model = PeftModel.from_pretrained(self.base_model, adapter_path)
-        self.model.eval() 
-        print(f"Agent initialized on device: {self.device}")
 
-    
+        model = self.base_model
+        if adapter_path:
+            from peft import PeftModel
+
+            print(f"Loading LoRA adapter from: {adapter_path}...")
+            model = PeftModel.from_pretrained(self.base_model, adapter_path)
+            if self.backend == "cpu_int8":
+                # LoRA 分支必须先合并进基础权重，量化后的 Linear 无法再叠加适配器
+                model = model.merge_and_unload()
+
+        if self.backend == "cpu_int8":
+            print("Applying dynamic int8 quantization to linear layers...")
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+
     def _create_prompt(self, task_name: str, game: Othello, **kwargs) -> str:
-        player_str = game.current_player.capitalize()
-        opponent_str = "black" if player_str == "white" else "white"
-        board_json_str = json.dumps({
-            "black_pieces": sorted(list(game.black)),
-            "white_pieces": sorted(list(game.white))
-        }, indent=2)
-
-        if task_name == "Task1":
-            return f"""Task: Analyze Sampled Squares and Identify Plausible Candidates
-                Player to move: {player_str}
-                Opponent: {opponent_str}
-                Board State:
-                {board_json_str}
-
-                Analyze a diverse sample of squares to determine which are plausible candidates for a legal move. A plausible candidate must be an empty square adjacent to an opponent's piece. Conclude with a final_plausible_candidates list containing only the squares identified as plausible."""
-        
-        elif task_name == "Task2":
-            plausible_candidates = kwargs.get("plausible_candidates", [])
-            return f"""Task: Analyze Plausible Candidates for Legality
-                Player to move: {player_str}
-                Opponent: {opponent_str}
-                Board State:
-                {board_json_str}
-                Plausible Candidates to Analyze:
-                {plausible_candidates}
-                For each plausible candidate, determine if it is a legal move by checking the flanking rule. Your analysis must cover every candidate. Conclude with a `final_legal_moves` list containing only the moves confirmed as legal."""
-        
+        return build_prompt(task_name, game, layout=self.prompt_layout, **kwargs)
+
+    def _plan_batches(self, prompt_lengths: List[int], max_new_tokens: List[int]) -> List[List[int]]:
+        """
+        Group prompt indices into batches bounded by max_batch_size and max_batch_tokens.
+        Prompts are sorted by token budget and then by length, so that similar budgets and lengths share
+        a batch and neither padding nor the batch-wide max_new_tokens is inflated by one outlier.
+        """
+        order = sorted(range(len(prompt_lengths)), key=lambda i: (max_new_tokens[i], prompt_lengths[i]))
+        batches, current, current_max, current_budget = [], [], 0, 0
+        for idx in order:
+            new_max = max(current_max, prompt_lengths[idx])
+            new_budget = max(current_budget, max_new_tokens[idx])
+            over_budget = (len(current) + 1) * (new_max + new_budget) > self.max_batch_tokens
+            if current and (len(current) >= self.max_batch_size or over_budget):
+                batches.append(current)
+                current, new_max, new_budget = [], prompt_lengths[idx], max_new_tokens[idx]
+            current.append(idx)
+            current_max, current_budget = new_max, new_budget
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _generation_stats(seconds: float, generated_tokens: int, finished_at: Optional[int],
+                          max_new_tokens: int, prefill_tokens_saved: int = 0) -> Dict:
+        return {
+            "seconds": seconds,
+            "generated_tokens": generated_tokens,
+            # 相对 max_new_tokens 上限，因 JSON 提前闭合而省下的解码步数
+            "tokens_saved": max_new_tokens - finished_at if finished_at is not None else 0,
+            "prefill_tokens_saved": prefill_tokens_saved,
+            # JSON 未闭合且用满了预算，说明输出被截断
+            "truncated": finished_at is None and max_new_tokens > 0 and generated_tokens >= max_new_tokens,
+        }
+
+    def _logits_processors(self, task_name: Optional[str], prompt_length: int, batch_size: int):
+        from transformers import LogitsProcessorList
+        from src.utils.constrained_decoding import SchemaLogitsProcessor, TokenGrammarIndex, task1_grammar, task2_grammar
+
+        if not self.constrained_decoding or task_name not in ("Task1", "Task2"):
+            return LogitsProcessorList()
+        if self._grammars is None:
+            skip_analysis = self.constrained_decoding == "schema_final_only"
+            self._grammars = {"Task1": task1_grammar(skip_analysis), "Task2": task2_grammar(skip_analysis)}
+        if self._grammar_index is None:
+            eos_token_ids = self.model.generation_config.eos_token_id
+            eos_token_ids = eos_token_ids if isinstance(eos_token_ids, list) else [eos_token_ids]
+            eos_token_ids = [i for i in eos_token_ids + [self.tokenizer.eos_token_id] if i is not None]
+            self._grammar_index = TokenGrammarIndex(self.tokenizer, eos_token_ids)
+        return LogitsProcessorList([
+            SchemaLogitsProcessor(self._grammar_index, self._grammars[task_name], prompt_length, batch_size)
+        ])
+
+    def _generate(self, prompts: List[str], max_new_tokens: Union[int, List[int]],
+                  task_name: Optional[str]) -> Tuple[List, List[Dict]]:
+        """
+        Greedy-decode every prompt in left-padded batches, stopping each sequence once its JSON object closes.
+        max_new_tokens is one limit for all prompts or one per prompt (a batch runs to its largest limit).
+        Returns the newly generated text for each prompt (the Exception instead if its batch failed)
+        and per-prompt generation stats, both in input order.
+        """
+        from src.utils.generation import JsonCompletionCriteria
+
+        with self.metrics.stage("tokenize"):
+            prompt_lengths = [len(ids) for ids in self.tokenizer(prompts)["input_ids"]]
+        self.metrics.count_tokens(input_tokens=sum(prompt_lengths))
+        if isinstance(max_new_tokens, int):
+            max_new_tokens = [max_new_tokens] * len(prompts)
+        outputs, stats = [None] * len(prompts), [None] * len(prompts)
+        for batch in self._plan_batches(prompt_lengths, max_new_tokens):
+            batch_max_new_tokens = max(max_new_tokens[i] for i in batch)
+            start = time.perf_counter()
+            try:
+                with self.metrics.stage("tokenize"):
+                    inputs = self.tokenizer([prompts[i] for i in batch], return_tensors="pt", padding=True).to(self.device)
+                prompt_length = inputs["input_ids"].shape[1]
+                json_criteria = JsonCompletionCriteria(self.tokenizer, prompt_length, len(batch))
+                generated = self._timed_generate(
+                    [json_criteria],
+                    **inputs,
+                    max_new_tokens=batch_max_new_tokens,
+                    do_sample=False,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    logits_processor=self._logits_processors(task_name, prompt_length, len(batch)),
+                    **({"cache_implementation": "static"} if self.static_kv_cache else {}),
+                )
+                new_tokens = generated[:, prompt_length:]
+                with self.metrics.stage("detokenize"):
+                    texts = self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+                finished_at = json_criteria.finished_at
+                token_counts = (new_tokens != self.tokenizer.pad_token_id).sum(dim=1).tolist()
+            except Exception as e:
+                texts, finished_at, token_counts = [e] * len(batch), [None] * len(batch), [0] * len(batch)
+            elapsed = time.perf_counter() - start
+            for row, idx in enumerate(batch):
+                outputs[idx] = texts[row]
+                generated_tokens = finished_at[row] if finished_at[row] is not None else token_counts[row]
+                stats[idx] = self._generation_stats(elapsed, generated_tokens, finished_at[row], batch_max_new_tokens)
+                self.metrics.count_tokens(output_tokens=generated_tokens)
+        return outputs, stats
+
+    def _timed_generate(self, stopping_criteria: List, **generate_kwargs):
+        """model.generate() that splits its time into the prefill and decode stages while metrics are on"""
+        from transformers import StoppingCriteriaList
+        from src.utils.generation import FirstTokenTimer
+
+        if not self.metrics.enabled:
+            return self.model.generate(stopping_criteria=StoppingCriteriaList(stopping_criteria), **generate_kwargs)
+        timer = FirstTokenTimer()
+        start = time.perf_counter()
+        generated = self.model.generate(stopping_criteria=StoppingCriteriaList(stopping_criteria + [timer]),
+                                        **generate_kwargs)
+        end = time.perf_counter()
+        first_token_time = timer.first_token_time or end
+        self.metrics.add("prefill", first_token_time - start)
+        self.metrics.add("decode", end - first_token_time)
+        return generated
+
+    def _tokenize_ids(self, text: str, add_special_tokens: bool) -> List[int]:
+        return self.tokenizer(text, add_special_tokens=add_special_tokens)["input_ids"]
+
+    def _prefill(self, token_ids: List[int], past_key_values=None):
+        """Run a forward pass over token_ids on top of past_key_values and return the extended cache"""
+        import torch
+
+        past_len = past_key_values.get_seq_length() if past_key_values is not None else 0
+        input_ids = torch.tensor([token_ids], device=self.device)
+        attention_mask = torch.ones((1, past_len + len(token_ids)), dtype=torch.long, device=self.device)
+        outputs = self.model(input_ids=input_ids, attention_mask=attention_mask,
+                             past_key_values=past_key_values, use_cache=True)
+        return outputs.past_key_values
+
+    def _get_position_cache(self, static_text: str, position_text: str):
+        """
+        Return (prefix token ids, cache, tokens that did not need prefilling) for static_text + position_text.
+        The static prefix is prefilled once for the lifetime of the agent, each position once while it
+        stays in the small LRU of position caches.
+        """
+        if self._static_prefix_cache is None or self._static_prefix_cache[0] != static_text:
+            with self.metrics.stage("tokenize"):
+                static_ids = self._tokenize_ids(static_text, add_special_tokens=True)
+            with self.metrics.stage("prefill"):
+                static_cache = self._prefill(static_ids)
+            self._static_prefix_cache = (static_text, static_ids, static_cache)
+            self._position_caches.clear()
+        _, static_ids, static_cache = self._static_prefix_cache
+
+        if position_text in self._position_caches:
+            self._position_caches.move_to_end(position_text)
+            prefix_ids, position_cache = self._position_caches[position_text]
+            return prefix_ids, position_cache, len(prefix_ids)
+
+        with self.metrics.stage("tokenize"):
+            position_ids = self._tokenize_ids(position_text, add_special_tokens=False)
+        with self.metrics.stage("prefill"):
+            position_cache = self._prefill(position_ids, copy.deepcopy(static_cache))
+        prefix_ids = static_ids + position_ids
+        self._position_caches[position_text] = (prefix_ids, position_cache)
+        while len(self._position_caches) > self.prefix_cache_size:
+            self._position_caches.popitem(last=False)
+        return prefix_ids, position_cache, len(static_ids)
+
+    def _generate_with_prefix_cache(self, prompt_parts: List[tuple], max_new_tokens: List[int],
+                                    task_name: str) -> Tuple[List, List[Dict]]:
+        """
+        Greedy-decode each (static, position, task) prompt on top of the cached prefix.
+        Same return values as _generate; the stats also count the prompt tokens that were not prefilled.
+        """
+        import torch
+        from src.utils.generation import JsonCompletionCriteria
+
+        outputs, stats = [], []
+        for (static_text, position_text, task_text), prompt_max_new_tokens in zip(prompt_parts, max_new_tokens):
+            start = time.perf_counter()
+            try:
+                prefix_ids, prefix_cache, saved = self._get_position_cache(static_text, position_text)
+                with self.metrics.stage("tokenize"):
+                    task_ids = self._tokenize_ids(task_text, add_special_tokens=False)
+                self.metrics.count_tokens(input_tokens=len(prefix_ids) + len(task_ids))
+                input_ids = torch.tensor([prefix_ids + task_ids], device=self.device)
+                json_criteria = JsonCompletionCriteria(self.tokenizer, input_ids.shape[1])
+                # generate 只会对缓存之后的 token 做 prefill；传入副本以免污染共享的缓存
+                generated = self._timed_generate(
+                    [json_criteria],
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=copy.deepcopy(prefix_cache),
+                    max_new_tokens=prompt_max_new_tokens,
+                    do_sample=False,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    logits_processor=self._logits_processors(task_name, input_ids.shape[1], 1),
+                )
+                new_tokens = generated[0, input_ids.shape[1]:]
+                with self.metrics.stage("detokenize"):
+                    outputs.append(self.tokenizer.decode(new_tokens, skip_special_tokens=True))
+                finished_at = json_criteria.finished_at[0]
+                generated_tokens = finished_at if finished_at is not None else new_tokens.shape[0]
+                self.metrics.count_tokens(output_tokens=generated_tokens)
+            except Exception as e:
+                outputs.append(e)
+                saved, finished_at, generated_tokens = 0, None, 0
+            stats.append(self._generation_stats(time.perf_counter() - start, generated_tokens, finished_at,
+                                                prompt_max_new_tokens, prefill_tokens_saved=saved))
+        return outputs, stats
+
+    def _run_stage(self, task_name: str, games: List[Othello], max_new_tokens: int, kwargs_list: Optional[List[Dict]] = None):
+        """
+        Build and generate the prompts of one task. max_new_tokens is the flat cap; with a token budget
+        predictor each prompt gets its own smaller limit and prompts truncated by it are retried with the cap.
+        """
+        kwargs_list = kwargs_list or [{} for _ in games]
+        if self.token_budget is not None:
+            budgets = [self.token_budget.predict(task_name, game, max_new_tokens, **kwargs)
+                       for game, kwargs in zip(games, kwargs_list)]
+        else:
+            budgets = [max_new_tokens] * len(games)
+
+        if self.reuse_prefix_cache:
+            with self.metrics.stage("prompt_build"):
+                prompts = [build_prompt_parts(task_name, game, layout=self.prompt_layout, **kwargs)
+                           for game, kwargs in zip(games, kwargs_list)]
+            generate = self._generate_with_prefix_cache
         else:
-            raise ValueError(f"Unknown task name: {task_name}")
+            with self.metrics.stage("prompt_build"):
+                prompts = [self._create_prompt(task_name, game, **kwargs) for game, kwargs in zip(games, kwargs_list)]
+            generate = self._generate
+        outputs, stats = generate(prompts, budgets, task_name)
+        return self._retry_truncated(generate, prompts, budgets, max_new_tokens, outputs, stats, task_name)
+
+    @staticmethod
+    def _retry_truncated(generate, prompts: List, budgets: List[int], max_new_tokens: int,
+                         outputs: List, stats: List[Dict], task_name: Optional[str]) -> Tuple[List, List[Dict]]:
+        """Regenerate the prompts that were truncated by a budget below max_new_tokens, this time with max_new_tokens"""
+        retry = [idx for idx, stage_stats in enumerate(stats) if stage_stats["truncated"] and budgets[idx] < max_new_tokens]
+        if retry:
+            retry_outputs, retry_stats = generate([prompts[idx] for idx in retry], [max_new_tokens] * len(retry), task_name)
+            for idx, output, stage_stats in zip(retry, retry_outputs, retry_stats):
+                # 重试的耗时和生成量计入本阶段，便于评估预算过紧的代价
+                stage_stats["seconds"] += stats[idx]["seconds"]
+                stage_stats["generated_tokens"] += stats[idx]["generated_tokens"]
+                stage_stats["budget_retry"] = True
+                outputs[idx], stats[idx] = output, stage_stats
+        return outputs, stats
+
+    @staticmethod
+    def _parse_json_output(text) -> Dict:
+        if isinstance(text, Exception):
+            raise text
+        return json.loads(text[text.find('{'):text.rfind('}')+1])
+
+    @staticmethod
+    def _parse_task2_output(task2_output: Dict) -> Dict[str, int]:
+        """Map each predicted legal move to its number of flipped stones"""
+        legal_moves = {}
+        final_legal_moves = task2_output.get("final_legal_moves")
+        if isinstance(final_legal_moves, dict):
+            # 训练数据格式: {"e6": ["e5"], ...}
+            for pos, flipped in final_legal_moves.items():
+                legal_moves[pos] = len(flipped) if isinstance(flipped, list) else 0
+            return legal_moves
+
+        detailed_analysis = task2_output.get("detailed_analysis", [])
+        if isinstance(detailed_analysis, list) and detailed_analysis:
+            for move_analysis in detailed_analysis:
+                if move_analysis.get("is_legal"):
+                    legal_moves[move_analysis.get("position")] = len(move_analysis.get("flipped_stones", []))
+        elif isinstance(final_legal_moves, list):
+            for pos in final_legal_moves:
+                legal_moves[pos] = 0
+        return legal_moves
+
+    @staticmethod
+    def _record_stage_stats(analysis_result: Dict, stage: str, stage_stats: Dict):
+        analysis_result["stage_stats"][stage] = stage_stats
+        analysis_result["prefill_tokens_saved"] += stage_stats["prefill_tokens_saved"]
+
+    @staticmethod
+    def _record_error(analysis_result: Dict, stage: str, error: Exception):
+        error_msg = f"Error in {stage}: {error}"
+        analysis_result["errors"].append(error_msg)
+        print(error_msg)
 
-    def analyze_position(self, game: Othello) -> Dict:
-        analysis_result = {
+    @staticmethod
+    def _verify_with_engine(game: Othello, analysis_result: Dict):
+        """Keep only the predicted moves the engine accepts; fall back to the engine's moves if none survive"""
+        valid_moves = set(game.get_valid_moves())
+        predicted = analysis_result["predicted_legal_moves_analysis"]
+        verified = {pos: len(game._get_flips(pos)) for pos in predicted if pos in valid_moves}
+        fallback = not verified and bool(valid_moves)
+        if fallback:
+            verified = {pos: len(game._get_flips(pos)) for pos in valid_moves}
+        analysis_result["verification"] = {
+            "llm_legal_moves": sorted(predicted),
+            "rejected": sorted(set(predicted) - valid_moves),
+            "fallback": fallback,
+        }
+        analysis_result["predicted_legal_moves_analysis"] = verified
+        analysis_result["predicted_legal_moves"] = sorted(verified)
+
+    def _analyze_games(self, games: List[Othello], mode: str) -> List[Dict]:
+        import torch
+
+        analysis_results = [{
+            "mode": mode,
             "plausible_candidates": None,
             "predicted_legal_moves_analysis": {},
             "predicted_legal_moves": [],
             "chosen_move": None,
+            "prefill_tokens_saved": 0,
+            "stage_stats": {},
             "errors": []
-        }
+        } for _ in games]
 
         with torch.no_grad():
             # --- Step 1: Identify Plausible Candidates ---
-            try:
-                # (The code for Step 1 is the same as before)
-                prompt1 = self._create_prompt("Task1", game)
-                inputs1 = self.tokenizer(prompt1, return_tensors="pt").to(self.device)
-                outputs1 = self.model.generate(**inputs1, max_new_tokens=512, do_sample=False)
-                response1_text = self.tokenizer.decode(outputs1[0], skip_special_tokens=True)
-                
-                json_str1 = response1_text[response1_text.find('{'):response1_text.rfind('}')+1]
-                task1_output = json.loads(json_str1)
-                analysis_result["plausible_candidates"] = task1_output.get("final_plausible_candidates", [])
-            except Exception as e:
-                error_msg = f"Error in Task 1: {e}"
-                analysis_result["errors"].append(error_msg)
-                print(error_msg)
-                return analysis_result
+            task2_indices = []
+            if mode == "engine_task1":
+                for idx, game in enumerate(games):
+                    start = time.perf_counter()
+                    analysis_results[idx]["plausible_candidates"] = game.get_plausible_candidates()
+                    self._record_stage_stats(analysis_results[idx], "task1",
+                                             self._generation_stats(time.perf_counter() - start, 0, None, 0))
+                    task2_indices.append(idx)
+            else:
+                responses1, stats1 = self._run_stage("Task1", games, self.TASK1_MAX_NEW_TOKENS)
+                for idx, response1_text in enumerate(responses1):
+                    self._record_stage_stats(analysis_results[idx], "task1", stats1[idx])
+                    try:
+                        with self.metrics.stage("parse"):
+                            task1_output = self._parse_json_output(response1_text)
+                        analysis_results[idx]["plausible_candidates"] = task1_output.get("final_plausible_candidates", [])
+                        task2_indices.append(idx)
+                    except Exception as e:
+                        self._record_error(analysis_results[idx], "Task 1", e)
 
             # --- Step 2: Filter for Legal Moves ---
-            try:
-                # (The code for Step 2 is the same as before)
-                prompt2 = self._create_prompt("Task2", game, plausible_candidates=analysis_result["plausible_candidates"])
-                inputs2 = self.tokenizer(prompt2, return_tensors="pt").to(self.device)
-                outputs2 = self.model.generate(**inputs2, max_new_tokens=1024, do_sample=False)
-                response2_text = self.tokenizer.decode(outputs2[0], skip_special_tokens=True)
-
-                json_str2 = response2_text[response2_text.find('{'):response2_text.rfind('}')+1]
-                task2_output = json.loads(json_str2)
-                
-                detailed_analysis = task2_output.get("detailed_analysis", [])
-                legal_moves_list = []
-                for move_analysis in detailed_analysis:
-                    if move_analysis.get("is_legal"):
-                        pos = move_analysis.get("position")
-                        flipped_count = len(move_analysis.get("flipped_stones", []))
-                        analysis_result["predicted_legal_moves_analysis"][pos] = flipped_count
-                        legal_moves_list.append(pos)
-                analysis_result["predicted_legal_moves"] = sorted(legal_moves_list)
+            responses2, stats2 = self._run_stage(
+                "Task2",
+                [games[idx] for idx in task2_indices],
+                self.TASK2_MAX_NEW_TOKENS,
+                [{"plausible_candidates": analysis_results[idx]["plausible_candidates"]} for idx in task2_indices],
+            ) if task2_indices else ([], [])
 
-            except Exception as e:
-                error_msg = f"Error in Task 2: {e}"
-                analysis_result["errors"].append(error_msg)
-                print(error_msg)
-                return analysis_result
+            for idx, response2_text, stage_stats in zip(task2_indices, responses2, stats2):
+                self._record_stage_stats(analysis_results[idx], "task2", stage_stats)
+                try:
+                    with self.metrics.stage("parse"):
+                        task2_output = self._parse_json_output(response2_text)
+                        legal_moves_analysis = self._parse_task2_output(task2_output)
+                    analysis_results[idx]["predicted_legal_moves_analysis"] = legal_moves_analysis
+                    analysis_results[idx]["predicted_legal_moves"] = sorted(legal_moves_analysis)
+                except Exception as e:
+                    self._record_error(analysis_results[idx], "Task 2", e)
+
+        if mode == "verified":
+            for game, analysis_result in zip(games, analysis_results):
+                self._verify_with_engine(game, analysis_result)
 
         # --- Step 3 : Greedy Algorithm ---
-        if analysis_result["predicted_legal_moves_analysis"]:
-            best_move = max(
-                analysis_result["predicted_legal_moves_analysis"].items(), 
-                key=lambda item: item[1]
-            )[0]
-            analysis_result["chosen_move"] = best_move
-        
-        return analysis_result
-
-    # choose_move method remains the same
-    def choose_move(self, game: Othello) -> Optional[str]:
-        analysis = self.analyze_position(game)
-        return analysis.get("chosen_move")
+        with self.metrics.stage("greedy"):
+            for analysis_result in analysis_results:
+                if analysis_result["predicted_legal_moves_analysis"]:
+                    best_move = max(
+                        analysis_result["predicted_legal_moves_analysis"].items(),
+                        key=lambda item: item[1]
+                    )[0]
+                    analysis_result["chosen_move"] = best_move
+
+        return analysis_results
+
+    def analyze_positions(self, games: List[Othello], mode: Optional[str] = None) -> List[Dict]:
+        """
+        Run the Task 1 -> Task 2 -> greedy pipeline on several games at once.
+        All Task 1 prompts are batched together, then all Task 2 prompts of the games that
+        survived Task 1. Failures are reported in the `errors` list of the affected game only.
+        With reuse_prefix_cache the games are processed one after another so that the prefilled
+        position is still cached when its Task 2 prompt is generated.
+        `mode` overrides the agent's pipeline_mode for this call.
+        Positions found in the analysis cache (up to symmetry) are answered without generation.
+        While self.metrics is enabled the whole call is recorded as one metrics record.
+        """
+        mode = mode or self.pipeline_mode
+        if mode not in PIPELINE_MODES:
+            raise ValueError(f"Unknown pipeline mode: {mode}. Must be one of {PIPELINE_MODES}")
+
+        with self._lock:
+            self.metrics.begin_call(kind="analysis", mode=mode, positions=len(games))
+            try:
+                analysis_results = self._analyze_positions(games, mode)
+            finally:
+                self.metrics.end_call()
+        return analysis_results
+
+    def _analyze_positions(self, games: List[Othello], mode: str) -> List[Dict]:
+        analysis_results = [None] * len(games)
+        namespace = f"{self.adapter_id}|{self.backend}|{self.prompt_layout}|{self.constrained_decoding}|{mode}"
+        pending = []
+        for idx, game in enumerate(games):
+            cached = self.analysis_cache.get(game, namespace) if self.analysis_cache is not None else None
+            if cached is not None:
+                cached["cache_hit"] = True
+                analysis_results[idx] = cached
+            else:
+                pending.append(idx)
+
+        pending_games = [games[idx] for idx in pending]
+        if self.reuse_prefix_cache:
+            computed = [self._analyze_games([game], mode)[0] for game in pending_games]
+        else:
+            computed = self._analyze_games(pending_games, mode) if pending_games else []
+
+        for idx, analysis_result in zip(pending, computed):
+            analysis_result["cache_hit"] = False
+            # 出错的结果不缓存，下次重新分析
+            if self.analysis_cache is not None and not analysis_result["errors"]:
+                self.analysis_cache.put(games[idx], analysis_result, namespace)
+            analysis_results[idx] = analysis_result
+        return analysis_results
+
+    def analyze_position(self, game: Othello, mode: Optional[str] = None) -> Dict:
+        return self.analyze_positions([game], mode)[0]
+
+    def choose_move(self, game: Othello, mode: Optional[str] = None) -> Optional[str]:
+        return self.choose_moves([game], mode)[0]
+
+    def choose_moves(self, games: List[Othello], mode: Optional[str] = None) -> List[Optional[str]]:
+        """Chosen move of every game; positions in the opening book are answered from it, the rest in one batch"""
+        with self._lock:
+            moves = [self.opening_book.choose_move(game) if self.opening_book is not None else None for game in games]
+            pending = [idx for idx, move in enumerate(moves) if move is None]
+            if pending:
+                analyses = self.analyze_positions([games[idx] for idx in pending], mode)
+                for idx, analysis in zip(pending, analyses):
+                    moves[idx] = analysis.get("chosen_move")
+        return moves
+
+    def generate_texts(self, prompts: List[str], max_new_tokens: Union[int, List[int]] = 1024,
+                       task_name: Optional[str] = None, retry_max_new_tokens: Optional[int] = None) -> Tuple[List, List[Dict]]:
+        """
+        Batched greedy completion of raw prompts, used by the inference server and the evaluation harness.
+        max_new_tokens may be given per prompt; outputs truncated by it are regenerated with
+        retry_max_new_tokens when that is set. task_name ('Task1'/'Task2') enables the constrained
+        decoding grammar of that task when the agent was built with one.
+        """
+        import torch
+
+        with self._lock:
+            self.metrics.begin_call(kind="completion", positions=len(prompts))
+            try:
+                with torch.no_grad():
+                    outputs, stats = self._generate(prompts, max_new_tokens, task_name=task_name)
+                    if retry_max_new_tokens and not isinstance(max_new_tokens, int):
+                        outputs, stats = self._retry_truncated(self._generate, prompts, max_new_tokens, retry_max_new_tokens,
+                                                               outputs, stats, task_name)
+                    return outputs, stats
+            finally:
+                self.metrics.end_call()
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._tokenize_ids(text, add_special_tokens=True))
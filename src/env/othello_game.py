@@ -1,9 +1,34 @@
 import csv
 import re
 
+# 每个格子的相邻格子，顺序与 (dr, dc) 从 (-1, -1) 到 (1, 1) 的遍历顺序一致
+NEIGHBORS = {
+    chr(col + ord('a')) + str(row + 1): [
+        chr(col + dc + ord('a')) + str(row + dr + 1)
+        for dr in (-1, 0, 1) for dc in (-1, 0, 1)
+        if (dr or dc) and 0 <= row + dr < 8 and 0 <= col + dc < 8
+    ]
+    for row in range(8) for col in range(8)
+}
+# 按行优先的扫描顺序，get_valid_moves 的返回顺序与逐格扫描时一致
+SQUARE_ORDER = {chr(col + ord('a')) + str(row + 1): row * 8 + col for row in range(8) for col in range(8)}
+
 class Othello:
-    def __init__(self):
+    """
+    Othello board and rules.
+
+    By default every move appends a full record (with copies of both disc sets) to move_history.
+    Othello(record_history=False) is the lightweight mode for search and batch workloads: move()
+    only pushes a compact (position, player, flips) entry on the undo stack, which unmake() pops in
+    both modes. clone() copies the current position with a fixed number of allocations.
+    """
+
+    __slots__ = ('size', 'record_history', 'black', 'white', 'move_history', 'current_player', 'game_over',
+                 'frontier', '_adjacent', '_undo')
+
+    def __init__(self, record_history=True):
         self.size = 8
+        self.record_history = record_history
         self.reset()
 
     def reset(self):
@@ -11,9 +36,71 @@ class Othello:
         self.black = {'d5', 'e4'}
         self.white = {'d4', 'e5'}
         self.move_history = []  # Stores comprehensive information of each move
+        self._undo = []  # (position, player, flipped stones) of every move, for unmake()
         self.current_player = 'black'  # Black player goes first
         self.game_over = False
-        self._record_initial_state()
+        self._rebuild_frontier()
+        if self.record_history:
+            self._record_initial_state()
+
+    def clone(self, record_history=False):
+        """
+        Copy of the current position whose cost does not depend on the length of the game.
+        The clone starts with an empty undo stack (and a fresh step-0 record when record_history is set).
+        """
+        clone = Othello.__new__(Othello)
+        clone.size = self.size
+        clone.record_history = record_history
+        clone.black = set(self.black)
+        clone.white = set(self.white)
+        clone.current_player = self.current_player
+        clone.game_over = self.game_over
+        clone.frontier = {'black': set(self.frontier['black']), 'white': set(self.frontier['white'])}
+        clone._adjacent = {'black': self._adjacent['black'].copy(), 'white': self._adjacent['white'].copy()}
+        clone._undo = []
+        clone.move_history = []
+        if record_history:
+            clone._record_initial_state()
+        return clone
+
+    @property
+    def ply(self):
+        """Number of moves played since the last reset(), set_board_state() or clone()"""
+        return len(self._undo)
+
+    def played_moves(self):
+        """Positions played since the last reset(), set_board_state() or clone(), in order"""
+        return [entry[0] for entry in self._undo]
+
+    def _rebuild_frontier(self):
+        """
+        Recompute from scratch, for each colour, how many of its discs touch every square and the
+        frontier: the empty squares next to at least one disc of that colour. move() and unmake()
+        then keep both up to date incrementally.
+        """
+        self._adjacent = {'black': dict.fromkeys(NEIGHBORS, 0), 'white': dict.fromkeys(NEIGHBORS, 0)}
+        for color, discs in (('black', self.black), ('white', self.white)):
+            counts = self._adjacent[color]
+            for pos in discs:
+                for neighbor in NEIGHBORS[pos]:
+                    counts[neighbor] += 1
+        occupied = self.black | self.white
+        self.frontier = {
+            color: {pos for pos, count in self._adjacent[color].items() if count and pos not in occupied}
+            for color in ('black', 'white')
+        }
+
+    def _shift_adjacency(self, pos, color, delta):
+        """A disc of `color` appeared (delta=1) or disappeared (delta=-1) at pos; update its neighbours"""
+        counts, frontier = self._adjacent[color], self.frontier[color]
+        for neighbor in NEIGHBORS[pos]:
+            counts[neighbor] += delta
+            if neighbor in self.black or neighbor in self.white:
+                continue
+            if counts[neighbor]:
+                frontier.add(neighbor)
+            else:
+                frontier.discard(neighbor)
 
     def _record_initial_state(self):
         """Record initial board state as step 0"""
@@ -81,13 +168,13 @@ class Othello:
 
     def get_valid_moves(self):
         """Return list of all valid moves for current player"""
-        valid = []
-        for row in range(self.size):
-            for col in range(self.size):
-                coord = self._to_coord(row, col)
-                if coord not in self.black and coord not in self.white and self._get_flips(coord):
-                    valid.append(coord)
-        return valid
+        # 只有与对方棋子相邻的空格才可能合法
+        opponent_frontier = self.frontier['white' if self.current_player == 'black' else 'black']
+        return [coord for coord in sorted(opponent_frontier, key=SQUARE_ORDER.__getitem__) if self._get_flips(coord)]
+
+    def get_plausible_candidates(self):
+        """Return sorted empty squares adjacent to at least one opponent stone (Task 1 candidates)"""
+        return sorted(self.frontier['white' if self.current_player == 'black' else 'black'])
 
     def move(self, coord):
         """
@@ -126,6 +213,14 @@ class Othello:
                 self.black.remove(pos)
                 self.white.add(pos)
 
+        opponent = 'white' if current_player == 'black' else 'black'
+        self.frontier['black'].discard(coord)
+        self.frontier['white'].discard(coord)
+        self._shift_adjacency(coord, current_player, 1)
+        for pos in flips:
+            self._shift_adjacency(pos, opponent, -1)
+            self._shift_adjacency(pos, current_player, 1)
+
         next_player = 'white' if current_player == 'black' else 'black'
         
         # Check game over status
@@ -140,22 +235,56 @@ class Othello:
                     self.game_over = True
             next_player = self.current_player
 
-        # Record comprehensive move information
-        self.move_history.append({
-            'step': len(self.move_history),
-            'player': current_player,
-            'position': coord,
-            'flipped_stones': flips.copy(),
-            'board_state': {
-                'black': set(self.black),
-                'white': set(self.white)
-            },
-            'next_player': next_player if not self.game_over else None,
-            'game_over': self.game_over
-        })
+        self._undo.append((coord, current_player, tuple(flips)))
+        if self.record_history:
+            # Record comprehensive move information
+            self.move_history.append({
+                'step': len(self.move_history),
+                'player': current_player,
+                'position': coord,
+                'flipped_stones': flips.copy(),
+                'board_state': {
+                    'black': set(self.black),
+                    'white': set(self.white)
+                },
+                'next_player': next_player if not self.game_over else None,
+                'game_over': self.game_over
+            })
 
         return flips
 
+    def unmake(self):
+        """
+        Undo the last move (used by search to walk the tree without copying)
+        Returns the undone position
+        Raises ValueError if there is no move to undo
+        """
+        if not self._undo:
+            raise ValueError("No move to undo")
+
+        coord, player, flips = self._undo.pop()
+        if self.record_history:
+            self.move_history.pop()
+        mover, opponent = (self.black, self.white) if player == 'black' else (self.white, self.black)
+        mover.remove(coord)
+        for pos in flips:
+            mover.remove(pos)
+            opponent.add(pos)
+
+        other = 'white' if player == 'black' else 'black'
+        self._shift_adjacency(coord, player, -1)
+        for pos in flips:
+            self._shift_adjacency(pos, player, -1)
+            self._shift_adjacency(pos, other, 1)
+        for color in ('black', 'white'):
+            if self._adjacent[color][coord]:
+                self.frontier[color].add(coord)
+
+        # 走子之前轮到 player 落子且对局尚未结束
+        self.current_player = player
+        self.game_over = False
+        return coord
+
     def _check_game_over(self):
         """Check if game should end (board full or no valid moves for both players)"""
         if len(self.black) + len(self.white) == self.size * self.size:
@@ -245,10 +374,14 @@ class Othello:
         
         # 清除所有历史记录，创建全新游戏
         self.move_history = []
+        self._undo = []
         self.game_over = False  # 新游戏状态下游戏未结束
         self.current_player = player
         self.black = black_positions.copy()
         self.white = white_positions.copy()
+        self._rebuild_frontier()
+        if not self.record_history:
+            return
         
         # 记录新的初始状态（作为第0步）
         self.move_history.append({
@@ -0,0 +1,236 @@
+import random
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+from src.env.othello_game import Othello
+from src.env.search import AlphaBetaSearch
+
+SQUARES = [chr(col + ord('a')) + str(row + 1) for row in range(8) for col in range(8)]
+SQUARE_INDEX = {pos: i for i, pos in enumerate(SQUARES)}
+
+# Zobrist 键：每个格子每种颜色一个随机 64 位数，再加一个表示白方行棋的数
+_rng = random.Random(0x0CE110)
+ZOBRIST_BLACK = {pos: _rng.getrandbits(64) for pos in SQUARES}
+ZOBRIST_WHITE = {pos: _rng.getrandbits(64) for pos in SQUARES}
+ZOBRIST_WHITE_TO_MOVE = _rng.getrandbits(64)
+
+NO_MOVE = 0xFF
+
+
+def zobrist_key(game: Othello) -> int:
+    key = ZOBRIST_WHITE_TO_MOVE if game.current_player == 'white' else 0
+    for pos in game.black:
+        key ^= ZOBRIST_BLACK[pos]
+    for pos in game.white:
+        key ^= ZOBRIST_WHITE[pos]
+    return key
+
+
+class SharedTranspositionTable:
+    """
+    Fixed-size, lock-free transposition table in a multiprocessing.shared_memory block.
+
+    Each 16-byte slot holds (key ^ data, data), with data packing value, depth, flag and move.
+    A slot torn by two concurrent writers fails the key check and reads as a miss, so no lock is needed.
+    Replacement is always-replace. The first bytes of the block are a header; byte 0 is the stop flag
+    that tells helper searches to finish.
+
+    Args:
+        num_entries: Number of slots, rounded up to a power of two
+        name: Attach to an existing block (in worker processes) instead of creating one
+    """
+
+    HEADER_SIZE = 64
+    SLOT = struct.Struct("<QQ")
+
+    def __init__(self, num_entries: int = 1 << 20, name: Optional[str] = None):
+        self.num_entries = 1 << max(0, (num_entries - 1).bit_length())
+        self.mask = self.num_entries - 1
+        size = self.HEADER_SIZE + self.num_entries * self.SLOT.size
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.shm.buf[:size] = bytes(size)
+        else:
+            # 子进程与创建者共用同一个 resource_tracker，只有创建者负责 unlink
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.buf = self.shm.buf
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def get(self, key: int) -> Optional[Tuple]:
+        check, data = self.SLOT.unpack_from(self.buf, self.HEADER_SIZE + (key & self.mask) * self.SLOT.size)
+        if data == 0 or check ^ data != key:
+            return None
+        value = data & 0xFFFFFFFF
+        if value >= 1 << 31:
+            value -= 1 << 32
+        depth, flag, move = (data >> 32) & 0xFF, (data >> 40) & 0xFF, (data >> 48) & 0xFF
+        return depth, value, flag, None if move == NO_MOVE else SQUARES[move]
+
+    def store(self, key: int, entry: Tuple):
+        depth, value, flag, move = entry
+        move_index = NO_MOVE if move is None else SQUARE_INDEX[move]
+        # 第 56 位恒为 1，保证有效槽的 data 永不为 0（全零表示空槽）
+        data = (int(value) & 0xFFFFFFFF) | ((depth & 0xFF) << 32) | (flag << 40) | (move_index << 48) | (1 << 56)
+        self.SLOT.pack_into(self.buf, self.HEADER_SIZE + (key & self.mask) * self.SLOT.size, key ^ data, data)
+
+    @property
+    def stop(self) -> bool:
+        return self.buf[0] == 1
+
+    @stop.setter
+    def stop(self, value: bool):
+        self.buf[0] = 1 if value else 0
+
+    def clear(self):
+        size = self.num_entries * self.SLOT.size
+        self.buf[self.HEADER_SIZE:self.HEADER_SIZE + size] = bytes(size)
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedTableSearch(AlphaBetaSearch):
+    """
+    One lazy-SMP searcher: AlphaBetaSearch reading and writing the shared table.
+    Helpers (worker_id > 0) search one ply deeper on odd ids so the threads spread over different
+    depths, and stop as soon as the table's stop flag is raised.
+    """
+
+    def __init__(self, table: SharedTranspositionTable, worker_id: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.table = table
+        self.worker_id = worker_id
+
+    def _tt_key(self, game: Othello) -> int:
+        return zobrist_key(game)
+
+    def _tt_probe(self, key: int) -> Optional[Tuple]:
+        return self.table.get(key)
+
+    def _tt_store(self, key: int, entry: Tuple):
+        self.table.store(key, entry)
+
+    def _should_stop(self) -> bool:
+        return (self.worker_id > 0 and self.table.stop) or super()._should_stop()
+
+    def _search_depth(self, game: Othello) -> Tuple[int, bool]:
+        depth, solved = super()._search_depth(game)
+        if solved or self.worker_id % 2 == 0:
+            return depth, solved
+        return depth + 1, solved
+
+
+_worker_table: Optional[SharedTranspositionTable] = None
+
+
+def _init_worker(table_name: str, num_entries: int):
+    global _worker_table
+    _worker_table = SharedTranspositionTable(num_entries, name=table_name)
+
+
+def _board(game: Othello) -> Dict:
+    return {'black': set(game.black), 'white': set(game.white)}
+
+
+def _worker_search(worker_id: int, board_state: Dict, player: str, options: Dict) -> Dict:
+    game = Othello(record_history=False)
+    game.set_board_state(board_state, player)
+    return SharedTableSearch(_worker_table, worker_id, **options).search(game)
+
+
+def _worker_score_moves(board_state: Dict, player: str, moves: List[str], depth: int, options: Dict) -> Dict:
+    game = Othello(record_history=False)
+    game.set_board_state(board_state, player)
+    search = SharedTableSearch(_worker_table, 0, **options)
+    return {"scores": search._root(game, depth, moves), "nodes": search.nodes}
+
+
+class ParallelSearch:
+    """
+    Multi-process front end for AlphaBetaSearch with the same search()/score_moves() interface.
+
+    search() runs lazy SMP: every worker searches the root with iterative deepening, sharing one
+    SharedTranspositionTable. Worker 0's result is returned and the helpers are stopped when it finishes.
+    score_moves() splits the root moves over the workers, since each move gets a full-window search anyway.
+
+    With workers=1 everything runs in-process on a plain AlphaBetaSearch, so results are deterministic and
+    identical to the single-threaded engine. Call close() (or use it as a context manager) to release the
+    pool and the shared memory.
+    """
+
+    def __init__(self, depth: int = 4, endgame_depth: int = 10, time_limit: Optional[float] = None,
+                 workers: int = 1, tt_entries: int = 1 << 20, evaluation: str = "weights"):
+        self.options = {"depth": depth, "endgame_depth": endgame_depth, "time_limit": time_limit, "evaluation": evaluation}
+        self.workers = workers
+        self.nodes = 0
+        if workers <= 1:
+            self._serial = AlphaBetaSearch(**self.options)
+            self.table = self._executor = None
+            return
+        self._serial = None
+        self.table = SharedTranspositionTable(tt_entries)
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                             initargs=(self.table.name, self.table.num_entries))
+
+    def search(self, game: Othello) -> Dict:
+        """Same result as AlphaBetaSearch.search(); "nodes" counts every worker and "workers" is added"""
+        if self._serial is not None:
+            result = self._serial.search(game)
+            self.nodes = result["nodes"]
+            return {**result, "workers": 1}
+
+        start = time.perf_counter()
+        board_state, player = _board(game), game.current_player
+        self.table.stop = False
+        futures = [self._executor.submit(_worker_search, worker_id, board_state, player, self.options)
+                   for worker_id in range(self.workers)]
+        result = futures[0].result()
+        self.table.stop = True
+        helper_nodes = sum(future.result()["nodes"] for future in futures[1:])
+        self.table.stop = False
+        self.nodes = result["nodes"] + helper_nodes
+        return {**result, "nodes": self.nodes, "seconds": time.perf_counter() - start, "workers": self.workers}
+
+    def score_moves(self, game: Othello, depth: Optional[int] = None) -> Dict[str, int]:
+        """Root-split version of AlphaBetaSearch.score_moves()"""
+        if self._serial is not None:
+            scores = self._serial.score_moves(game, depth)
+            self.nodes = self._serial.nodes
+            return scores
+
+        target_depth, _ = AlphaBetaSearch(**self.options)._search_depth(game)
+        board_state, player = _board(game), game.current_player
+        moves = game.get_valid_moves()
+        chunks = [moves[i::self.workers] for i in range(self.workers) if moves[i::self.workers]]
+        futures = [self._executor.submit(_worker_score_moves, board_state, player, chunk, depth or target_depth, self.options)
+                   for chunk in chunks]
+        scores, self.nodes = {}, 0
+        for future in futures:
+            result = future.result()
+            scores.update(result["scores"])
+            self.nodes += result["nodes"]
+        return {pos: scores[pos] for pos in moves}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self.table is not None:
+            self.table.close()
+            self.table = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
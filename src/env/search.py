@@ -0,0 +1,267 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.env.othello_game import Othello
+from src.env.features import evaluate_bits, position_bits
+
+# 经典的位置权重表：角最高，X 格（角的斜邻）和 C 格（角的边邻）为负
+POSITION_WEIGHTS = [
+    [100, -20, 10,  5,  5, 10, -20, 100],
+    [-20, -50, -2, -2, -2, -2, -50, -20],
+    [ 10,  -2,  1,  1,  1,  1,  -2,  10],
+    [  5,  -2,  1,  0,  0,  1,  -2,   5],
+    [  5,  -2,  1,  0,  0,  1,  -2,   5],
+    [ 10,  -2,  1,  1,  1,  1,  -2,  10],
+    [-20, -50, -2, -2, -2, -2, -50, -20],
+    [100, -20, 10,  5,  5, 10, -20, 100],
+]
+SQUARE_WEIGHTS = {
+    chr(col + ord('a')) + str(row + 1): POSITION_WEIGHTS[row][col] for row in range(8) for col in range(8)
+}
+MOBILITY_WEIGHT = 5
+# 终局分数按子数差放大，保证任何确定胜负都压过启发式估值
+TERMINAL_SCALE = 1000
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class _Timeout(Exception):
+    pass
+
+
+def evaluate(game: Othello) -> int:
+    """Heuristic value of a non-terminal position from the point of view of the side to move"""
+    mine, theirs = (game.black, game.white) if game.current_player == 'black' else (game.white, game.black)
+    score = sum(SQUARE_WEIGHTS[pos] for pos in mine) - sum(SQUARE_WEIGHTS[pos] for pos in theirs)
+
+    my_mobility = len(game.get_valid_moves())
+    game.current_player = game.current_opponent
+    their_mobility = len(game.get_valid_moves())
+    game.current_player = game.current_opponent
+    return score + MOBILITY_WEIGHT * (my_mobility - their_mobility)
+
+
+def terminal_score(game: Othello) -> int:
+    """Exact value of a finished game from the point of view of game.current_player"""
+    mine, theirs = (game.black, game.white) if game.current_player == 'black' else (game.white, game.black)
+    return TERMINAL_SCALE * (len(mine) - len(theirs))
+
+
+def _position_key(game: Othello):
+    return frozenset(game.black), frozenset(game.white), game.current_player
+
+
+class AlphaBetaSearch:
+    """
+    Negamax alpha-beta search with iterative deepening, a transposition table and an exact endgame solver.
+
+    search() and score_moves() walk a lightweight clone of the game with move()/unmake(), so the
+    caller's game is never modified.
+    Scores are from the point of view of the side to move; finished games score
+    TERMINAL_SCALE * disc difference.
+
+    Args:
+        depth: Maximum search depth in plies for the midgame
+        endgame_depth: Solve the game exactly once this many or fewer empty squares remain (0 disables)
+        time_limit: Optional seconds per search; the deepest finished iteration is returned
+        max_tt_entries: Transposition table size, cleared when full
+        evaluation: "weights" (evaluate(), one leaf at a time) or "features" (feature evaluation; the
+            children of every depth-1 node are evaluated in one batched call, without beta cut-offs among them)
+    """
+
+    EVALUATIONS = ("weights", "features")
+
+    def __init__(self, depth: int = 4, endgame_depth: int = 10, time_limit: Optional[float] = None,
+                 max_tt_entries: int = 1_000_000, evaluation: str = "weights"):
+        if evaluation not in self.EVALUATIONS:
+            raise ValueError(f"Unknown evaluation: {evaluation}. Must be one of {self.EVALUATIONS}")
+        self.depth = depth
+        self.endgame_depth = endgame_depth
+        self.time_limit = time_limit
+        self.evaluation = evaluation
+        self.max_tt_entries = max_tt_entries
+        self.tt: Dict = {}
+        self.nodes = 0
+        self._deadline = None
+
+    def _tt_key(self, game: Othello):
+        return _position_key(game)
+
+    def _tt_probe(self, key) -> Optional[Tuple]:
+        return self.tt.get(key)
+
+    def _tt_store(self, key, entry: Tuple):
+        if len(self.tt) >= self.max_tt_entries:
+            self.tt.clear()
+        self.tt[key] = entry
+
+    def _should_stop(self) -> bool:
+        return self._deadline is not None and time.perf_counter() > self._deadline
+
+    def _ordered_moves(self, game: Othello, tt_move: Optional[str]) -> List[str]:
+        moves = sorted(game.get_valid_moves(), key=lambda pos: -SQUARE_WEIGHTS[pos])
+        if tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
+
+    def _evaluate(self, game: Othello) -> int:
+        if self.evaluation == "features":
+            player, opponent = position_bits(game)
+            return evaluate_bits([player], [opponent])[0]
+        return evaluate(game)
+
+    def _evaluate_children(self, game: Othello) -> Tuple[int, str]:
+        """(best value, best move) of a depth-1 node, with all non-terminal children evaluated in one batch"""
+        mover = game.current_player
+        moves = game.get_valid_moves()
+        values, players, opponents, signs, pending = {}, [], [], [], []
+        for pos in moves:
+            game.move(pos)
+            try:
+                # 与 _child_value 相同：行棋方未变（弃权或终局）时不取反
+                sign = 1 if game.current_player == mover else -1
+                if game.game_over:
+                    values[pos] = sign * terminal_score(game)
+                else:
+                    player, opponent = position_bits(game)
+                    players.append(player)
+                    opponents.append(opponent)
+                    signs.append(sign)
+                    pending.append(pos)
+            finally:
+                game.unmake()
+        self.nodes += len(moves)
+        if pending:
+            for pos, sign, value in zip(pending, signs, evaluate_bits(players, opponents)):
+                values[pos] = sign * value
+        best_move = max(moves, key=values.get)
+        return values[best_move], best_move
+
+    def _child_value(self, game: Othello, mover: str, depth: int, alpha: int, beta: int) -> int:
+        """Value for `mover` of the position reached by its move"""
+        # 对手无棋可走或对局结束时 move() 让 mover 保持行棋方，此时子节点分数无需取反
+        if game.current_player == mover:
+            return self._negamax(game, depth, alpha, beta)
+        return -self._negamax(game, depth, -beta, -alpha)
+
+    def _negamax(self, game: Othello, depth: int, alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if self.nodes % 1024 == 0 and self._should_stop():
+            raise _Timeout()
+        if game.game_over:
+            return terminal_score(game)
+        if depth <= 0:
+            return self._evaluate(game)
+
+        key = self._tt_key(game)
+        entry = self._tt_probe(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, value, flag, tt_move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value
+                if flag == LOWER and value >= beta:
+                    return value
+                if flag == UPPER and value <= alpha:
+                    return value
+
+        if depth == 1 and self.evaluation == "features":
+            best_value, best_move = self._evaluate_children(game)
+            self._tt_store(key, (1, best_value, EXACT, best_move))
+            return best_value
+
+        original_alpha = alpha
+        best_value, best_move = -float('inf'), None
+        mover = game.current_player
+        for pos in self._ordered_moves(game, tt_move):
+            game.move(pos)
+            try:
+                value = self._child_value(game, mover, depth - 1, alpha, beta)
+            finally:
+                game.unmake()
+            if value > best_value:
+                best_value, best_move = value, pos
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        flag = UPPER if best_value <= original_alpha else LOWER if best_value >= beta else EXACT
+        self._tt_store(key, (depth, best_value, flag, best_move))
+        return best_value
+
+    def _root(self, game: Othello, depth: int, moves: List[str]) -> Dict[str, int]:
+        """Exact value of every root move at `depth`"""
+        mover = game.current_player
+        scores = {}
+        for pos in moves:
+            game.move(pos)
+            try:
+                scores[pos] = self._child_value(game, mover, depth - 1, -float('inf'), float('inf'))
+            finally:
+                game.unmake()
+        return scores
+
+    def _search_depth(self, game: Othello) -> Tuple[int, bool]:
+        empties = 64 - len(game.black) - len(game.white)
+        if self.endgame_depth and empties <= self.endgame_depth:
+            return empties, True
+        return self.depth, False
+
+    def search(self, game: Othello) -> Dict:
+        """
+        Return {"move", "score", "depth", "solved", "nodes", "seconds"} for the side to move.
+        "move" is None when the game is over.
+        """
+        start = time.perf_counter()
+        self.nodes = 0
+        game = game.clone()
+        target_depth, solved = self._search_depth(game)
+        if game.game_over or not game.get_valid_moves():
+            return {"move": None, "score": terminal_score(game) if game.game_over else self._evaluate(game),
+                    "depth": 0, "solved": game.game_over, "nodes": 0, "seconds": 0.0}
+
+        self._deadline = start + self.time_limit if self.time_limit else None
+        best_move, best_score, completed_depth = None, None, 0
+        mover = game.current_player
+        root_key = self._tt_key(game)
+        try:
+            for depth in range(1, target_depth + 1):
+                alpha, beta = -float('inf'), float('inf')
+                entry = self._tt_probe(root_key)
+                depth_best, depth_score = None, -float('inf')
+                for pos in self._ordered_moves(game, entry[3] if entry else best_move):
+                    game.move(pos)
+                    try:
+                        value = self._child_value(game, mover, depth - 1, alpha, beta)
+                    finally:
+                        game.unmake()
+                    if value > depth_score:
+                        depth_best, depth_score = pos, value
+                    alpha = max(alpha, value)
+                self._tt_store(root_key, (depth, depth_score, EXACT, depth_best))
+                best_move, best_score, completed_depth = depth_best, depth_score, depth
+        except _Timeout:
+            pass
+        finally:
+            self._deadline = None
+        if best_move is None:
+            # 连第一层都没搜完时退回走法排序的第一个
+            best_move = self._ordered_moves(game, None)[0]
+
+        return {
+            "move": best_move,
+            "score": best_score,
+            "depth": completed_depth,
+            "solved": solved and completed_depth == target_depth,
+            "nodes": self.nodes,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def score_moves(self, game: Othello, depth: Optional[int] = None) -> Dict[str, int]:
+        """Full-window value of every legal move (slower than search(), which only proves the best one)"""
+        self.nodes = 0
+        game = game.clone()
+        target_depth, _ = self._search_depth(game)
+        return self._root(game, depth or target_depth, game.get_valid_moves())
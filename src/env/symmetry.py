@@ -0,0 +1,61 @@
+from typing import Iterable, List, Optional, Tuple
+
+SIZE = 8
+
+# 棋盘的 8 种对称变换（二面体群 D4），作用于 0 起始的 (row, col)
+TRANSFORMS = [
+    lambda r, c: (r, c),                      # identity
+    lambda r, c: (c, SIZE - 1 - r),           # rotate 90
+    lambda r, c: (SIZE - 1 - r, SIZE - 1 - c),  # rotate 180
+    lambda r, c: (SIZE - 1 - c, r),           # rotate 270
+    lambda r, c: (r, SIZE - 1 - c),           # mirror columns
+    lambda r, c: (SIZE - 1 - r, c),           # mirror rows
+    lambda r, c: (c, r),                      # main diagonal
+    lambda r, c: (SIZE - 1 - c, SIZE - 1 - r),  # anti-diagonal
+]
+# 旋转 90 与 270 互逆，其余变换都是自身的逆
+INVERSE = [0, 3, 2, 1, 4, 5, 6, 7]
+
+
+def _index_to_coord(row: int, col: int) -> str:
+    return chr(col + ord('a')) + str(row + 1)
+
+
+SQUARES = frozenset(_index_to_coord(row, col) for row in range(SIZE) for col in range(SIZE))
+
+
+def _coord_to_index(coord: str) -> Tuple[int, int]:
+    if not isinstance(coord, str) or coord.lower() not in SQUARES:
+        raise ValueError(f"Not a board square: {coord!r}")
+    return int(coord[1:]) - 1, ord(coord[0].lower()) - ord('a')
+
+
+def transform_coord(coord: Optional[str], transform: int) -> Optional[str]:
+    """Apply one of the 8 board symmetries to an 'a1' style coordinate"""
+    if coord is None:
+        return None
+    row, col = _coord_to_index(coord)
+    return _index_to_coord(*TRANSFORMS[transform](row, col))
+
+
+def transform_coords(coords: Iterable[str], transform: int) -> List[str]:
+    return [transform_coord(coord, transform) for coord in coords]
+
+
+def _board_string(black: Iterable[str], white: Iterable[str], transform: int) -> str:
+    cells = ['.'] * (SIZE * SIZE)
+    for coords, mark in ((black, 'B'), (white, 'W')):
+        for coord in coords:
+            row, col = TRANSFORMS[transform](*_coord_to_index(coord))
+            cells[row * SIZE + col] = mark
+    return ''.join(cells)
+
+
+def canonicalize(black: Iterable[str], white: Iterable[str]) -> Tuple[str, int]:
+    """
+    Return (canonical board string, transform) where the canonical board is the smallest of the
+    8 symmetric images and `transform` maps the given position onto it.
+    Use INVERSE[transform] to map coordinates from the canonical frame back.
+    """
+    black, white = list(black), list(white)
+    return min((_board_string(black, white, t), t) for t in range(len(TRANSFORMS)))
@@ -0,0 +1,176 @@
+import json
+import random
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.env.othello_game import Othello
+from src.env.othello_agent import OthelloAgent
+from src.utils.jsonl_io import iter_jsonl
+from src.utils.token_budget import TASK2_MAX_CANDIDATES, TokenBudgetPredictor
+
+EVAL_TASKS = ("Task1", "Task2")
+MAX_NEW_TOKENS = {"Task1": OthelloAgent.TASK1_MAX_NEW_TOKENS, "Task2": OthelloAgent.TASK2_MAX_NEW_TOKENS}
+
+
+def load_eval_samples(data_path: str, tasks: Iterable[str], num_samples: int, seed: int = 0) -> Tuple[List[Dict], int]:
+    """
+    Draw up to num_samples records per task with a fixed seed.
+    Only records that carry position metadata (written by generate_training_data) can be scored;
+    returns the samples and the number of records skipped for lacking it.
+    """
+    tasks = set(tasks)
+    by_task: Dict[str, List[Dict]] = {task: [] for task in tasks}
+    skipped = 0
+    for record in iter_jsonl(data_path):
+        metadata = record.get("metadata")
+        if not metadata:
+            skipped += 1
+            continue
+        if metadata["task"] in tasks:
+            by_task[metadata["task"]].append(record)
+
+    rng = random.Random(seed)
+    samples = []
+    for task in sorted(by_task):
+        records = by_task[task]
+        samples.extend(rng.sample(records, min(num_samples, len(records))))
+    return samples, skipped
+
+
+def game_from_metadata(metadata: Dict) -> Othello:
+    game = Othello()
+    game.set_board_state({"black": metadata["black"], "white": metadata["white"]}, metadata["player"])
+    return game
+
+
+def _prompt_text(prompt) -> str:
+    return prompt if isinstance(prompt, str) else prompt[0]["content"]
+
+
+class SetScore:
+    """Micro-averaged precision/recall/F1 of predicted move sets against engine ground truth"""
+
+    def __init__(self):
+        self.correct = 0
+        self.wrong = 0
+        self.missed = 0
+        self.samples = 0
+        self.parse_failures = 0
+
+    def add(self, predicted: Iterable[str], reference: Iterable[str]):
+        predicted, reference = set(predicted), set(reference)
+        self.samples += 1
+        self.correct += len(predicted & reference)
+        self.wrong += len(predicted - reference)
+        self.missed += len(reference - predicted)
+
+    def add_failure(self):
+        self.samples += 1
+        self.parse_failures += 1
+
+    def report(self) -> Dict:
+        precision = self.correct / (self.correct + self.wrong) if (self.correct + self.wrong) > 0 else 0
+        recall = self.correct / (self.correct + self.missed) if (self.correct + self.missed) > 0 else 0
+        f1_score = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+        return {
+            "samples": self.samples,
+            "parse_failures": self.parse_failures,
+            "correct": self.correct,
+            "wrong": self.wrong,
+            "missed": self.missed,
+            "precision": precision,
+            "recall": recall,
+            "f1": f1_score,
+        }
+
+
+def score_prediction(task_name: str, game: Othello, text,
+                     plausible_candidates: Optional[List[str]] = None) -> Tuple[Optional[List[str]], List[str]]:
+    """
+    Return (predicted moves, engine reference) for one generated completion; predicted is None if unparsable.
+        Task1: final_plausible_candidates against the empty squares adjacent to an opponent stone
+        Task2: final_legal_moves against the legal moves among the candidates the prompt asks about
+               (the first TASK2_MAX_CANDIDATES, as in the training data)
+    """
+    if task_name == "Task1":
+        reference = game.get_plausible_candidates()
+    else:
+        asked = set((plausible_candidates or [])[:TASK2_MAX_CANDIDATES])
+        reference = [move for move in game.get_valid_moves() if move in asked]
+    try:
+        output = OthelloAgent._parse_json_output(text)
+        if task_name == "Task1":
+            predicted = list(output.get("final_plausible_candidates", []))
+        else:
+            predicted = list(OthelloAgent._parse_task2_output(output))
+    except Exception:
+        return None, reference
+    return predicted, reference
+
+
+def evaluate(agent: OthelloAgent, samples: List[Dict], token_budget: Optional[TokenBudgetPredictor] = None,
+             predictions_path: Optional[str] = None) -> Dict:
+    """
+    Generate every sample in batches (one generate_texts call per task, the agent splits it by
+    max_batch_size/max_batch_tokens) and score the outputs with the engine.
+    """
+    report = {"tasks": {}, "throughput": {}}
+    total_seconds = total_generated = total_samples = 0
+    predictions = []
+    for task_name in EVAL_TASKS:
+        task_samples = [sample for sample in samples if sample["metadata"]["task"] == task_name]
+        if not task_samples:
+            continue
+        games = [game_from_metadata(sample["metadata"]) for sample in task_samples]
+        cap = MAX_NEW_TOKENS[task_name]
+        if token_budget is not None:
+            budgets = [token_budget.predict(task_name, game, cap, plausible_candidates=sample["metadata"]["plausible_candidates"])
+                       for game, sample in zip(games, task_samples)]
+        else:
+            budgets = [cap] * len(task_samples)
+
+        start = time.perf_counter()
+        texts, stats = agent.generate_texts([_prompt_text(sample["prompt"]) for sample in task_samples], budgets,
+                                            task_name=task_name, retry_max_new_tokens=cap)
+        seconds = time.perf_counter() - start
+
+        score = SetScore()
+        for sample, game, text in zip(task_samples, games, texts):
+            predicted, reference = score_prediction(task_name, game, text, sample["metadata"]["plausible_candidates"])
+            if predicted is None:
+                score.add_failure()
+            else:
+                score.add(predicted, reference)
+            if predictions_path:
+                predictions.append({
+                    "metadata": sample["metadata"],
+                    "output": text if isinstance(text, str) else f"Error: {text}",
+                    "predicted": predicted,
+                    "reference": sorted(reference),
+                })
+
+        generated = sum(stage_stats["generated_tokens"] for stage_stats in stats)
+        report["tasks"][task_name] = {
+            **score.report(),
+            "seconds": seconds,
+            "samples_per_sec": len(task_samples) / seconds if seconds > 0 else 0.0,
+            "generated_tokens": generated,
+            "tokens_per_sec": generated / seconds if seconds > 0 else 0.0,
+            "budget_retries": sum(stage_stats.get("budget_retry", False) for stage_stats in stats),
+        }
+        total_seconds += seconds
+        total_generated += generated
+        total_samples += len(task_samples)
+
+    report["throughput"] = {
+        "samples": total_samples,
+        "seconds": total_seconds,
+        "samples_per_sec": total_samples / total_seconds if total_seconds > 0 else 0.0,
+        "generated_tokens": total_generated,
+        "tokens_per_sec": total_generated / total_seconds if total_seconds > 0 else 0.0,
+    }
+    if predictions_path:
+        with open(predictions_path, "w", encoding="utf-8") as f:
+            for prediction in predictions:
+                f.write(json.dumps(prediction) + "\n")
+    return report
@@ -0,0 +1,289 @@
+import asyncio
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from aiohttp import web
+
+from src.env.othello_game import Othello
+from src.env.othello_agent import PIPELINE_MODES, OthelloAgent
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+class ServerMetrics:
+    def __init__(self, window: int = 10000):
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.book_moves = 0
+
+    def snapshot(self, queue_depth: int) -> Dict:
+        latencies = sorted(self.latencies)
+        return {
+            "queue_depth": queue_depth,
+            "requests": self.requests,
+            "errors": self.errors,
+            "book_moves": self.book_moves,
+            "batches": self.batches,
+            "mean_batch_size": sum(self.batch_sizes) / len(self.batch_sizes) if self.batch_sizes else 0.0,
+            "max_batch_size": max(self.batch_sizes) if self.batch_sizes else 0,
+            "latency_p50": _percentile(latencies, 0.50),
+            "latency_p99": _percentile(latencies, 0.99),
+        }
+
+
+class MicroBatcher:
+    """
+    Collect concurrently submitted items into batches and run `handler(items) -> results` on an executor.
+    A batch is dispatched once it holds max_batch_size items or max_wait_ms after its first item arrived.
+    """
+
+    def __init__(self, handler: Callable[[List[Any]], List[Any]], executor: ThreadPoolExecutor,
+                 metrics: ServerMetrics, max_batch_size: int = 8, max_wait_ms: float = 10):
+        self.handler = handler
+        self.executor = executor
+        self.metrics = metrics
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def submit(self, item: Any) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            items = [item for item, _ in batch]
+            self.metrics.batches += 1
+            self.metrics.batch_sizes.append(len(items))
+            try:
+                results = await loop.run_in_executor(self.executor, self.handler, items)
+            except Exception as e:
+                results = [e] * len(items)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+class AgentServer:
+    """
+    Long-running HTTP server around a single OthelloAgent.
+
+    Endpoints:
+        POST /v1/analyze            {"black": [...], "white": [...], "player": "black", "mode": optional}
+        POST /v1/choose_move        same body, returns {"move": ...}; answered from agent.opening_book when it has the position
+        POST /v1/chat/completions   OpenAI-compatible, the last user message is completed as a raw prompt
+        GET  /metrics               queue depth, batch sizes and p50/p99 latency
+        GET  /metrics/prometheus    agent stage histograms and token counters (while agent.metrics is enabled)
+        GET  /health
+    All model work runs on one executor thread; requests are micro-batched per endpoint.
+    """
+
+    def __init__(self, agent: OthelloAgent, max_batch_size: int = 8, max_wait_ms: float = 10,
+                 model_name: str = "othello-agent"):
+        self.agent = agent
+        self.model_name = model_name
+        self.metrics = ServerMetrics()
+        self.executor = ThreadPoolExecutor(max_workers=1)  # 模型调用串行化，批处理由 MicroBatcher 完成
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.analyze_batcher = None
+        self.completion_batcher = None
+
+    # --- batch handlers (run on the executor thread) ---
+
+    def _analyze_batch(self, items: List[Dict]) -> List[Any]:
+        results: List[Any] = [None] * len(items)
+        by_mode: Dict[str, List[int]] = {}
+        for idx, item in enumerate(items):
+            by_mode.setdefault(item["mode"], []).append(idx)
+        for mode, indices in by_mode.items():
+            try:
+                analyses = self.agent.analyze_positions([items[idx]["game"] for idx in indices], mode=mode)
+            except Exception as e:
+                analyses = [e] * len(indices)
+            for idx, analysis in zip(indices, analyses):
+                results[idx] = analysis
+        return results
+
+    def _completion_batch(self, items: List[Dict]) -> List[Any]:
+        max_new_tokens = [item["max_tokens"] for item in items]
+        texts, stats = self.agent.generate_texts([item["prompt"] for item in items], max_new_tokens)
+        results = []
+        for item, text, stat in zip(items, texts, stats):
+            if isinstance(text, Exception):
+                results.append(text)
+                continue
+            # 批次按最大上限生成，超出本请求 max_tokens 的部分截掉
+            token_ids = self.agent._tokenize_ids(text, add_special_tokens=False)
+            if len(token_ids) > item["max_tokens"]:
+                text = self.agent.tokenizer.decode(token_ids[:item["max_tokens"]], skip_special_tokens=True)
+                stat = {**stat, "generated_tokens": item["max_tokens"], "truncated": True}
+            results.append((text, stat))
+        return results
+
+    # --- HTTP handlers ---
+
+    def _queue_depth(self) -> int:
+        return sum(batcher.queue.qsize() for batcher in (self.analyze_batcher, self.completion_batcher) if batcher)
+
+    async def _timed(self, coro):
+        start = time.perf_counter()
+        self.metrics.requests += 1
+        try:
+            return await coro
+        except Exception:
+            self.metrics.errors += 1
+            raise
+        finally:
+            self.metrics.latencies.append(time.perf_counter() - start)
+
+    @staticmethod
+    async def _read_body(request: web.Request) -> Dict:
+        # 请求体不是合法 JSON 时 request.json() 抛出 json.JSONDecodeError（ValueError 的子类）
+        body = await request.json()
+        if not isinstance(body, dict):
+            raise ValueError("request body must be a JSON object")
+        return body
+
+    @staticmethod
+    def _parse_game(body: Dict) -> Othello:
+        game = Othello()
+        game.set_board_state({"black": body["black"], "white": body["white"]}, body.get("player", "black"))
+        return game
+
+    @staticmethod
+    def _parse_mode(body: Dict):
+        mode = body.get("mode")
+        if mode is not None and mode not in PIPELINE_MODES:
+            raise ValueError(f"Unknown pipeline mode: {mode}. Must be one of {PIPELINE_MODES}")
+        return mode
+
+    async def handle_analyze(self, request: web.Request) -> web.Response:
+        try:
+            body = await self._read_body(request)
+            game, mode = self._parse_game(body), self._parse_mode(body)
+        except (KeyError, TypeError, ValueError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+        analysis = await self._timed(self.analyze_batcher.submit({"game": game, "mode": mode}))
+        return web.json_response(analysis)
+
+    async def handle_choose_move(self, request: web.Request) -> web.Response:
+        try:
+            body = await self._read_body(request)
+            game, mode = self._parse_game(body), self._parse_mode(body)
+        except (KeyError, TypeError, ValueError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+        # 开局库命中时直接返回，不进入模型批处理（查询只读内存映射文件，开销在微秒级）
+        if self.agent.opening_book is not None:
+            move = self.agent.opening_book.choose_move(game)
+            if move is not None:
+                self.metrics.requests += 1
+                self.metrics.book_moves += 1
+                return web.json_response({"move": move, "errors": [], "book": True})
+        analysis = await self._timed(self.analyze_batcher.submit({"game": game, "mode": mode}))
+        return web.json_response({"move": analysis["chosen_move"], "errors": analysis["errors"], "book": False})
+
+    async def handle_chat_completions(self, request: web.Request) -> web.Response:
+        try:
+            body = await self._read_body(request)
+            user_messages = [m for m in body.get("messages", []) if isinstance(m, dict) and m.get("role") == "user"]
+            max_tokens = max(1, min(int(body.get("max_tokens") or 1024), 8192))
+        except (TypeError, ValueError) as e:
+            return web.json_response({"error": {"message": str(e)}}, status=400)
+        if not user_messages:
+            return web.json_response({"error": {"message": "no user message"}}, status=400)
+        prompt = user_messages[-1]["content"]
+
+        text, stat = await self._timed(self.completion_batcher.submit({"prompt": prompt, "max_tokens": max_tokens}))
+        prompt_tokens = self.agent.count_tokens(prompt)
+        return web.json_response({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", self.model_name),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "length" if stat["truncated"] else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": stat["generated_tokens"],
+                "total_tokens": prompt_tokens + stat["generated_tokens"],
+            },
+        })
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.json_response(self.metrics.snapshot(self._queue_depth()))
+
+    async def handle_prometheus(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.agent.metrics.prometheus_text(), content_type="text/plain")
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    async def _on_startup(self, app: web.Application):
+        self.analyze_batcher = MicroBatcher(self._analyze_batch, self.executor, self.metrics,
+                                            self.max_batch_size, self.max_wait_ms)
+        self.completion_batcher = MicroBatcher(self._completion_batch, self.executor, self.metrics,
+                                               self.max_batch_size, self.max_wait_ms)
+        self.analyze_batcher.start()
+        self.completion_batcher.start()
+
+    async def _on_cleanup(self, app: web.Application):
+        await self.analyze_batcher.stop()
+        await self.completion_batcher.stop()
+        self.executor.shutdown(wait=False)
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/analyze", self.handle_analyze)
+        app.router.add_post("/v1/choose_move", self.handle_choose_move)
+        app.router.add_post("/v1/chat/completions", self.handle_chat_completions)
+        app.router.add_get("/metrics", self.handle_metrics)
+        app.router.add_get("/metrics/prometheus", self.handle_prometheus)
+        app.router.add_get("/health", self.handle_health)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    def run(self, host: str = "127.0.0.1", port: int = 8000, unix_socket: str = None):
+        if unix_socket:
+            web.run_app(self.build_app(), path=unix_socket)
+        else:
+            web.run_app(self.build_app(), host=host, port=port)
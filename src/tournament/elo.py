@@ -0,0 +1,65 @@
+import math
+import random
+from typing import Dict, List, Sequence
+
+ELO_SCALE = 400 / math.log(10)
+
+
+def fit_elo(games: Sequence[Dict], names: Sequence[str], iterations: int = 200, prior_draws: float = 1.0) -> Dict[str, float]:
+    """
+    Maximum-likelihood Bradley-Terry ratings on the Elo scale, centred on a mean of 0.
+
+    Each game is {"a": name, "b": name, "score_a": 1 | 0.5 | 0}. A virtual draw (prior_draws) is added
+    between every pair that met, so a player without wins or losses still gets a finite rating.
+    """
+    index = {name: i for i, name in enumerate(names)}
+    n = len(names)
+    wins = [0.0] * n
+    meetings = [[0.0] * n for _ in range(n)]
+    for game in games:
+        a, b = index[game["a"]], index[game["b"]]
+        wins[a] += game["score_a"]
+        wins[b] += 1 - game["score_a"]
+        meetings[a][b] += 1
+        meetings[b][a] += 1
+    for a in range(n):
+        for b in range(n):
+            if a != b and meetings[a][b]:
+                meetings[a][b] += prior_draws
+                wins[a] += prior_draws / 2
+
+    # Minorization-maximization (Hunter, 2004)
+    gamma = [1.0] * n
+    for _ in range(iterations):
+        for i in range(n):
+            denominator = sum(meetings[i][j] / (gamma[i] + gamma[j]) for j in range(n) if meetings[i][j])
+            if denominator > 0:
+                gamma[i] = wins[i] / denominator
+        mean_log = sum(math.log(g) for g in gamma) / n
+        gamma = [g / math.exp(mean_log) for g in gamma]
+    return {name: ELO_SCALE * math.log(gamma[index[name]]) for name in names}
+
+
+def bootstrap_elo(games: Sequence[Dict], names: Sequence[str], samples: int = 200, seed: int = 0,
+                  confidence: float = 0.95) -> Dict[str, List[float]]:
+    """
+    Confidence interval of every rating from resampling games with replacement.
+    Games sharing a "pair" id (same opening, colours swapped) are resampled together.
+    """
+    units: Dict = {}
+    for game in games:
+        units.setdefault(game.get("pair", id(game)), []).append(game)
+    units = list(units.values())
+    rng = random.Random(seed)
+    ratings = {name: [] for name in names}
+    for _ in range(samples):
+        resampled = [game for _ in units for game in rng.choice(units)]
+        for name, rating in fit_elo(resampled, names).items():
+            ratings[name].append(rating)
+
+    tail = (1 - confidence) / 2
+    intervals = {}
+    for name, values in ratings.items():
+        values.sort()
+        intervals[name] = [values[int(tail * (len(values) - 1))], values[int((1 - tail) * (len(values) - 1))]]
+    return intervals
@@ -0,0 +1,184 @@
+import random
+from typing import Dict, List, Optional
+
+from src.env.othello_game import Othello
+from src.env.search import AlphaBetaSearch
+from src.env.parallel_search import ParallelSearch
+from src.env.mcts import MCTS, FeatureEvaluator, HeuristicEvaluator, RolloutEvaluator
+from src.env.opening_book import OpeningBook
+
+
+class Player:
+    """
+    A tournament participant. Subclasses implement choose_move(); players that can batch
+    (e.g. one backed by OthelloAgent) override choose_moves() to answer many games in one call.
+    Returning None or a move that is not legal forfeits the game.
+    """
+
+    name = "player"
+
+    def choose_move(self, game: Othello) -> Optional[str]:
+        raise NotImplementedError
+
+    def choose_moves(self, games: List[Othello]) -> List[Optional[str]]:
+        return [self.choose_move(game) for game in games]
+
+
+class RandomPlayer(Player):
+    def __init__(self, seed: int = 0, name: str = "random"):
+        self.name = name
+        self.rng = random.Random(seed)
+
+    def choose_move(self, game: Othello) -> Optional[str]:
+        valid_moves = game.get_valid_moves()
+        return self.rng.choice(valid_moves) if valid_moves else None
+
+
+class GreedyPlayer(Player):
+    """The agent's Step 3 on engine-legal moves: play the move that flips the most stones"""
+
+    def __init__(self, name: str = "greedy", **kwargs):
+        self.name = name
+
+    def choose_move(self, game: Othello) -> Optional[str]:
+        valid_moves = game.get_valid_moves()
+        return max(valid_moves, key=lambda pos: len(game._get_flips(pos))) if valid_moves else None
+
+
+class EpsilonGreedyPlayer(GreedyPlayer):
+    """Greedy, except that with probability epsilon it plays a uniformly random legal move"""
+
+    def __init__(self, epsilon: float = 0.1, seed: int = 0, name: str = "epsilon_greedy", **kwargs):
+        super().__init__(name=name)
+        self.epsilon = epsilon
+        self.rng = random.Random(seed)
+
+    def choose_move(self, game: Othello) -> Optional[str]:
+        valid_moves = game.get_valid_moves()
+        if valid_moves and self.rng.random() < self.epsilon:
+            return self.rng.choice(valid_moves)
+        return super().choose_move(game)
+
+
+class SearchPlayer(Player):
+    """Alpha-beta engine; workers > 1 runs lazy SMP on a process pool (useful for matches played in-process)"""
+
+    def __init__(self, depth: int = 3, endgame_depth: int = 10, time_limit: Optional[float] = None,
+                 workers: int = 1, evaluation: str = "weights", name: Optional[str] = None, **kwargs):
+        self.name = name or f"search-d{depth}"
+        if workers > 1:
+            self.search = ParallelSearch(depth=depth, endgame_depth=endgame_depth, time_limit=time_limit, workers=workers,
+                                         evaluation=evaluation)
+        else:
+            self.search = AlphaBetaSearch(depth=depth, endgame_depth=endgame_depth, time_limit=time_limit, evaluation=evaluation)
+
+    def choose_move(self, game: Othello) -> Optional[str]:
+        return self.search.search(game)["move"]
+
+
+class MCTSPlayer(Player):
+    """Monte Carlo Tree Search; the tree is reused from one move to the next within a game"""
+
+    EVALUATORS = ("heuristic", "rollout", "features")
+
+    def __init__(self, playouts: int = 400, batch_size: int = 8, c_puct: float = 1.5, threads: int = 1,
+                 evaluator="heuristic", seed: int = 0, name: Optional[str] = None, **kwargs):
+        self.name = name or f"mcts-{playouts}"
+        if evaluator == "heuristic":
+            evaluator = HeuristicEvaluator()
+        elif evaluator == "rollout":
+            evaluator = RolloutEvaluator(seed=seed)
+        elif evaluator == "features":
+            evaluator = FeatureEvaluator()
+        elif isinstance(evaluator, str):
+            raise ValueError(f"Unknown MCTS evaluator: {evaluator}. Must be one of {self.EVALUATORS} or a callable")
+        self.playouts = playouts
+        self.mcts = MCTS(evaluator, c_puct=c_puct, batch_size=batch_size, num_threads=threads)
+
+    def choose_move(self, game: Othello) -> Optional[str]:
+        return self.mcts.search(game, playouts=self.playouts)["move"]
+
+
+class AgentPlayer(Player):
+    """Wraps an OthelloAgent; all games waiting for this player are analysed in one batched call"""
+
+    def __init__(self, agent, mode: Optional[str] = None, name: str = "agent"):
+        self.agent = agent
+        self.mode = mode
+        self.name = name
+
+    def choose_move(self, game: Othello) -> Optional[str]:
+        return self.agent.choose_move(game, self.mode)
+
+    def choose_moves(self, games: List[Othello]) -> List[Optional[str]]:
+        return self.agent.choose_moves(games, self.mode)
+
+
+class BookPlayer(Player):
+    """Plays the opening book's move while the position is in the book and hands the other games to `player`"""
+
+    def __init__(self, player: Player, book: OpeningBook, name: Optional[str] = None):
+        self.player = player
+        self.book = book
+        self.name = name or player.name
+
+    def choose_move(self, game: Othello) -> Optional[str]:
+        return self.choose_moves([game])[0]
+
+    def choose_moves(self, games: List[Othello]) -> List[Optional[str]]:
+        moves = [self.book.choose_move(game) for game in games]
+        pending = [idx for idx, move in enumerate(moves) if move is None]
+        if pending:
+            for idx, move in zip(pending, self.player.choose_moves([games[idx] for idx in pending])):
+                moves[idx] = move
+        return moves
+
+
+# 可以在子进程中按规格重新构造的玩家类型；AgentPlayer 持有模型，只在主进程中运行
+PLAYER_TYPES = {
+    "random": RandomPlayer,
+    "greedy": GreedyPlayer,
+    "epsilon_greedy": EpsilonGreedyPlayer,
+    "search": SearchPlayer,
+    "mcts": MCTSPlayer,
+}
+
+
+def parse_player_spec(text: str) -> Dict:
+    """'search:depth=3,endgame_depth=8' -> {'type': 'search', 'depth': 3, 'endgame_depth': 8}"""
+    player_type, _, options = text.partition(":")
+    spec = {"type": player_type}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        for cast in (int, float):
+            try:
+                value = cast(value)
+                break
+            except ValueError:
+                continue
+        spec[key] = value
+    return spec
+
+
+def spec_name(spec: Dict) -> str:
+    if "name" in spec:
+        return spec["name"]
+    options = ",".join(f"{key}={value}" for key, value in spec.items() if key != "type")
+    return f"{spec['type']}:{options}" if options else spec["type"]
+
+
+def make_player(spec: Dict, seed: int = 0) -> Player:
+    """
+    Build a player from its spec. 'book' (path of an opening book) and 'book_min_games' wrap any
+    player type in a BookPlayer.
+    """
+    kwargs = {key: value for key, value in spec.items() if key not in ("type", "book", "book_min_games")}
+    kwargs["name"] = spec_name(spec)
+    if spec["type"] in ("random", "epsilon_greedy", "mcts"):
+        kwargs["seed"] = seed
+    if spec["type"] not in PLAYER_TYPES:
+        raise ValueError(f"Unknown player type: {spec['type']}. Must be one of {list(PLAYER_TYPES)}")
+    player = PLAYER_TYPES[spec["type"]](**kwargs)
+    if "book" in spec:
+        return BookPlayer(player, OpeningBook(spec["book"], min_games=spec.get("book_min_games", 10)))
+    return player
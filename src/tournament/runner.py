@@ -0,0 +1,189 @@
+import itertools
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Union
+
+from src.env.othello_game import Othello
+from src.tournament.elo import bootstrap_elo, fit_elo
+from src.tournament.players import Player, make_player, spec_name
+
+TOURNAMENT_FORMATS = ("round_robin", "gauntlet")
+
+
+def make_openings(num_openings: int, plies: int, seed: int = 0) -> List[List[str]]:
+    """Distinct random legal move sequences of `plies` moves; each is played twice with colours swapped"""
+    rng = random.Random(seed)
+    openings, seen = [], set()
+    attempts = 0
+    while len(openings) < num_openings and attempts < num_openings * 100:
+        attempts += 1
+        game, moves = Othello(), []
+        for _ in range(plies):
+            valid_moves = game.get_valid_moves()
+            if game.game_over or not valid_moves:
+                break
+            moves.append(rng.choice(valid_moves))
+            game.move(moves[-1])
+        if not game.game_over and tuple(moves) not in seen:
+            seen.add(tuple(moves))
+            openings.append(moves)
+    return openings
+
+
+def play_games(player_a: Player, player_b: Player, jobs: List[Dict]) -> List[Dict]:
+    """
+    Play every job {"pair", "opening", "a_color"} between the two players in lockstep: at each step all
+    games waiting for the same player are handed to it in one choose_moves() call.
+    A player that raises, passes with legal moves available, or plays an illegal move loses that game.
+    """
+    games = []
+    for job in jobs:
+        game = Othello(record_history=False)
+        for pos in job["opening"]:
+            game.move(pos)
+        games.append(game)
+    results: List[Optional[Dict]] = [None] * len(jobs)
+
+    def finish(idx: int, score_a: float, termination: str):
+        game = games[idx]
+        results[idx] = {
+            **jobs[idx],
+            "a": player_a.name,
+            "b": player_b.name,
+            "score_a": score_a,
+            "black_discs": len(game.black),
+            "white_discs": len(game.white),
+            "plies": game.ply,
+            "termination": termination,
+        }
+
+    active = list(range(len(jobs)))
+    while active:
+        for player, is_a in ((player_a, True), (player_b, False)):
+            waiting = [idx for idx in active
+                       if not games[idx].game_over and (games[idx].current_player == jobs[idx]["a_color"]) == is_a]
+            if not waiting:
+                continue
+            try:
+                moves = player.choose_moves([games[idx] for idx in waiting])
+            except Exception as e:
+                moves = [e] * len(waiting)
+            for idx, pos in zip(waiting, moves):
+                if isinstance(pos, Exception):
+                    finish(idx, 0.0 if is_a else 1.0, f"error: {pos}")
+                elif pos not in games[idx].get_valid_moves():
+                    finish(idx, 0.0 if is_a else 1.0, f"illegal move by {player.name}: {pos}")
+                else:
+                    games[idx].move(pos)
+
+        still_active = []
+        for idx in active:
+            if results[idx] is not None:
+                continue
+            game = games[idx]
+            if game.game_over:
+                winner = game.get_winner()
+                finish(idx, 0.5 if winner is None else float(winner == jobs[idx]["a_color"]), "normal")
+            else:
+                still_active.append(idx)
+        active = still_active
+    return results
+
+
+def _play_chunk(spec_a: Dict, spec_b: Dict, jobs: List[Dict], seed: int) -> List[Dict]:
+    return play_games(make_player(spec_a, seed), make_player(spec_b, seed + 1), jobs)
+
+
+def _match_jobs(name_a: str, name_b: str, openings: Sequence[List[str]]) -> List[Dict]:
+    return [{"pair": f"{name_a}|{name_b}|{i}", "opening": list(opening), "a_color": color}
+            for i, opening in enumerate(openings) for color in ("black", "white")]
+
+
+def run_tournament(participants: Sequence[Union[Dict, Player]], openings: Sequence[List[str]],
+                   tournament_format: str = "round_robin", workers: int = 1, games_per_chunk: int = 8,
+                   seed: int = 0, bootstrap_samples: int = 200) -> Dict:
+    """
+    Play a round robin (every pair meets) or a gauntlet (the first participant meets every other one).
+
+    Participants are either player specs ({"type": "search", "depth": 3}), which are rebuilt inside
+    worker processes, or Player instances (e.g. AgentPlayer), whose matches run in this process
+    with all of a match's games batched together.
+
+    Returns the game records, standings with Elo and confidence intervals, and throughput.
+    """
+    if tournament_format not in TOURNAMENT_FORMATS:
+        raise ValueError(f"Unknown tournament format: {tournament_format}. Must be one of {TOURNAMENT_FORMATS}")
+    names = [p.name if isinstance(p, Player) else spec_name(p) for p in participants]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Participant names must be unique: {names}")
+    if tournament_format == "round_robin":
+        pairings = list(itertools.combinations(range(len(participants)), 2))
+    else:
+        pairings = [(0, j) for j in range(1, len(participants))]
+
+    start = time.perf_counter()
+    games: List[Dict] = []
+    futures = []
+    chunk_seed = seed
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else _InlineExecutor() as executor:
+        for a, b in pairings:
+            jobs = _match_jobs(names[a], names[b], openings)
+            participant_a, participant_b = participants[a], participants[b]
+            if isinstance(participant_a, Player) or isinstance(participant_b, Player):
+                player_a = participant_a if isinstance(participant_a, Player) else make_player(participant_a, chunk_seed)
+                player_b = participant_b if isinstance(participant_b, Player) else make_player(participant_b, chunk_seed + 1)
+                games.extend(play_games(player_a, player_b, jobs))
+                chunk_seed += 2
+                continue
+            for i in range(0, len(jobs), games_per_chunk):
+                futures.append(executor.submit(_play_chunk, participant_a, participant_b, jobs[i:i + games_per_chunk], chunk_seed))
+                chunk_seed += 2
+        for future in futures:
+            games.extend(future.result())
+    elapsed = time.perf_counter() - start
+
+    ratings = fit_elo(games, names)
+    intervals = bootstrap_elo(games, names, samples=bootstrap_samples, seed=seed) if bootstrap_samples else {}
+    standings = []
+    for name in names:
+        played = [g for g in games if name in (g["a"], g["b"])]
+        score = sum(g["score_a"] if g["a"] == name else 1 - g["score_a"] for g in played)
+        standings.append({
+            "name": name,
+            "games": len(played),
+            "score": score,
+            "score_rate": score / len(played) if played else 0.0,
+            "elo": ratings[name],
+            "elo_ci": intervals.get(name),
+            "forfeits": sum(1 for g in played if g["termination"] != "normal"
+                            and (g["score_a"] == 0.0) == (g["a"] == name)),
+        })
+    standings.sort(key=lambda row: -row["elo"])
+    return {
+        "format": tournament_format,
+        "standings": standings,
+        "games": games,
+        "seconds": elapsed,
+        "games_per_sec": len(games) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+class _InlineExecutor:
+    """Runs submitted calls immediately; keeps the single-worker path free of process start-up cost"""
+
+    class _Done:
+        def __init__(self, value):
+            self._value = value
+
+        def result(self):
+            return self._value
+
+    def submit(self, fn, *args):
+        return self._Done(fn(*args))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
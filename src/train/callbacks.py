@@ -0,0 +1,184 @@
+import json
+import os
+import resource
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import torch
+from transformers import TrainerCallback
+
+
+class ThroughputCallback(TrainerCallback):
+    """
+    Per-step training telemetry written as JSON lines.
+
+    Every optimizer step becomes one record with the step time split into data wait (from the end of the
+    previous step, minus logging/evaluation/saving, to the start of this one; the Trainer fetches all
+    micro-batches of a step before on_step_begin) and compute (on_step_begin to on_step_end), tokens/sec
+    over all and over non-pad tokens, the padding fraction, peak memory and the estimated time to completion.
+
+    Tokens are counted by a forward pre-hook on the model from input_ids / attention_mask, so the
+    counts hold for any collator, packing mode or number of dataloader workers. Counts are per process.
+
+    Args:
+        jsonl_path: File receiving the records (appended to); only the main process writes
+        window: Number of recent steps averaged for the ETA
+        synchronize_cuda: Wait for queued CUDA work at the end of each step so compute time is not
+            attributed to the next step's data wait
+        run_info: Settings written in a first "config" record (batch size, packing, quantization, ...)
+            so that runs can be compared
+    """
+
+    def __init__(self, jsonl_path: str, window: int = 20, synchronize_cuda: bool = True, run_info: Optional[Dict] = None):
+        self.jsonl_path = jsonl_path
+        self.window = window
+        self.synchronize_cuda = synchronize_cuda
+        self.run_info = run_info or {}
+        self._step_times = deque(maxlen=window)
+        self._hook = None
+        self._train_start = None
+        self._last_end = None
+        self._step_start = None
+        self._data_wait = 0.0
+        self._reset_counts()
+        self.totals = {"steps": 0, "tokens": 0, "nonpad_tokens": 0, "sequences": 0,
+                       "step_time_s": 0.0, "data_wait_s": 0.0, "peak_memory_mb": 0.0}
+
+    def _reset_counts(self):
+        self._tokens = 0
+        self._nonpad_tokens = 0
+        self._sequences = 0
+
+    def _count_tokens(self, module, args, kwargs):
+        # 评估阶段的前向不计入训练吞吐
+        if not module.training:
+            return
+        input_ids = kwargs.get("input_ids", args[0] if args else None)
+        if input_ids is None:
+            return
+        attention_mask = kwargs.get("attention_mask")
+        self._tokens += input_ids.numel()
+        self._nonpad_tokens += int(attention_mask.sum()) if attention_mask is not None else input_ids.numel()
+        self._sequences += input_ids.shape[0] if input_ids.dim() > 1 else 1
+
+    def _write(self, state, record: Dict):
+        if not state.is_world_process_zero:
+            return
+        with open(self.jsonl_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def on_train_begin(self, args, state, control, model=None, **kwargs):
+        if model is not None and self._hook is None:
+            self._hook = model.register_forward_pre_hook(self._count_tokens, with_kwargs=True)
+        if state.is_world_process_zero:
+            os.makedirs(os.path.dirname(os.path.abspath(self.jsonl_path)), exist_ok=True)
+        self._write(state, {"event": "config", "max_steps": state.max_steps, "world_size": args.world_size,
+                            "per_device_train_batch_size": args.per_device_train_batch_size,
+                            "gradient_accumulation_steps": args.gradient_accumulation_steps, **self.run_info})
+        self._train_start = self._last_end = time.perf_counter()
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        self._step_start = time.perf_counter()
+        self._data_wait = self._step_start - self._last_end
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if self.synchronize_cuda and torch.cuda.is_available():
+            torch.cuda.synchronize()
+        now = time.perf_counter()
+        compute = now - self._step_start
+        step_time = self._data_wait + compute
+        self._step_times.append(step_time)
+
+        record = {
+            "event": "step",
+            "step": state.global_step,
+            "epoch": state.epoch,
+            "step_time_s": step_time,
+            "data_wait_s": self._data_wait,
+            "compute_s": compute,
+            "data_wait_fraction": self._data_wait / step_time if step_time > 0 else 0.0,
+            "sequences": self._sequences,
+            "tokens": self._tokens,
+            "nonpad_tokens": self._nonpad_tokens,
+            "padding_fraction": 1 - self._nonpad_tokens / self._tokens if self._tokens else 0.0,
+            "tokens_per_sec": self._tokens / step_time if step_time > 0 else 0.0,
+            "nonpad_tokens_per_sec": self._nonpad_tokens / step_time if step_time > 0 else 0.0,
+            # ru_maxrss 在 Linux 上以 KB 为单位
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+        if torch.cuda.is_available():
+            record["peak_memory_mb"] = torch.cuda.max_memory_allocated() / 2 ** 20
+            record["peak_reserved_mb"] = torch.cuda.max_memory_reserved() / 2 ** 20
+        mean_step = sum(self._step_times) / len(self._step_times)
+        record["eta_s"] = max(0, state.max_steps - state.global_step) * mean_step
+        record["elapsed_s"] = now - self._train_start
+        self._write(state, record)
+
+        totals = self.totals
+        totals["steps"] += 1
+        totals["tokens"] += self._tokens
+        totals["nonpad_tokens"] += self._nonpad_tokens
+        totals["sequences"] += self._sequences
+        totals["step_time_s"] += step_time
+        totals["data_wait_s"] += self._data_wait
+        totals["peak_memory_mb"] = max(totals["peak_memory_mb"], record.get("peak_memory_mb", record["max_rss_mb"]))
+        self._reset_counts()
+        self._last_end = now
+
+    def _skip_overhead(self):
+        # 记日志、评估、保存发生在 on_step_end 之后，不算作下一步的取数等待
+        self._last_end = time.perf_counter()
+
+    def on_log(self, args, state, control, **kwargs):
+        self._skip_overhead()
+
+    def on_evaluate(self, args, state, control, **kwargs):
+        self._skip_overhead()
+
+    def on_save(self, args, state, control, **kwargs):
+        self._skip_overhead()
+
+    def summary(self) -> Dict:
+        totals = self.totals
+        step_time = totals["step_time_s"]
+        return {
+            **totals,
+            "tokens_per_sec": totals["tokens"] / step_time if step_time > 0 else 0.0,
+            "nonpad_tokens_per_sec": totals["nonpad_tokens"] / step_time if step_time > 0 else 0.0,
+            "padding_fraction": 1 - totals["nonpad_tokens"] / totals["tokens"] if totals["tokens"] else 0.0,
+            "data_wait_fraction": totals["data_wait_s"] / step_time if step_time > 0 else 0.0,
+        }
+
+    def on_train_end(self, args, state, control, **kwargs):
+        if self._hook is not None:
+            self._hook.remove()
+            self._hook = None
+        summary = self.summary()
+        self._write(state, {"event": "summary", **summary})
+        if state.is_world_process_zero and summary["steps"]:
+            print(f"Throughput: {summary['tokens_per_sec']:.0f} tokens/sec ({summary['nonpad_tokens_per_sec']:.0f} non-pad), "
+                  f"padding {100 * summary['padding_fraction']:.1f}%, data wait {100 * summary['data_wait_fraction']:.1f}%, "
+                  f"peak memory {summary['peak_memory_mb']:.0f} MB -> {self.jsonl_path}")
+
+
+def throughput_callback_from_config(config: Dict, **run_info) -> Optional[ThroughputCallback]:
+    """ThroughputCallback configured by the telemetry_params section of config/default.yaml, None when disabled"""
+    params = config.get('telemetry_params') or {}
+    if not params.get('enabled'):
+        return None
+    jsonl_path = params.get('jsonl_path') or os.path.join(config['training_params']['output_dir'], 'throughput.jsonl')
+    model_params, training_params = config['model_params'], config['training_params']
+    run_info = {
+        "model_id": model_params['model_id'],
+        "use_4bit": model_params.get('use_4bit'),
+        "bnb_4bit_quant_type": model_params.get('bnb_4bit_quant_type'),
+        "max_length": training_params.get('max_length'),
+        "batch_size": training_params.get('batch_size'),
+        "lora_r": config.get('lora_params', {}).get('r'),
+        **run_info,
+    }
+    return ThroughputCallback(jsonl_path, window=params.get('window', 20),
+                              synchronize_cuda=params.get('synchronize_cuda', True), run_info=run_info)
@@ -15,7 +15,12 @@ class OpenAIClient:
     def generate_response(self, prompt: str, 
                          temperature: float = 0.7, max_tokens: int = 8192,
                          **kwargs) -> str:
-        
+        return self.complete(prompt, temperature=temperature, max_tokens=max_tokens, **kwargs)["text"]
+
+    def complete(self, prompt: str,
+                 temperature: float = 0.7, max_tokens: int = 8192,
+                 **kwargs) -> Dict:
+        """Same request as generate_response, also returning the token usage reported by the endpoint"""
         messages = [{"role": "user", "content": prompt}]
         try:
             response = self.client.chat.completions.create(
@@ -25,10 +30,15 @@ class OpenAIClient:
                 max_tokens=max_tokens,
                 **kwargs
             )
-            return response.choices[0].message.content
         except Exception as e:
             print(f"API failed: {e}")
             raise
+        usage = response.usage
+        return {
+            "text": response.choices[0].message.content,
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "completion_tokens": usage.completion_tokens if usage else 0,
+        }
     
 if __name__ == '__main__':
     client = OpenAIClient()
@@ -0,0 +1,295 @@
+"""
+Grammar-constrained decoding for the Task 1 / Task 2 JSON outputs.
+
+The output schema is described with a handful of grammar nodes and parsed character by character.
+A parser state is an immutable tuple of (node, phase) frames, so the set of tokens allowed in a
+state can be computed once and cached for the lifetime of the tokenizer.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import torch
+from transformers import LogitsProcessor
+
+# json.dumps(..., indent=2) 的训练数据中，空白最多是一个换行加缩进，不超过 4 层嵌套
+MAX_INDENT = 8
+SQUARES = [f"{col}{row}" for row in "12345678" for col in "abcdefgh"]
+
+# step() 的返回动作
+CONSUME, CONSUME_POP, PUSH, POP, REJECT = range(5)
+DONE: Tuple = ()
+
+
+class Node:
+    def step(self, phase, ch):
+        raise NotImplementedError
+
+
+class Ws(Node):
+    """Optional whitespace in the indent=2 layout: at most one newline followed by at most MAX_INDENT spaces"""
+
+    def step(self, phase, ch):
+        # phase 为已消耗的字符数；换行只能出现在开头，避免无限生成空白
+        if ch == '\n' and phase == 0:
+            return (CONSUME, 1)
+        if ch == ' ' and phase <= MAX_INDENT:
+            return (CONSUME, phase + 1)
+        return (POP,)
+
+
+# Repeated 内部共用一个实例，使解析状态可以复用允许 token 的缓存
+_WS = Ws()
+
+
+class Lit(Node):
+    def __init__(self, text: str):
+        self.text = text
+
+    def step(self, phase, ch):
+        if ch != self.text[phase]:
+            return (REJECT,)
+        return (CONSUME_POP,) if phase + 1 == len(self.text) else (CONSUME, phase + 1)
+
+
+class Choice(Node):
+    """Exactly one of a set of equal-length literals; the phase is the prefix typed so far"""
+
+    def __init__(self, options: Iterable[str]):
+        self.options = frozenset(options)
+        self.prefixes = frozenset(option[:i] for option in self.options for i in range(len(option)))
+
+    def step(self, phase, ch):
+        prefix = phase + ch if phase else ch
+        if prefix in self.options:
+            return (CONSUME_POP,)
+        return (CONSUME, prefix) if prefix in self.prefixes else (REJECT,)
+
+
+class FreeString(Node):
+    """Any JSON string; phase 0 expects the opening quote, 1 is inside, 2 follows a backslash"""
+
+    def step(self, phase, ch):
+        if phase == 0:
+            return (CONSUME, 1) if ch == '"' else (REJECT,)
+        if phase == 2:
+            return (CONSUME, 1) if ch in '"\\/bfnrtu' else (REJECT,)
+        if ch == '"':
+            return (CONSUME_POP,)
+        if ch == '\\':
+            return (CONSUME, 2)
+        return (REJECT,) if ord(ch) < 0x20 else (CONSUME, 1)
+
+
+class Seq(Node):
+    def __init__(self, items: Sequence[Node]):
+        self.items = list(items)
+
+    def step(self, phase, ch):
+        if phase < len(self.items):
+            return (PUSH, phase + 1, self.items[phase])
+        return (POP,)
+
+
+class Repeated(Node):
+    """`open` item (`,` item)* `close` with optional whitespace around separators"""
+
+    def __init__(self, item: Node, open_ch: str, close_ch: str):
+        self.item, self.open_ch, self.close_ch = item, open_ch, close_ch
+
+    def step(self, phase, ch):
+        if phase == 0:
+            return (CONSUME, 1) if ch == self.open_ch else (REJECT,)
+        if phase in (1, 3, 5):  # after open / item / comma: bounded whitespace first
+            return (PUSH, phase + 1, _WS)
+        if phase == 2:  # after open
+            return (CONSUME_POP,) if ch == self.close_ch else (PUSH, 3, self.item)
+        if phase == 4:  # after item
+            if ch == ',':
+                return (CONSUME, 5)
+            return (CONSUME_POP,) if ch == self.close_ch else (REJECT,)
+        return (PUSH, 3, self.item)  # after comma
+
+
+def json_object(fields: Sequence[Tuple[str, Node]]) -> Node:
+    items = [Ws(), Lit('{')]
+    for i, (key, value) in enumerate(fields):
+        if i:
+            items += [Ws(), Lit(',')]
+        items += [Ws(), Lit(f'"{key}"'), Ws(), Lit(':'), Ws(), value]
+    items += [Ws(), Lit('}')]
+    return Seq(items)
+
+
+def json_map(key: Node, value: Node) -> Node:
+    return Repeated(Seq([key, Ws(), Lit(':'), Ws(), value]), '{', '}')
+
+
+def json_list(item: Node) -> Node:
+    return Repeated(item, '[', ']')
+
+
+def square() -> Node:
+    return Choice(f'"{sq}"' for sq in SQUARES)
+
+
+def task1_grammar(skip_analysis: bool = False) -> Node:
+    fields = [("final_plausible_candidates", json_list(square()))]
+    if not skip_analysis:
+        fields.insert(0, ("analysis", json_map(square(), FreeString())))
+    return json_object(fields)
+
+
+def task2_grammar(skip_analysis: bool = False) -> Node:
+    fields = [("final_legal_moves", json_map(square(), json_list(square())))]
+    if not skip_analysis:
+        fields.insert(0, ("detailed_analysis", json_map(square(), FreeString())))
+    return json_object(fields)
+
+
+def initial_state(grammar: Node) -> Tuple:
+    return ((grammar, 0),)
+
+
+def advance(state: Optional[Tuple], ch: str) -> Optional[Tuple]:
+    """Feed one character; returns the new state, DONE when the grammar is complete, None if rejected"""
+    if not state:
+        return None
+    stack = list(state)
+    while stack:
+        node, phase = stack[-1]
+        action = node.step(phase, ch)
+        kind = action[0]
+        if kind == CONSUME:
+            stack[-1] = (node, action[1])
+            return tuple(stack)
+        if kind == CONSUME_POP:
+            stack.pop()
+            # 弹出已经走完的序列，语法全部完成时得到 DONE
+            while stack and isinstance(stack[-1][0], Seq) and stack[-1][1] == len(stack[-1][0].items):
+                stack.pop()
+            return tuple(stack)
+        if kind == PUSH:
+            stack[-1] = (node, action[1])
+            stack.append((action[2], 0))
+        elif kind == POP:
+            stack.pop()
+        else:
+            return None
+    return None  # 语法已结束但仍有字符
+
+
+def advance_text(state: Optional[Tuple], text: str) -> Optional[Tuple]:
+    for ch in text:
+        state = advance(state, ch)
+        if state is None:
+            return None
+    return state
+
+
+def _in_free_string(state: Tuple) -> bool:
+    node, phase = state[-1]
+    return isinstance(node, FreeString) and phase == 1
+
+
+class TokenGrammarIndex:
+    """
+    Per-tokenizer table of token texts plus a cache of allowed token ids for each parser state.
+
+    Tokens whose text has no quote, backslash or control character never leave the inside of a
+    free string, so in that state only the remaining tokens have to be simulated. In structural
+    states only tokens whose first character is acceptable are simulated.
+    """
+
+    def __init__(self, tokenizer, eos_token_ids: Iterable[int]):
+        self.eos_token_ids = sorted(set(eos_token_ids))
+        excluded = set(tokenizer.all_special_ids)
+        for token_id, token in getattr(tokenizer, "added_tokens_decoder", {}).items():
+            if getattr(token, "special", False):
+                excluded.add(token_id)
+
+        self.token_texts: Dict[int, str] = {}
+        self.by_first_char: Dict[str, List[int]] = {}
+        self.plain_string_ids: List[int] = []
+        self.special_string_ids: List[int] = []
+        for token_id in range(len(tokenizer)):
+            if token_id in excluded:
+                continue
+            text = tokenizer.decode([token_id])
+            if not text:
+                continue
+            self.token_texts[token_id] = text
+            self.by_first_char.setdefault(text[0], []).append(token_id)
+            if '"' in text or '\\' in text or any(ord(ch) < 0x20 for ch in text):
+                self.special_string_ids.append(token_id)
+            else:
+                self.plain_string_ids.append(token_id)
+
+        self._allowed: Dict[Tuple, List[int]] = {}
+
+    def allowed_token_ids(self, state: Tuple) -> List[int]:
+        allowed = self._allowed.get(state)
+        if allowed is not None:
+            return allowed
+
+        if state == DONE:
+            allowed = list(self.eos_token_ids)
+        elif _in_free_string(state):
+            allowed = self.plain_string_ids + [
+                token_id for token_id in self.special_string_ids
+                if advance_text(state, self.token_texts[token_id]) is not None
+            ]
+        else:
+            allowed = []
+            for first_char, token_ids in self.by_first_char.items():
+                if advance(state, first_char) is None:
+                    continue
+                allowed.extend(token_id for token_id in token_ids
+                               if advance_text(state, self.token_texts[token_id]) is not None)
+
+        self._allowed[state] = allowed
+        return allowed
+
+
+class SchemaLogitsProcessor(LogitsProcessor):
+    """
+    Mask the logits of every sequence so that its continuation stays inside `grammar`.
+
+    Args:
+        index: TokenGrammarIndex of the tokenizer in use
+        grammar: Root grammar node, e.g. task1_grammar()
+        prompt_length: Length of the (padded) prompt, generation starts after it
+        batch_size: Number of sequences in the batch
+    """
+
+    def __init__(self, index: TokenGrammarIndex, grammar: Node, prompt_length: int, batch_size: int = 1):
+        self.index = index
+        self.states: List[Optional[Tuple]] = [initial_state(grammar)] * batch_size
+        self._seen = prompt_length
+        self._masks: Dict[Tuple, torch.Tensor] = {}
+
+    def _mask(self, state: Tuple, scores: torch.FloatTensor) -> torch.Tensor:
+        mask = self._masks.get(state)
+        if mask is None:
+            mask = torch.full((scores.shape[-1],), float("-inf"), dtype=scores.dtype, device=scores.device)
+            allowed = [token_id for token_id in self.index.allowed_token_ids(state) if token_id < scores.shape[-1]]
+            mask[allowed] = 0
+            self._masks[state] = mask
+        return mask
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        new_ids = input_ids[:, self._seen:].tolist()
+        self._seen = input_ids.shape[1]
+        for row, state in enumerate(self.states):
+            if state is None:
+                continue
+            for token_id in new_ids[row]:
+                if state == DONE:
+                    break
+                text = self.index.token_texts.get(token_id)
+                state = advance_text(state, text) if text is not None else None
+                if state is None:
+                    break
+            self.states[row] = state
+            # 状态失效时（理论上不会发生）放开约束，由下游的 JSON 解析报错
+            if state is not None:
+                scores[row] = scores[row] + self._mask(state, scores)
+        return scores
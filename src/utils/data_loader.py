@@ -1,40 +1,41 @@
 import csv
 import re
 
-from datasets import Dataset, DatasetDict, load_dataset
 import json
 from tqdm import tqdm
 from src.env.othello_game import Othello
+from src.utils.jsonl_io import iter_lines, resolve_data_files
 
 def load_and_prepare_dataset(jsonl_path, split_ratio=0.9):
     """
     加载JSONL文件并转换为Hugging Face Dataset对象
     
     Args:
-        jsonl_path: JSONL文件路径
+        jsonl_path: JSONL文件路径（支持 .gz/.zst 压缩文件以及分片输出目录）
         split_ratio: 训练集与验证集的划分比例
         
     Returns:
         DatasetDict: 包含训练集和验证集的DatasetDict对象
     """
+    from datasets import Dataset
+
     # 读取JSONL文件
     data = []
-    with open(jsonl_path, 'r', encoding='utf-8') as f:
-        for line in tqdm(f, desc="load data"):
-            try:
-                item = json.loads(line)
-                # 提取对话内容
-                user_message = item["prompt"][0]["content"]
-                assistant_message = item["completion"][0]["content"]
-                
-                # 转换为训练所需的格式
-                data.append({
-                    "prompt": user_message,
-                    "completion": assistant_message,
-                })
-            except Exception as e:
-                print(f"error: {e}")
-                continue
+    for line in tqdm(iter_lines(jsonl_path), desc="load data"):
+        try:
+            item = json.loads(line)
+            # 提取对话内容（兼容纯文本和对话列表两种格式）
+            user_message = item["prompt"] if isinstance(item["prompt"], str) else item["prompt"][0]["content"]
+            assistant_message = item["completion"] if isinstance(item["completion"], str) else item["completion"][0]["content"]
+            
+            # 转换为训练所需的格式
+            data.append({
+                "prompt": user_message,
+                "completion": assistant_message,
+            })
+        except Exception as e:
+            print(f"error: {e}")
+            continue
     
     # 转换为Dataset对象
     dataset = Dataset.from_list(data)
@@ -92,6 +93,8 @@ def load_csv(filename, max_games=None):
     return games
 
 if __name__ == '__main__':
+    from datasets import load_dataset
+
     data_path = '/data/data_public/zjy/Othello-Qwen/data/training_data_tasks_1_2.jsonl'
-    dataset = load_dataset("json", data_files=data_path)['train']
+    dataset = load_dataset("json", data_files=resolve_data_files(data_path))['train']
     print(dataset)
\ No newline at end of file
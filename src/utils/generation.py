@@ -0,0 +1,104 @@
+import time
+from typing import Dict, List
+
+import torch
+from transformers import StoppingCriteria
+
+
+class JsonObjectTracker:
+    """
+    Incrementally scan streamed text and detect when the top-level JSON object is closed.
+    Text before the first '{' is ignored; braces and brackets inside strings are not counted.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escape = False
+        self.done = False
+
+    def feed(self, text: str) -> bool:
+        for ch in text:
+            if self.done:
+                break
+            if not self.started:
+                if ch == '{':
+                    self.started = True
+                    self.depth = 1
+                continue
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+            if ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.depth += 1
+            elif ch in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    self.done = True
+        return self.done
+
+
+class JsonCompletionCriteria(StoppingCriteria):
+    """
+    Stop each sequence as soon as its generated text closes the top-level JSON object.
+
+    Args:
+        tokenizer: Tokenizer used to turn new token ids into text
+        prompt_length: Length of the (padded) prompt, generation starts after it
+        batch_size: Number of sequences in the batch
+
+    After generation `finished_at[i]` holds the number of tokens sequence i generated
+    before the JSON closed, or None if it never did.
+    """
+
+    def __init__(self, tokenizer, prompt_length: int, batch_size: int = 1):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.trackers = [JsonObjectTracker() for _ in range(batch_size)]
+        self.finished_at: List = [None] * batch_size
+        self._seen = prompt_length
+        self._token_text: Dict[int, str] = {}
+
+    def _text(self, token_id: int) -> str:
+        text = self._token_text.get(token_id)
+        if text is None:
+            text = self.tokenizer.decode([token_id], skip_special_tokens=True)
+            self._token_text[token_id] = text
+        return text
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        seq_len = input_ids.shape[1]
+        new_ids = input_ids[:, self._seen:seq_len].tolist()
+        for row, tracker in enumerate(self.trackers):
+            if tracker.done:
+                continue
+            for offset, token_id in enumerate(new_ids[row]):
+                if tracker.feed(self._text(token_id)):
+                    self.finished_at[row] = self._seen + offset + 1 - self.prompt_length
+                    break
+        self._seen = seq_len
+        return torch.tensor([tracker.done for tracker in self.trackers], dtype=torch.bool, device=input_ids.device)
+
+
+class FirstTokenTimer(StoppingCriteria):
+    """
+    Never stops generation; records the perf_counter time of its first call, which happens right
+    after the prefill forward pass produced the first new token. Used to split generate() time
+    into prefill and decode.
+    """
+
+    def __init__(self):
+        self.first_token_time = None
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        if self.first_token_time is None:
+            self.first_token_time = time.perf_counter()
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
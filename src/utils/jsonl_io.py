@@ -0,0 +1,198 @@
+import glob
+import gzip
+import io
+import json
+import os
+from typing import Iterator, List, Optional
+
+INDEX_FILE = "index.json"
+SHARD_PATTERN = "shard-{:05d}.jsonl"
+COMPRESSION_SUFFIX = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd compression requires the `zstandard` package (pip install zstandard)")
+    return zstandard
+
+
+def _compression_from_path(path: str) -> str:
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return "none"
+
+
+def _open_binary_writer(path: str, compression: str, level: Optional[int]):
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=level if level is not None else 6)
+    if compression == "zstd":
+        raw = open(path, "wb")
+        cctx = _zstd().ZstdCompressor(level=level if level is not None else 3)
+        return cctx.stream_writer(raw, closefd=True)
+    return open(path, "wb")
+
+
+def _open_text_reader(path: str):
+    compression = _compression_from_path(path)
+    if compression == "gzip":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if compression == "zstd":
+        raw = open(path, "rb")
+        reader = _zstd().ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+class ShardedJsonlWriter:
+    """
+    Buffered JSONL writer with optional compression and size-based sharding.
+
+    Records are written to `<output_dir>/shard-00000.jsonl[.gz|.zst]`, ... and an
+    `index.json` listing every shard with its record count is written on close.
+
+    Args:
+        output_dir: Directory that will contain the shards and the index
+        compression: 'gzip', 'zstd' or 'none'
+        shard_size_mb: Roll over to a new shard after this many uncompressed MB (0 = single shard)
+        buffer_size_mb: Serialized records are accumulated in memory up to this size before being written
+        compression_level: Passed to the compressor, None for the library default
+    """
+
+    def __init__(self, output_dir: str, compression: str = "gzip", shard_size_mb: float = 256,
+                 buffer_size_mb: float = 8, compression_level: Optional[int] = None):
+        if compression not in COMPRESSION_SUFFIX:
+            raise ValueError(f"Unknown compression: {compression}. Must be one of {list(COMPRESSION_SUFFIX)}")
+        if compression == "zstd":
+            _zstd()  # fail early if the package is missing
+
+        self.output_dir = output_dir
+        self.compression = compression
+        self.compression_level = compression_level
+        self.shard_size = int(shard_size_mb * 1024 * 1024)
+        self.buffer_size = int(buffer_size_mb * 1024 * 1024)
+
+        os.makedirs(output_dir, exist_ok=True)
+        # 清理旧的分片，避免索引与目录内容不一致
+        for old in glob.glob(os.path.join(output_dir, "shard-*.jsonl*")):
+            os.remove(old)
+
+        self.shards = []
+        self._file = None
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._shard_bytes = 0
+        self._shard_count = 0
+        self.total = 0
+
+    def _open_shard(self):
+        name = SHARD_PATTERN.format(len(self.shards)) + COMPRESSION_SUFFIX[self.compression]
+        self._file = _open_binary_writer(os.path.join(self.output_dir, name), self.compression, self.compression_level)
+        self.shards.append({"path": name, "count": 0, "bytes": 0})
+        self._shard_bytes = 0
+        self._shard_count = 0
+
+    def _flush_buffer(self):
+        if not self._buffer:
+            return
+        if self._file is None:
+            self._open_shard()
+        self._file.write(b"".join(self._buffer))
+        self.shards[-1]["count"] = self._shard_count
+        self.shards[-1]["bytes"] = self._shard_bytes
+        self._buffer = []
+        self._buffered_bytes = 0
+
+    def _close_shard(self):
+        self._flush_buffer()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def write(self, record: dict):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+        if self.shard_size and self._shard_count and self._shard_bytes + len(line) > self.shard_size:
+            self._close_shard()
+        if self._file is None and not self._buffer:
+            self._open_shard()
+
+        self._buffer.append(line)
+        self._buffered_bytes += len(line)
+        self._shard_bytes += len(line)
+        self._shard_count += 1
+        self.total += 1
+
+        if self._buffered_bytes >= self.buffer_size:
+            self._flush_buffer()
+
+    def flush(self):
+        """Push buffered records to the current shard and refresh the index"""
+        self._flush_buffer()
+        if self._file is not None:
+            self._file.flush()
+        self._write_index()
+
+    def _write_index(self):
+        index = {
+            "format": "sharded-jsonl",
+            "compression": self.compression,
+            "total": self.total,
+            "shards": self.shards,
+        }
+        tmp_path = os.path.join(self.output_dir, INDEX_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.output_dir, INDEX_FILE))
+
+    def close(self):
+        self._close_shard()
+        self._write_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def resolve_data_files(path: str) -> List[str]:
+    """
+    Expand a dataset path into the list of JSONL files it refers to.
+    Accepts a plain/compressed JSONL file, a sharded output directory or its index.json.
+    """
+    if os.path.isdir(path):
+        index_path = os.path.join(path, INDEX_FILE)
+        if os.path.exists(index_path):
+            return resolve_data_files(index_path)
+        files = sorted(glob.glob(os.path.join(path, "*.jsonl")) + glob.glob(os.path.join(path, "*.jsonl.gz"))
+                       + glob.glob(os.path.join(path, "*.jsonl.zst")))
+        if not files:
+            raise FileNotFoundError(f"No JSONL files found in {path}")
+        return files
+
+    if os.path.basename(path) == INDEX_FILE:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        base_dir = os.path.dirname(path)
+        return [os.path.join(base_dir, shard["path"]) for shard in index["shards"] if shard["count"] > 0]
+
+    return [path]
+
+
+def iter_lines(path: str) -> Iterator[str]:
+    """Yield raw lines from every file under `path` (see resolve_data_files)"""
+    for file_path in resolve_data_files(path):
+        with _open_text_reader(file_path) as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+
+def iter_jsonl(path: str) -> Iterator[dict]:
+    """Yield parsed records from every file under `path`"""
+    for line in iter_lines(path):
+        yield json.loads(line)
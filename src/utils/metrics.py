@@ -0,0 +1,195 @@
+import json
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+# 延迟分布的桶上限（秒），覆盖从分词的亚毫秒级到整局分析的数十秒
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一格是 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics: "PipelineMetrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class PipelineMetrics:
+    """
+    Per-call stage timings and token counts for the agent pipeline.
+
+    Each analyze_positions() call becomes one record holding the seconds spent in every stage,
+    the prompt/generated token counts and the resulting tokens/sec. Records are kept in memory,
+    optionally appended to a JSONL file, and folded into per-stage histograms that can be
+    rendered in the Prometheus text format.
+
+    Recording is switched with enable()/disable(). While disabled, stage() hands back a shared
+    no-op context manager and every other method returns immediately.
+
+    Args:
+        enabled: Start recording right away
+        jsonl_path: Optional file that receives one JSON line per finished call
+        max_records: Number of recent records kept in memory
+        buckets: Histogram bucket upper bounds in seconds
+    """
+
+    STAGES = ("prompt_build", "tokenize", "prefill", "decode", "detokenize", "parse", "greedy")
+
+    def __init__(self, enabled: bool = False, jsonl_path: Optional[str] = None, max_records: int = 1000,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self.records = deque(maxlen=max_records)
+        self.stage_histograms = {stage: Histogram(buckets) for stage in self.STAGES}
+        self.call_histogram = Histogram(buckets)
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._current = None
+
+    def enable(self, jsonl_path: Optional[str] = None):
+        self.enabled = True
+        if jsonl_path is not None:
+            self.jsonl_path = jsonl_path
+
+    def disable(self):
+        self.enabled = False
+        self._current = None
+
+    # --- recording ---
+
+    def begin_call(self, **fields):
+        if not self.enabled:
+            return
+        self._current = {
+            "timestamp": time.time(),
+            **fields,
+            "stages": dict.fromkeys(self.STAGES, 0.0),
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "_start": time.perf_counter(),
+        }
+
+    def stage(self, name: str):
+        """Context manager that adds the elapsed time of its block to stage `name` of the current call"""
+        if self._current is None:
+            return _NULL_TIMER
+        return _StageTimer(self, name)
+
+    def add(self, stage: str, seconds: float):
+        if self._current is not None:
+            self._current["stages"][stage] += seconds
+
+    def count_tokens(self, input_tokens: int = 0, output_tokens: int = 0):
+        if self._current is not None:
+            self._current["input_tokens"] += input_tokens
+            self._current["output_tokens"] += output_tokens
+
+    def end_call(self, **fields) -> Optional[Dict]:
+        record, self._current = self._current, None
+        if record is None:
+            return None
+        record.update(fields)
+        record["seconds"] = time.perf_counter() - record.pop("_start")
+        generation_seconds = record["stages"]["prefill"] + record["stages"]["decode"]
+        record["tokens_per_sec"] = record["output_tokens"] / generation_seconds if generation_seconds > 0 else 0.0
+
+        self.calls += 1
+        self.input_tokens += record["input_tokens"]
+        self.output_tokens += record["output_tokens"]
+        self.call_histogram.observe(record["seconds"])
+        for stage, seconds in record["stages"].items():
+            if seconds > 0:
+                self.stage_histograms[stage].observe(seconds)
+        self.records.append(record)
+        if self.jsonl_path:
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        return record
+
+    # --- export ---
+
+    def summary(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "mean_seconds": self.call_histogram.sum / self.calls if self.calls else 0.0,
+            "stage_mean_seconds": {
+                stage: histogram.sum / histogram.count if histogram.count else 0.0
+                for stage, histogram in self.stage_histograms.items()
+            },
+        }
+
+    def prometheus_text(self, prefix: str = "othello_agent") -> str:
+        lines = [
+            f"# TYPE {prefix}_calls_total counter",
+            f"{prefix}_calls_total {self.calls}",
+            f"# TYPE {prefix}_input_tokens_total counter",
+            f"{prefix}_input_tokens_total {self.input_tokens}",
+            f"# TYPE {prefix}_output_tokens_total counter",
+            f"{prefix}_output_tokens_total {self.output_tokens}",
+        ]
+        lines.append(f"# TYPE {prefix}_call_seconds histogram")
+        lines.extend(_histogram_lines(f"{prefix}_call_seconds", "", self.call_histogram))
+        lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+        for stage, histogram in self.stage_histograms.items():
+            lines.extend(_histogram_lines(f"{prefix}_stage_seconds", f'stage="{stage}",', histogram))
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name: str, labels: str, histogram: Histogram) -> List[str]:
+    lines = []
+    for upper, count in zip(list(histogram.buckets) + ["+Inf"], histogram.cumulative()):
+        lines.append(f'{name}_bucket{{{labels}le="{upper}"}} {count}')
+    label_block = f"{{{labels.rstrip(',')}}}" if labels else ""
+    lines.append(f"{name}_sum{label_block} {histogram.sum}")
+    lines.append(f"{name}_count{label_block} {histogram.count}")
+    return lines
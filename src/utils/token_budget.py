@@ -0,0 +1,122 @@
+import json
+import math
+from typing import Dict, List, Optional, Sequence
+
+from src.env.othello_game import Othello
+
+# cot_core 在任务一中至少分析 11 个点，在任务二中最多分析 10 个候选点
+TASK1_MIN_ANALYSIS_POINTS = 11
+TASK2_MAX_CANDIDATES = 10
+
+
+def budget_features(task_name: str, game: Othello, plausible_candidates: Optional[Sequence[str]] = None,
+                    **kwargs) -> Optional[List[float]]:
+    """
+    Prompt-time features that drive the completion length, or None for tasks without a length model
+    (and for Task 2 candidates that are not a list of squares, which then get the flat cap).
+        Task1: [1, analysed squares, plausible candidates]
+        Task2: [1, analysed candidates, stones flipped by them]
+    """
+    if task_name == "Task1":
+        num_candidates = len(game.get_plausible_candidates())
+        return [1.0, float(max(num_candidates, TASK1_MIN_ANALYSIS_POINTS)), float(num_candidates)]
+    if task_name == "Task2":
+        # 候选点来自任务一的模型输出，格式不对时（如一个整数）不做预测，交给 build_prompt 处理
+        if not isinstance(plausible_candidates, (list, tuple)) and plausible_candidates is not None:
+            return None
+        candidates = list(plausible_candidates or [])[:TASK2_MAX_CANDIDATES]
+        if not all(isinstance(pos, str) for pos in candidates):
+            return None
+        flips = sum(len(game._get_flips(pos)) for pos in candidates)
+        return [1.0, float(len(candidates)), float(flips)]
+    return None
+
+
+def _least_squares(rows: List[List[float]], targets: List[float]) -> List[float]:
+    """Solve the normal equations (X^T X + eps I) w = X^T y by Gaussian elimination"""
+    dim = len(rows[0])
+    a = [[sum(row[i] * row[j] for row in rows) + (1e-6 if i == j else 0.0) for j in range(dim)] for i in range(dim)]
+    b = [sum(row[i] * y for row, y in zip(rows, targets)) for i in range(dim)]
+    for col in range(dim):
+        pivot = max(range(col, dim), key=lambda r: abs(a[r][col]))
+        a[col], a[pivot], b[col], b[pivot] = a[pivot], a[col], b[pivot], b[col]
+        for r in range(dim):
+            if r != col and a[col][col]:
+                factor = a[r][col] / a[col][col]
+                a[r] = [x - factor * y for x, y in zip(a[r], a[col])]
+                b[r] -= factor * b[col]
+    return [b[i] / a[i][i] if a[i][i] else 0.0 for i in range(dim)]
+
+
+class TokenBudgetPredictor:
+    """
+    Per-task linear model of the number of generated tokens, used to set a tight max_new_tokens.
+
+    budget = ceil(prediction * (1 + relative_margin) + residual quantile), clipped to [min_tokens, cap].
+    The residual quantile is measured on the fitting data, so with quantile=0.99 roughly 1% of the
+    fitting samples would still be truncated before the relative margin is applied. Callers must
+    retry truncated generations with the flat cap.
+
+    Args:
+        relative_margin: Extra fraction added on top of the prediction
+        quantile: Residual quantile added as an absolute margin
+        min_tokens: Lower bound for every budget
+    """
+
+    def __init__(self, relative_margin: float = 0.1, quantile: float = 0.99, min_tokens: int = 32):
+        self.relative_margin = relative_margin
+        self.quantile = quantile
+        self.min_tokens = min_tokens
+        self.weights: Dict[str, List[float]] = {}
+        self.residual_margin: Dict[str, float] = {}
+
+    def fit(self, task_name: str, features: List[List[float]], token_counts: List[int]) -> Dict:
+        """Fit the model of one task and return fitting statistics"""
+        if not features:
+            raise ValueError(f"No samples to fit the token budget of {task_name}")
+        weights = _least_squares(features, [float(n) for n in token_counts])
+        residuals = sorted(n - sum(w * x for w, x in zip(weights, row)) for row, n in zip(features, token_counts))
+        margin = max(0.0, residuals[min(len(residuals) - 1, int(len(residuals) * self.quantile))])
+        self.weights[task_name] = weights
+        self.residual_margin[task_name] = margin
+
+        budgets = [self._budget(task_name, row, cap=None) for row in features]
+        return {
+            "samples": len(features),
+            "weights": weights,
+            "residual_margin": margin,
+            "max_tokens": max(token_counts),
+            "mean_budget": sum(budgets) / len(budgets),
+            "truncation_rate": sum(n > budget for n, budget in zip(token_counts, budgets)) / len(budgets),
+        }
+
+    def _budget(self, task_name: str, features: List[float], cap: Optional[int]) -> int:
+        prediction = sum(w * x for w, x in zip(self.weights[task_name], features))
+        budget = max(self.min_tokens, math.ceil(prediction * (1 + self.relative_margin) + self.residual_margin[task_name]))
+        return min(budget, cap) if cap else budget
+
+    def predict(self, task_name: str, game: Othello, cap: int, **prompt_kwargs) -> int:
+        """max_new_tokens for one prompt; the flat cap for tasks that were not fitted"""
+        if task_name not in self.weights:
+            return cap
+        features = budget_features(task_name, game, **prompt_kwargs)
+        return cap if features is None else self._budget(task_name, features, cap)
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "relative_margin": self.relative_margin,
+                "quantile": self.quantile,
+                "min_tokens": self.min_tokens,
+                "weights": self.weights,
+                "residual_margin": self.residual_margin,
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "TokenBudgetPredictor":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        predictor = cls(data["relative_margin"], data["quantile"], data["min_tokens"])
+        predictor.weights = data["weights"]
+        predictor.residual_margin = data["residual_margin"]
+        return predictor